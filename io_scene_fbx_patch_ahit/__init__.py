@@ -513,6 +513,15 @@ class ImportFBX_patch_ahit(bpy.types.Operator, ImportHelper):
         default='MAKE_UNIQUE',
         description="Behavior when the name of an imported material conflicts with an existing material",
     )
+    # UnDrew Add Start : Opt-in worker processes for array decompression.
+    UE3_use_worker_processes: BoolProperty(
+        name="Worker Processes",
+        description="Decompress the largest arrays in separate processes, which can be faster with many CPUs. "
+                    "Experimental: the processes are forked from Blender, which can hang the import. "
+                    "Not available on Windows and macOS",
+        default=False,
+    )
+    # UnDrew Add End
 
     def draw(self, context):
         # COMPAT EDIT BEGIN : See CompatPanelInfo.
@@ -557,6 +566,9 @@ def import_panel_include(body: bpy.types.UILayout, operator: bpy.types.Operator,
     if api_compat.HAS_MESH_COL_ATTRS_PROP and api_compat.HAS_COL_ATTR_SRGB_PROP:
     # COMPAT ADD END
         body.prop(operator, "colors_type")
+    # UnDrew Add Start : Opt-in worker processes for array decompression.
+    body.prop(operator, "UE3_use_worker_processes")
+    # UnDrew Add End
 
 
 # COMPAT EDIT BEGIN : See CompatPanelInfo.
@@ -922,6 +934,17 @@ class ExportFBX_patch_ahit(bpy.types.Operator, ExportHelper):
         soft_min=0.0, soft_max=10.0,
         default=1.0,  # default: min slope: 0.005, max frame step: 10.
     )
+    # UnDrew Add Start : Curve fitting keyframe reduction.
+    UE3_bake_anim_simplify_mode: EnumProperty(
+        name="Simplify Method",
+        description="How baked values are simplified",
+        items=(('DIFF', "Sample Difference", "Only keep samples that differ enough from their neighbors (vanilla)"),
+               ('FIT', "Curve Fitting", "Fit the samples with linear segments, only keeping the ends of each segment. "
+                                        "Keeps far fewer keys on smooth curves, with the same tolerance"),
+               ),
+        default='DIFF',
+    )
+    # UnDrew Add End
     # UnDrew Add Start : Extended animation export properties.
     UE3_nla_modular_anim_support: BoolProperty(
         name="UE3 NLA - Modular Anim Support",
@@ -982,6 +1005,15 @@ class ExportFBX_patch_ahit(bpy.types.Operator, ExportHelper):
                ),
         default='ONLY_OWNER',
     )
+    UE3_batch_incremental: BoolProperty(
+        name="Incremental",
+        description="Only bakes and writes the animation files of actions that changed since the last export into the "
+                    "sub-folder, as recorded in a manifest file stored there. Any change to the export settings, "
+                    "object transforms, armature rest poses, meshes, constraints, drivers or the objects they read "
+                    "writes all files again. Only applies when exporting all actions. Changes to other data "
+                    "(e.g. materials) are not detected, disable this to write all files again",
+        default=False,
+    )
     # UnDrew Add End
     path_mode: path_reference_mode
     embed_textures: BoolProperty(
@@ -989,6 +1021,29 @@ class ExportFBX_patch_ahit(bpy.types.Operator, ExportHelper):
         description="Embed textures in FBX binary file (only for \"Copy\" path mode!)",
         default=False,
     )
+    # UnDrew Add Start : Selectable array compression.
+    UE3_array_compression: EnumProperty(
+        name="Compression",
+        description="How the arrays of data (vertices, animation keys, etc.) are compressed in the FBX file",
+        items=(('STORE', "None", "Store arrays uncompressed, fastest to export but produces the largest files"),
+               ('FAST', "Fast", "Fast compression (zlib level 1)"),
+               ('DEFAULT', "Default", "Balanced compression (zlib level 6), slower to export but smaller files"),
+               ('BEST', "Best", "Best compression (zlib level 9), slowest to export but smallest files"),
+               ('AUTO', "Auto", "Fast compression, but arrays which barely compress (e.g. noisy data) are stored "
+                                "uncompressed"),
+               ),
+        default='FAST',
+    )
+    # UnDrew Add End
+    # UnDrew Add Start : Opt-in worker processes for array compression.
+    UE3_use_worker_processes: BoolProperty(
+        name="Worker Processes",
+        description="Compress the largest arrays in separate processes, which can be faster with many CPUs. "
+                    "Experimental: the processes are forked from Blender, which can hang the export. "
+                    "Not available on Windows and macOS",
+        default=False,
+    )
+    # UnDrew Add End
     batch_mode: EnumProperty(
         name="Batch Mode",
         items=(('OFF', "Off", "Active scene to file"),
@@ -1053,6 +1108,12 @@ def export_main(layout: bpy.types.UILayout, operator: bpy.types.Operator, is_fil
     sub = row.row(align=True)
     sub.enabled = (operator.path_mode == 'COPY')
     sub.prop(operator, "embed_textures", text="", icon='PACKAGE' if operator.embed_textures else 'UGLYPACKAGE')
+    # UnDrew Add Start : Selectable array compression.
+    layout.prop(operator, "UE3_array_compression")
+    # UnDrew Add End
+    # UnDrew Add Start : Opt-in worker processes for array compression.
+    layout.prop(operator, "UE3_use_worker_processes")
+    # UnDrew Add End
     if is_file_browser:
         row = layout.row(align=True)
         row.prop(operator, "batch_mode")
@@ -1152,6 +1213,9 @@ def export_panel_animation(body: bpy.types.UILayout, operator: bpy.types.Operato
     body.prop(operator, "bake_anim_force_startend_keying")
     body.prop(operator, "bake_anim_step")
     body.prop(operator, "bake_anim_simplify_factor")
+    # UnDrew Add Start : Curve fitting keyframe reduction.
+    body.prop(operator, "UE3_bake_anim_simplify_mode")
+    # UnDrew Add End
     # UnDrew Add Start : Extended animation export properties.
     sublayout = body.column()
     sublayout.use_property_split = False  # These property names are pretty long, let's use all available space.
@@ -1168,6 +1232,7 @@ def export_panel_UE3_batch_anims(body: bpy.types.UILayout, operator: bpy.types.O
     body.prop(operator, "UE3_batch_skip_main")
     body.prop(operator, "UE3_batch_subpath")
     body.prop(operator, "UE3_batch_object_filter")
+    body.prop(operator, "UE3_batch_incremental")
 # UnDrew Add End
 
 
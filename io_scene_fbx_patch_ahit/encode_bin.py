@@ -1,14 +1,16 @@
 try:
     from . import data_types
-    from .fbx_utils_threading import MultiThreadedTaskConsumer
+    from .fbx_utils_threading import MultiThreadedTaskConsumer, MultiProcessZlibConsumer
 except:
     import data_types
-    from fbx_utils_threading import MultiThreadedTaskConsumer
+    from fbx_utils_threading import MultiThreadedTaskConsumer, MultiProcessZlibConsumer
 
 from struct import pack
 from contextlib import contextmanager
+from functools import partial
 import array
 import numpy as np
+import os
 import zlib
 
 _BLOCK_SENTINEL_LENGTH = ...
@@ -17,6 +19,25 @@ _ELEM_META_FORMAT = ...
 _ELEM_META_SIZE = ...
 _IS_BIG_ENDIAN = (__import__("sys").byteorder != 'little')
 _HEAD_MAGIC = b'Kaydara FBX Binary\x20\x20\x00\x1a\x00'
+# Arrays at least this large are compressed in worker processes when available.
+_PROCESS_COMPRESS_MIN_SIZE = 4 * 1024 * 1024
+
+# Array compression modes, as `(zlib compression level, auto)` pairs, see set_array_compression().
+ARRAY_COMPRESSION_MODES = {
+    'STORE': (0, False),
+    'FAST': (1, False),
+    'DEFAULT': (6, False),
+    'BEST': (9, False),
+    'AUTO': (1, True),
+}
+_ARRAY_COMPRESSION_LEVEL = 1
+_ARRAY_COMPRESSION_AUTO = False
+# With 'AUTO' compression, arrays are stored uncompressed unless compression reduces their size at least by this factor.
+_AUTO_COMPRESSION_MAX_RATIO = 0.9
+# With 'AUTO' compression, arrays larger than this first get a few chunks of this size compressed as a sample, to avoid
+# compressing the whole array only to find out that it is not worth it.
+_AUTO_COMPRESSION_SAMPLE_SIZE = 16 * 1024
+_AUTO_COMPRESSION_SAMPLE_COUNT = 4
 
 # fbx has very strict CRC rules, all based on file timestamp
 # until we figure these out, write files at a fixed time. (workaround!)
@@ -52,42 +73,68 @@ class FBXElem:
 
     @classmethod
     @contextmanager
-    def enable_multithreading_cm(cls):
+    def enable_multithreading_cm(cls, use_processes=False, array_compression=None):
         """Temporarily enable multithreaded array compression.
 
+        When `array_compression` is not None, arrays are compressed with that mode (see set_array_compression()) until
+        the context manager exits.
+
+        When `use_processes` is True, the largest arrays are compressed in forked worker processes where possible, which
+        is opt-in because forking a multithreaded process can deadlock (see MultiProcessZlibConsumer).
+
         The context manager handles starting up and shutting down the threads.
 
         Only exits once all the threads are done (either all tasks were completed or an error occurred and the threads
         were stopped prematurely).
 
-        Writing to a file is temporarily disabled as a safeguard."""
+        Writing elements whose arrays have not all been compressed yet is disabled as a safeguard."""
         # __enter__()
         orig_func = cls._add_compressed_array_helper
         orig_write = cls._write
 
         def insert_compressed_array(props, insert_at, data, length):
             # zlib.compress releases the GIL, so can be multithreaded.
-            data = zlib.compress(data, 1)
-            comp_len = len(data)
-
-            encoding = 1
-            data = pack('<3I', length, encoding, comp_len) + data
-            props[insert_at] = data
-
-        with MultiThreadedTaskConsumer.new_cpu_bound_cm(insert_compressed_array) as wrapped_func:
+            props[insert_at] = _compress_array(data, length)
+
+        def insert_compressed_view(props, insert_at, data, length, compressed_view):
+            # Called with the compressed data of a worker process.
+            if _ARRAY_COMPRESSION_AUTO and len(compressed_view) > len(data) * _AUTO_COMPRESSION_MAX_RATIO:
+                props[insert_at] = pack('<3I', length, 0, len(data)) + data
+            else:
+                props[insert_at] = pack('<3I', length, 1, len(compressed_view)) + compressed_view
+
+        # The worker processes are forked when entering the MultiProcessZlibConsumer context manager, so it is entered
+        # before any thread is started. The previous compression mode is only restored once all threads and processes
+        # are done compressing.
+        with array_compression_cm(array_compression), \
+                MultiProcessZlibConsumer.new_cpu_bound_cm(use_processes) as process_consumer, \
+                MultiThreadedTaskConsumer.new_cpu_bound_cm(insert_compressed_array) as wrapped_func:
             try:
                 def _add_compressed_array_helper_multi(self, data, length):
                     # Append a dummy value that will be replaced with the compressed array data later.
                     self.props.append(...)
                     # The index to insert the compressed array into.
                     insert_at = len(self.props) - 1
-                    # Schedule the array to be compressed on a separate thread and then inserted into the hierarchy at
-                    # `insert_at`.
-                    wrapped_func(self.props, insert_at, data, length)
-
-                # As an extra safeguard, temporarily replace the `_write` function to raise an error if called.
-                def temp_write(*_args, **_kwargs):
-                    raise RuntimeError("Writing is not allowed until multithreaded array compression has been disabled")
+                    if process_consumer is not None and len(data) >= _PROCESS_COMPRESS_MIN_SIZE:
+                        if _ARRAY_COMPRESSION_AUTO and not _is_worth_compressing(data):
+                            self.props[insert_at] = pack('<3I', length, 0, len(data)) + data
+                        else:
+                            # Schedule the largest arrays to be compressed in a separate process.
+                            process_consumer.compress(data, _ARRAY_COMPRESSION_LEVEL,
+                                                      partial(insert_compressed_view, self.props, insert_at, data,
+                                                              length))
+                    else:
+                        # Schedule the array to be compressed on a separate thread and then inserted into the hierarchy
+                        # at `insert_at`.
+                        wrapped_func(self.props, insert_at, data, length)
+
+                # As an extra safeguard, temporarily replace the `_write` function to raise an error if called on an
+                # element that is still waiting for some of its arrays to be compressed.
+                def temp_write(self, *args, **kwargs):
+                    if not self._is_complete():
+                        raise RuntimeError("Writing is not allowed until multithreaded array compression has been "
+                                           "disabled or the element's arrays have all been compressed")
+                    orig_write(self, *args, **kwargs)
 
                 cls._add_compressed_array_helper = _add_compressed_array_helper_multi
                 cls._write = temp_write
@@ -99,7 +146,8 @@ class FBXElem:
                 # Restore the original functions.
                 cls._add_compressed_array_helper = orig_func
                 cls._write = orig_write
-            # Exiting the MultiThreadedTaskConsumer context manager will wait for all scheduled tasks to complete.
+            # Exiting the MultiThreadedTaskConsumer and MultiProcessZlibConsumer context managers will wait for all
+            # scheduled tasks to complete.
 
     def add_bool(self, data):
         assert isinstance(data, bool)
@@ -183,18 +231,13 @@ class FBXElem:
     def _add_compressed_array_helper(self, data, length):
         """Note: This function may be swapped out by enable_multithreading_cm with an equivalent that supports
         multithreading."""
-        data = zlib.compress(data, 1)
-        comp_len = len(data)
-
-        encoding = 1
-        data = pack('<3I', length, encoding, comp_len) + data
-        self.props.append(data)
+        self.props.append(_compress_array(data, length))
 
     def _add_array_helper(self, data, prop_type, length):
         self.props_type.append(prop_type)
         # Mimic behavior of `fbxconverter` (also common sense)
         # we could make this configurable.
-        encoding = 0 if len(data) <= 128 else 1
+        encoding = 0 if len(data) <= 128 or _ARRAY_COMPRESSION_LEVEL == 0 else 1
         if encoding == 0:
             data = pack('<3I', length, encoding, len(data)) + data
             self.props.append(data)
@@ -274,9 +317,25 @@ class FBXElem:
                 data = array.array(data_types.ARRAY_BYTE, data)
             self._add_parray_helper(data, data_types.ARRAY_BYTE, data_types.BYTE_ARRAY)
 
+    def copy(self):
+        """Return a copy of this element and its children, to write them again, e.g. to another file.
+
+        The copies share their props with the original elements, including arrays still being compressed by
+        enable_multithreading_cm, so the original elements must not be modified anymore."""
+        elem = FBXElem(self.id)
+        elem.props = self.props
+        elem.props_type = self.props_type
+        elem.elems = [child.copy() for child in self.elems]
+        return elem
+
     # -------------------------
     # internal helper functions
 
+    def _is_complete(self):
+        """Whether all props of this element and its children are filled in, i.e. none of them are still waiting for
+        their array to be compressed by enable_multithreading_cm."""
+        return ... not in self.props and all(elem._is_complete() for elem in self.elems)
+
     def _calc_offsets(self, offset, is_last):
         """
         Call before writing, calculates fixed offsets.
@@ -340,6 +399,63 @@ class FBXElem:
             write(_BLOCK_SENTINEL_DATA)
 
 
+def set_array_compression(mode):
+    """Set how arrays are compressed by all FBXElem created from now on, `mode` being a key of ARRAY_COMPRESSION_MODES.
+
+    'STORE' writes all arrays uncompressed, 'FAST', 'DEFAULT' and 'BEST' compress all arrays (but the smallest ones)
+    with zlib levels 1, 6 and 9 respectively, and 'AUTO' compresses with level 1, but stores arrays uncompressed when
+    that does not reduce their size much (e.g. noisy float data)."""
+    global _ARRAY_COMPRESSION_LEVEL, _ARRAY_COMPRESSION_AUTO
+    _ARRAY_COMPRESSION_LEVEL, _ARRAY_COMPRESSION_AUTO = ARRAY_COMPRESSION_MODES[mode]
+
+
+@contextmanager
+def array_compression_cm(mode):
+    """Temporarily set how arrays are compressed, see set_array_compression(). Does nothing when `mode` is None."""
+    global _ARRAY_COMPRESSION_LEVEL, _ARRAY_COMPRESSION_AUTO
+    orig_compression = _ARRAY_COMPRESSION_LEVEL, _ARRAY_COMPRESSION_AUTO
+    if mode is not None:
+        set_array_compression(mode)
+    try:
+        yield
+    finally:
+        _ARRAY_COMPRESSION_LEVEL, _ARRAY_COMPRESSION_AUTO = orig_compression
+
+
+def _is_worth_compressing(data):
+    """Whether compressing a few samples of `data` reduces their size enough for 'AUTO' compression."""
+    data_len = len(data)
+    sample_size = _AUTO_COMPRESSION_SAMPLE_SIZE
+    sample_count = _AUTO_COMPRESSION_SAMPLE_COUNT
+    if data_len <= sample_size * sample_count:
+        # Too small to be worth sampling.
+        return True
+    data = memoryview(data).cast('B')
+    # Evenly spread samples, starting with the start and ending with the end of the data.
+    step = (data_len - sample_size) // (sample_count - 1)
+    compressed_len = 0
+    for i in range(sample_count):
+        start = i * step
+        compressed_len += len(zlib.compress(data[start:start + sample_size], _ARRAY_COMPRESSION_LEVEL))
+    return compressed_len <= sample_size * sample_count * _AUTO_COMPRESSION_MAX_RATIO
+
+
+def _compress_array(data, length):
+    """Return the array prop data of `data`, compressed according to the current array compression settings."""
+    if _ARRAY_COMPRESSION_AUTO:
+        if _is_worth_compressing(data):
+            compressed = zlib.compress(data, _ARRAY_COMPRESSION_LEVEL)
+            if len(compressed) <= len(data) * _AUTO_COMPRESSION_MAX_RATIO:
+                return pack('<3I', length, 1, len(compressed)) + compressed
+        return pack('<3I', length, 0, len(data)) + data
+
+    data = zlib.compress(data, _ARRAY_COMPRESSION_LEVEL)
+    comp_len = len(data)
+
+    encoding = 1
+    return pack('<3I', length, encoding, comp_len) + data
+
+
 def _write_timedate_hack(elem_root):
     # perform 2 changes
     # - set the FileID
@@ -392,6 +508,26 @@ def init_version(fbx_version):
     _BLOCK_SENTINEL_DATA = (b'\0' * _BLOCK_SENTINEL_LENGTH)
 
 
+def _write_footer(write, tell, version):
+    write(_FOOT_ID)
+    write(b'\x00' * 4)
+
+    # padding for alignment (values between 1 & 16 observed)
+    # if already aligned to 16, add a full 16 bytes padding.
+    ofs = tell()
+    pad = ((ofs + 15) & ~15) - ofs
+    if pad == 0:
+        pad = 16
+
+    write(b'\0' * pad)
+
+    write(pack('<I', version))
+
+    # unknown magic (always the same)
+    write(b'\0' * 120)
+    write(b'\xf8\x5a\x8c\x6a\xde\xf5\xd9\x7e\xec\xe9\x0c\xe3\x75\x8f\x29\x0b')
+
+
 def write(fn, elem_root, version):
     assert elem_root.id == b''
 
@@ -411,20 +547,185 @@ def write(fn, elem_root, version):
         elem_root._calc_offsets_children(tell(), False)
         elem_root._write_children(write, tell, False)
 
-        write(_FOOT_ID)
-        write(b'\x00' * 4)
+        _write_footer(write, tell, version)
 
-        # padding for alignment (values between 1 & 16 observed)
-        # if already aligned to 16, add a full 16 bytes padding.
-        ofs = tell()
-        pad = ((ofs + 15) & ~15) - ofs
-        if pad == 0:
-            pad = 16
 
-        write(b'\0' * pad)
+class StreamWriter:
+    """Write an FBX file while its element tree is still being built, so that the whole tree never has to be held in
+    memory at once (as opposed to `write`).
 
-        write(pack('<I', version))
+    Each call to `flush` writes the children of the root element which are complete, and removes them from the tree.
+    Children passed to `open_elem` (typically `Objects`) also get their own children written and removed as they are
+    completed, until `close_elem` is called, their end offset being patched in once they are done.
+
+    An element is considered complete once another element has been added after it (or once its parent has been
+    closed) and all of its arrays have been compressed, so an element must not be modified anymore once another
+    element has been added after it. Elements that are not complete yet are simply kept until a later `flush`.
+
+    Everything remaining is written by `close`, which should thus only be called once multithreaded array compression,
+    if any, has been disabled. When used as a context manager, `open` and `close` are called when entering and exiting
+    it, while `abort` is called instead of `close` if an exception occurs.
+
+    The file is written to a temporary file next to `fn`, which only replaces `fn` once `close` has finished writing it,
+    so that an existing file is left untouched by an export that fails or is interrupted."""
+
+    __slots__ = ("fn", "tmp_fn", "elem_root", "version", "_file", "_streamed_elems", "_timedate_hack_done")
+
+    def __init__(self, fn, elem_root, version):
+        assert elem_root.id == b''
+        self.fn = fn
+        self.tmp_fn = fn + ".tmp"
+        self.elem_root = elem_root
+        self.version = version
+        self._file = None
+        # Maps elements given to `open_elem` to [header_offset, props_length, is_closed, has_written_children].
+        self._streamed_elems = {}
+        self._timedate_hack_done = False
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def open(self):
+        init_version(self.version)
+
+        self._file = open(self.tmp_fn, 'wb')
+        self._file.write(_HEAD_MAGIC)
+        self._file.write(pack('<I', self.version))
+
+    def close(self):
+        """Write all remaining elements, which must be complete, and finish the file."""
+        try:
+            for state in self._streamed_elems.values():
+                state[2] = True
+            self._flush(True)
+            if self.elem_root.elems:
+                raise RuntimeError("Some elements could not be written, their arrays have not been compressed")
+            # Same as `elem_root._write_children()` in `write`.
+            self._file.write(_BLOCK_SENTINEL_DATA)
+            _write_footer(self._file.write, self._file.tell, self.version)
+        except BaseException:
+            self.abort()
+            raise
+        self._file.close()
+        self._file = None
+        # Only replace the target file once the new one is complete.
+        os.replace(self.tmp_fn, self.fn)
+
+    def abort(self):
+        """Stop writing, removing the partially written temporary file, any existing file at `fn` is left untouched."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            os.remove(self.tmp_fn)
+
+    def open_elem(self, elem):
+        """Write the children of `elem`, which must be a child of the root element, as soon as they are complete,
+        instead of waiting for `elem` itself to be complete."""
+        assert elem in self.elem_root.elems
+        assert elem not in self._streamed_elems
+        self._streamed_elems[elem] = [-1, -1, False, False]
+
+    def close_elem(self, elem):
+        """Mark an element given to `open_elem` as complete, once all of its children have been added."""
+        self._streamed_elems[elem][2] = True
+        self._flush(False)
+
+    def flush(self):
+        """Write all complete elements, and remove them from the tree."""
+        self._flush(False)
+
+    def _flush(self, is_root_closed):
+        elems = self.elem_root.elems
+        if not elems:
+            return
+
+        if not self._timedate_hack_done:
+            # hack since we don't decode time.
+            # ideally we would _not_ modify this data.
+            _write_timedate_hack(self.elem_root)
+            self._timedate_hack_done = True
+
+        write = self._file.write
+        tell = self._file.tell
+        elem_last = elems[-1]
+        num_written = 0
+        for elem in elems:
+            is_last = elem is elem_last
+            state = self._streamed_elems.get(elem)
+            if state is not None:
+                if not self._flush_streamed_elem(elem, state, is_last, is_root_closed):
+                    break
+                del self._streamed_elems[elem]
+            else:
+                if (is_last and not is_root_closed) or not elem._is_complete():
+                    break
+                elem._calc_offsets(tell(), is_last)
+                elem._write(write, tell, is_last)
+            num_written += 1
+        # Free the written elements.
+        del elems[:num_written]
+
+    def _flush_streamed_elem(self, elem, state, is_last, is_root_closed):
+        """Write the complete children of a streamed element, writing its header first if needed.
+
+        Returns whether the element is done, i.e. it has been closed and entirely written."""
+        f = self._file
+        write = f.write
+        tell = f.tell
+        header_offset, props_length, is_closed, has_written_children = state
+        if header_offset == -1:
+            if ... in elem.props:
+                return False
+            header_offset = tell()
+            props_length = 0
+            for data in elem.props:
+                # 1 byte for the prop type
+                props_length += 1 + len(data)
+            # The end offset is not known yet, it is patched in once the element is done.
+            write(pack(_ELEM_META_FORMAT, 0, len(elem.props), props_length))
+            write(bytes((len(elem.id),)))
+            write(elem.id)
+            for i, data in enumerate(elem.props):
+                write(bytes((elem.props_type[i],)))
+                write(data)
+            state[0] = header_offset
+            state[1] = props_length
+
+        children = elem.elems
+        if children:
+            child_last = children[-1]
+            num_written = 0
+            for child in children:
+                child_is_last = child is child_last
+                if (child_is_last and not is_closed) or not child._is_complete():
+                    break
+                child._calc_offsets(tell(), child_is_last)
+                child._write(write, tell, child_is_last)
+                num_written += 1
+            if num_written:
+                state[3] = has_written_children = True
+                # Free the written children.
+                del children[:num_written]
+
+        if not is_closed or children or (is_last and not is_root_closed):
+            return False
+
+        # Same rules as in FBXElem._write_children.
+        if has_written_children:
+            write(_BLOCK_SENTINEL_DATA)
+        elif (not elem.props and not is_last) or elem.id in _ELEMS_ID_ALWAYS_BLOCK_SENTINEL:
+            write(_BLOCK_SENTINEL_DATA)
 
-        # unknown magic (always the same)
-        write(b'\0' * 120)
-        write(b'\xf8\x5a\x8c\x6a\xde\xf5\xd9\x7e\xec\xe9\x0c\xe3\x75\x8f\x29\x0b')
+        # Patch in the end offset.
+        end_offset = tell()
+        f.seek(header_offset)
+        write(pack(_ELEM_META_FORMAT, end_offset, len(elem.props), props_length))
+        f.seek(end_offset)
+        return True
@@ -4,6 +4,7 @@ import numpy as np
 import os
 import time
 
+from contextlib import ExitStack
 from itertools import zip_longest
 # COMPAT ADD BEGIN
 try:
@@ -74,6 +75,9 @@ from .fbx_utils import (
     elem_data_single_bytes, elem_data_single_string, elem_data_single_string_unicode,
     elem_data_single_bool_array, elem_data_single_int32_array, elem_data_single_int64_array,
     elem_data_single_float32_array, elem_data_single_float64_array, elem_data_vec_float64,
+    # UnDrew Add Start : Share the props of identical array elements.
+    elem_data_single_array_shared,
+    # UnDrew Add End
     # FBX element properties.
     elem_properties, elem_props_set, elem_props_compound,
     # FBX element properties handling templates.
@@ -84,6 +88,12 @@ from .fbx_utils import (
     AnimationCurveNodeWrapper,
     # Objects.
     ObjectWrapper, fbx_name_class, ensure_object_not_in_edit_mode,
+    # UnDrew Add Start : Fast bone matrices for animation baking.
+    UE3ArmaturePoseMatrices, matrices_to_loc_euler_scale,
+    # UnDrew Add End
+    # UnDrew Add Start : Incremental batch export of animations.
+    UE3BatchManifest, UE3_batch_scene_hash, UE3_batch_anim_hash,
+    # UnDrew Add End
     # Top level.
     FBXExportSettingsMedia, FBXExportSettings, FBXExportData,
 )
@@ -96,6 +106,13 @@ from . import fbx_api_compat as api_compat
 from collections.abc import Iterable
 # UnDrew Add End
 
+# UnDrew Add Start : Batch export Anims.
+# How many animation files are generated before waiting for their arrays to be compressed and finishing writing them.
+# The files of a group only share the array compression threads, so that compressing the arrays of a file overlaps with
+# generating the next ones, the files themselves are still generated one after the other on the main thread.
+UE3_BATCH_ANIMS_GROUP_SIZE = 8
+# UnDrew Add End
+
 # Units converters!
 convert_sec_to_ktime = units_convertor("second", "ktime")
 convert_sec_to_ktime_iter = units_convertor_iter("second", "ktime")
@@ -2278,14 +2295,20 @@ def fbx_data_object_elements(root, ob_obj, scene_data):
     elem_props_template_finalize(tmpl, props)
 
 
-def fbx_data_animation_elements(root, scene_data):
+def fbx_data_animation_elements(root, scene_data, flush=None):
     """
     Write animation data.
+    `flush` is called after each animation curve node, see fbx_objects_elements.
     """
     animations = scene_data.animations
     if not animations:
         return
 
+    # UnDrew Add Start : Identical curve arrays, e.g. the KeyTime of every fully keyed curve, share their converted and
+    #                    compressed data, see elem_data_single_array_shared.
+    shared_props = {}
+    # UnDrew Add End
+
     # Animation stacks.
     for astack_key, alayers, alayer_key, name, f_start, f_end in animations:
         astack = elem_data_single_int64(root, b"AnimationStack", get_fbx_uuid_from_key(astack_key))
@@ -2350,13 +2373,22 @@ def fbx_data_animation_elements(root, scene_data):
                         # And now, the *real* data!
                         elem_data_single_float64(acurve, b"Default", def_value)
                         elem_data_single_int32(acurve, b"KeyVer", FBX_ANIM_KEY_VERSION)
-                        elem_data_single_int64_array(acurve, b"KeyTime", astype_view_signedness(keys, np.int64))
-                        elem_data_single_float32_array(acurve, b"KeyValueFloat", values.astype(np.float32, copy=False))
-                        elem_data_single_int32_array(acurve, b"KeyAttrFlags", keyattr_flags)
-                        elem_data_single_float32_array(acurve, b"KeyAttrDataFloat", keyattr_datafloat)
-                        elem_data_single_int32_array(acurve, b"KeyAttrRefCount", (nbr_keys,))
+                        # UnDrew Edit Start : Share the props of identical arrays.
+                        elem_data_single_array_shared(acurve, b"KeyTime", astype_view_signedness(keys, np.int64),
+                                                      "add_int64_array", shared_props)
+                        elem_data_single_array_shared(acurve, b"KeyValueFloat", values.astype(np.float32, copy=False),
+                                                      "add_float32_array", shared_props)
+                        elem_data_single_array_shared(acurve, b"KeyAttrFlags", keyattr_flags,
+                                                      "add_int32_array", shared_props)
+                        elem_data_single_array_shared(acurve, b"KeyAttrDataFloat", keyattr_datafloat,
+                                                      "add_float32_array", shared_props)
+                        elem_data_single_array_shared(acurve, b"KeyAttrRefCount", (nbr_keys,),
+                                                      "add_int32_array", shared_props)
+                        # UnDrew Edit End
 
                 elem_props_template_finalize(acn_tmpl, acn_props)
+                if flush is not None:
+                    flush()
 
 
 # ##### Top-level FBX data container. #####
@@ -2488,10 +2520,37 @@ def fbx_generate_leaf_bones(settings, data_bones):
     return leaf_bones
 
 
+# UnDrew Add Start : Shared by fbx_animations_do_multi and incremental batch export of animations.
+def UE3_get_anim_stack_name(scene_data, ref_id):
+    """Return the (bytes) name of the animstack of `ref_id`."""
+    # Auto-gen a name from the last element of an iterable, if requested.
+    # NOTE: Using isinstance() for this, to stay consistent with fbx_utils.
+    #       This relies on importing Iterable from collections.abc tho.
+    if scene_data.settings.UE3_remove_anim_object_prefix and isinstance(ref_id, Iterable):
+        return get_blenderID_name(ref_id[-1]).encode()
+    return (get_blenderID_name(ref_id) if ref_id else scene_data.scene.name).encode()
+
+
+def UE3_get_batch_anim_filename(name):
+    """Return the name of the file of the animstack named `name` (bytes), when batch-exporting animations."""
+    # Decode to a string, since it seems ( bpy.path.clean_name ) has an oversight with bytes.
+    return bpy.path.clean_name(name.decode(errors='replace')) + ".fbx"
+# UnDrew Add End
+
+
 def fbx_animations_do(scene_data, ref_id, f_start, f_end, start_zero, objects=None, force_keep=False):
     """
     Generate animation data (a single AnimStack) from objects, for a given frame range.
     """
+    return fbx_animations_do_multi(scene_data, ((ref_id, objects),), f_start, f_end, start_zero, force_keep)[0]
+
+
+def fbx_animations_do_multi(scene_data, stacks, f_start, f_end, start_zero, force_keep=False):
+    """
+    Generate animation data (one AnimStack per `(ref_id, objects)` item of `stacks`) for a given frame range, baking the
+    objects of all stacks in the same pass over the frame range.
+    Objects of different stacks are expected to be animated independently from each other.
+    """
     bake_step = scene_data.settings.bake_anim_step
     simplify_fac = scene_data.settings.bake_anim_simplify_factor
     scene = scene_data.scene
@@ -2500,41 +2559,41 @@ def fbx_animations_do(scene_data, ref_id, f_start, f_end, start_zero, objects=No
     force_sek = scene_data.settings.bake_anim_force_startend_keying
     gscale = scene_data.settings.global_scale
 
-    if objects is not None:
-        # UnDrew Add Start : Sets are unordered, but InheritType requires parent-first order. Use dicts instead.
-        objects = {ob_obj: None for ob_obj in objects}
-        # UnDrew Add End
-        # Add bones and duplis!
-        for ob_obj in tuple(objects):
-            if not ob_obj.is_object:
-                continue
-            if ob_obj.type == 'ARMATURE':
-                # UnDrew Edit : Use dicts instead.
-                objects |= {bo_obj: None for bo_obj in ob_obj.bones if bo_obj in scene_data.objects}
-            for dp_obj in ob_obj.dupli_list_gen(depsgraph):
-                if dp_obj in scene_data.objects:
+    stacks_objects = []
+    for _ref_id, objects in stacks:
+        if objects is not None:
+            # UnDrew Add Start : Sets are unordered, but InheritType requires parent-first order. Use dicts instead.
+            objects = {ob_obj: None for ob_obj in objects}
+            # UnDrew Add End
+            # Add bones and duplis!
+            for ob_obj in tuple(objects):
+                if not ob_obj.is_object:
+                    continue
+                if ob_obj.type == 'ARMATURE':
                     # UnDrew Edit : Use dicts instead.
-                    objects[dp_obj] = None
-    else:
-        objects = scene_data.objects
+                    objects |= {bo_obj: None for bo_obj in ob_obj.bones if bo_obj in scene_data.objects}
+                for dp_obj in ob_obj.dupli_list_gen(depsgraph):
+                    if dp_obj in scene_data.objects:
+                        # UnDrew Edit : Use dicts instead.
+                        objects[dp_obj] = None
+        else:
+            objects = scene_data.objects
+        stacks_objects.append(objects)
 
     back_currframe = scene.frame_current
+    # Default loc/rot/scale of all objects to bake, from all stacks.
     animdata_ob = {}
     p_rots = {}
 
-    for ob_obj in objects:
-        if ob_obj.parented_to_armature:
-            continue
-        ACNW = AnimationCurveNodeWrapper
-        loc, rot, scale, _m, _mr = ob_obj.fbx_object_tx(scene_data)
-        rot_deg = tuple(convert_rad_to_deg_iter(rot))
-        force_key = (simplify_fac == 0.0) or (ob_obj.is_bone and force_keying)
-        animdata_ob[ob_obj] = (ACNW(ob_obj.key, 'LCL_TRANSLATION', force_key, force_sek, loc),
-                               ACNW(ob_obj.key, 'LCL_ROTATION', force_key, force_sek, rot_deg),
-                               ACNW(ob_obj.key, 'LCL_SCALING', force_key, force_sek, scale))
-        p_rots[ob_obj] = rot
-
-    force_key = (simplify_fac == 0.0)
+    for objects in stacks_objects:
+        for ob_obj in objects:
+            if ob_obj.parented_to_armature or ob_obj in animdata_ob:
+                continue
+            loc, rot, scale, _m, _mr = ob_obj.fbx_object_tx(scene_data)
+            rot_deg = tuple(convert_rad_to_deg_iter(rot))
+            animdata_ob[ob_obj] = (loc, rot_deg, scale)
+            p_rots[ob_obj] = rot
+
     animdata_shapes = {}
 
     for me, (me_key, _shapes_key, shapes) in scene_data.data_deformers_shape.items():
@@ -2542,24 +2601,36 @@ def fbx_animations_do(scene_data, ref_id, f_start, f_end, start_zero, objects=No
         if not me.shape_keys.use_relative:
             continue
         for shape, (channel_key, geom_key, _shape_verts_co, _shape_verts_nors, _shape_verts_idx) in shapes.items():
-            acnode = AnimationCurveNodeWrapper(channel_key, 'SHAPE_KEY', force_key, force_sek, (0.0,))
-            # Sooooo happy to have to twist again like a mad snake... Yes, we need to write those curves twice. :/
-            acnode.add_group(me_key, shape.name, shape.name, (shape.name,))
-            animdata_shapes[channel_key] = (acnode, me, shape)
+            animdata_shapes[channel_key] = (me_key, me, shape)
 
     animdata_cameras = {}
     for cam_obj, cam_key in scene_data.data_cameras.items():
         cam = cam_obj.bdata.data
-        acnode_lens = AnimationCurveNodeWrapper(cam_key, 'CAMERA_FOCAL', force_key, force_sek, (cam.lens,))
-        acnode_focus_distance = AnimationCurveNodeWrapper(cam_key, 'CAMERA_FOCUS_DISTANCE', force_key,
-                                                          force_sek, (cam.dof.focus_distance,))
-        animdata_cameras[cam_key] = (acnode_lens, acnode_focus_distance, cam)
+        animdata_cameras[cam_key] = (cam.lens, cam.dof.focus_distance, cam)
 
     # Get all parent bdata of animated dupli instances, so that we can quickly identify which instances in
     # `depsgraph.object_instances` are animated and need their ObjectWrappers' matrices updated each frame.
     dupli_parent_bdata = {dup.get_parent().bdata for dup in animdata_ob if dup.is_dupli}
     has_animated_duplis = bool(dupli_parent_bdata)
 
+    # UnDrew Add Start : Compute the local-space matrices of all bones of each armature at once, each frame.
+    #                    The FBX matrices of (most) bones are computed at once too, and only decomposed after the sweep.
+    armatures_pose_matrices = []
+    baked_bones = []
+    if fbx_utils.UE3_BONE_POSE_MODE != 'RNA':
+        armatures = {}
+        for ob_obj in animdata_ob:
+            if ob_obj.is_bone:
+                armatures.setdefault(ob_obj.armature, []).append(ob_obj)
+        for arm_obj, arm_bones in armatures.items():
+            arm_pose_matrices = UE3ArmaturePoseMatrices(arm_obj)
+            baked_bones.extend(arm_pose_matrices.set_baked_bones(scene_data, arm_bones))
+            armatures_pose_matrices.append(arm_pose_matrices)
+    # Objects which still need their transform to be computed by `fbx_object_tx()` each frame.
+    baked_bones_set = set(baked_bones)
+    animdata_ob_tx = [ob_obj for ob_obj in animdata_ob if ob_obj not in baked_bones_set]
+    # UnDrew Add End
+
     # Initialize keyframe times array. Each AnimationCurveNodeWrapper will share the same instance.
     # `np.arange` excludes the `stop` argument like when using `range`, so we use np.nextafter to get the next
     # representable value after f_end and use that as the `stop` argument instead.
@@ -2569,6 +2640,11 @@ def fbx_animations_do(scene_data, ref_id, f_start, f_end, start_zero, objects=No
     fps = scene.render.fps / scene.render.fps_base
     real_currframes = currframes - f_start if start_zero else currframes
     real_currframes = (real_currframes / fps * FBX_KTIME).astype(np.int64)
+    num_frames = len(real_currframes)
+
+    # UnDrew Add Start : FBX matrices of the baked bones, for each frame.
+    baked_bones_mats = np.empty((num_frames, len(baked_bones), 4, 4))
+    # UnDrew Add End
 
     # Generator that yields the animated values of each frame in order.
     def frame_values_gen():
@@ -2577,15 +2653,14 @@ def fbx_animations_do(scene_data, ref_id, f_start, f_end, start_zero, objects=No
         subframes = currframes - int_currframes
 
         # Create simpler iterables that return only the values we care about.
-        animdata_shapes_only = [shape for _anim_shape, _me, shape in animdata_shapes.values()]
-        animdata_cameras_only = [camera for _anim_camera_lens, _anim_camera_focus_distance, camera
-                                 in animdata_cameras.values()]
-        # Previous frame's rotation for each object in animdata_ob, this will be updated each frame.
-        animdata_ob_p_rots = p_rots.values()
+        animdata_shapes_only = [shape for _me_key, _me, shape in animdata_shapes.values()]
+        animdata_cameras_only = [camera for _lens, _focus_distance, camera in animdata_cameras.values()]
+        # Previous frame's rotation for each object in animdata_ob_tx, this will be updated each frame.
+        animdata_ob_p_rots = [p_rots[ob_obj] for ob_obj in animdata_ob_tx]
 
         # Iterate through each frame and yield the values for that frame.
         # Iterating .data, the memoryview of an array, is faster than iterating the array directly.
-        for int_currframe, subframe in zip(int_currframes.data, subframes.data):
+        for frame_idx, (int_currframe, subframe) in enumerate(zip(int_currframes.data, subframes.data)):
             scene.frame_set(int_currframe, subframe=subframe)
 
             if has_animated_duplis:
@@ -2599,8 +2674,17 @@ def fbx_animations_do(scene_data, ref_id, f_start, f_end, start_zero, objects=No
                         # ObjectWrapper caches its instances. Attempting to create a new instance updates the existing
                         # ObjectWrapper instance with the current frame's matrix and then returns the existing instance.
                         ObjectWrapper(dup)
+            # UnDrew Add Start : Compute the local-space matrices of all bones of each armature at once.
+            baked_start = 0
+            for arm_pose_matrices in armatures_pose_matrices:
+                arm_pose_matrices.update()
+                if arm_pose_matrices.baked_bones:
+                    baked_end = baked_start + len(arm_pose_matrices.baked_bones)
+                    baked_bones_mats[frame_idx, baked_start:baked_end] = arm_pose_matrices.baked_matrices
+                    baked_start = baked_end
+            # UnDrew Add End
             next_p_rots = []
-            for ob_obj, p_rot in zip(animdata_ob, animdata_ob_p_rots):
+            for ob_obj, p_rot in zip(animdata_ob_tx, animdata_ob_p_rots):
                 # We compute baked loc/rot/scale for all objects (rot being euler-compat with previous value!).
                 loc, rot, scale, _m, _mr = ob_obj.fbx_object_tx(scene_data, rot_euler_compat=p_rot)
                 next_p_rots.append(rot)
@@ -2615,12 +2699,24 @@ def fbx_animations_do(scene_data, ref_id, f_start, f_end, start_zero, objects=No
                 yield camera.dof.focus_distance
 
     # Providing `count` to np.fromiter pre-allocates the array, avoiding extra memory allocations while iterating.
-    num_ob_values = len(animdata_ob) * 9  # Location, rotation and scale, each of which have x, y, and z components
+    num_ob_values = len(animdata_ob_tx) * 9  # Location, rotation and scale, each of which have x, y, and z components
     num_shape_values = len(animdata_shapes)  # Only 1 value per shape key
     num_camera_values = len(animdata_cameras) * 2  # Focal length (`.lens`) and focus distance
     num_values_per_frame = num_ob_values + num_shape_values + num_camera_values
-    num_frames = len(real_currframes)
-    all_values_flat = np.fromiter(frame_values_gen(), dtype=float, count=num_frames * num_values_per_frame)
+    # UnDrew Edit Start : When only baked bones are animated, there are no values to yield, but the frames must still be
+    #                     stepped through.
+    if num_values_per_frame or not baked_bones:
+        all_values_flat = np.fromiter(frame_values_gen(), dtype=float, count=num_frames * num_values_per_frame)
+    else:
+        for _value in frame_values_gen():
+            pass
+        all_values_flat = np.empty(0, dtype=float)
+    # UnDrew Edit End
+
+    # UnDrew Add Start : Do not leave any precomputed bone matrix behind, the pose will change from now on.
+    for arm_pose_matrices in armatures_pose_matrices:
+        arm_pose_matrices.clear()
+    # UnDrew Add End
 
     # Restore the scene's current frame.
     scene.frame_set(back_currframe, subframe=0.0)
@@ -2635,72 +2731,110 @@ def fbx_animations_do(scene_data, ref_id, f_start, f_end, start_zero, objects=No
     split_at = np.cumsum(split_at[:-1])
     all_ob_values, all_shape_key_values, all_camera_values = np.split(all_values, split_at)
 
-    all_anims = []
-
-    # Set location/rotation/scale curves.
     # Split into equal sized views of the arrays for each object.
-    split_into = len(animdata_ob)
+    split_into = len(animdata_ob_tx)
     per_ob_values = np.split(all_ob_values, split_into) if split_into > 0 else ()
-    for anims, ob_values in zip(animdata_ob.values(), per_ob_values):
+    ob_values_xyz = {}
+    for ob_obj, ob_values in zip(animdata_ob_tx, per_ob_values):
         # Split again into equal sized views of the location, rotation and scaling arrays.
         loc_xyz, rot_xyz, sca_xyz = np.split(ob_values, 3)
         # In-place convert from Blender rotation to FBX rotation.
         np.rad2deg(rot_xyz, out=rot_xyz)
+        ob_values_xyz[ob_obj] = (loc_xyz, rot_xyz, sca_xyz)
+
+    # UnDrew Add Start : Decompose the FBX matrices of the baked bones, for all frames at once.
+    if baked_bones:
+        # Each frame's rotation is euler-compat with the previous frame's one, starting from the default rotation.
+        euler_compat = np.array([p_rots[bo_obj] for bo_obj in baked_bones])
+        loc, rot, scale = matrices_to_loc_euler_scale(baked_bones_mats, euler_compat=euler_compat)
+        # In-place convert from Blender rotation to FBX rotation.
+        np.rad2deg(rot, out=rot)
+        # Same layout as `all_ob_values`: each row is all values of a single curve.
+        baked_values = np.concatenate((loc, rot, scale), axis=2).transpose(1, 2, 0)
+        for bo_obj, bo_values in zip(baked_bones, baked_values):
+            ob_values_xyz[bo_obj] = tuple(np.split(bo_values, 3))
+    # UnDrew Add End
+
+    # In-place convert from Blender Shape Key Value to FBX Deform Percent.
+    all_shape_key_values *= 100.0
 
-        anim_loc, anim_rot, anim_scale = anims
-        anim_loc.set_keyframes(real_currframes, loc_xyz)
-        anim_rot.set_keyframes(real_currframes, rot_xyz)
-        anim_scale.set_keyframes(real_currframes, sca_xyz)
-        all_anims.extend(anims)
-
-    # Set shape key curves.
-    # There's only one array per shape key, so there's no need to split `all_shape_key_values`.
-    for (anim_shape, _me, _shape), shape_key_values in zip(animdata_shapes.values(), all_shape_key_values):
-        # In-place convert from Blender Shape Key Value to FBX Deform Percent.
-        shape_key_values *= 100.0
-        anim_shape.set_keyframes(real_currframes, shape_key_values)
-        all_anims.append(anim_shape)
-
-    # Set camera curves.
     # Split into equal sized views of the arrays for each camera.
     split_into = len(animdata_cameras)
     per_camera_values = np.split(all_camera_values, split_into) if split_into > 0 else ()
-    zipped = zip(animdata_cameras.values(), per_camera_values)
-    for (anim_camera_lens, anim_camera_focus_distance, _camera), (lens_values, focus_distance_values) in zipped:
+    for _lens_values, focus_distance_values in per_camera_values:
         # In-place convert from Blender focus distance to FBX.
         focus_distance_values *= (1000 * gscale)
-        anim_camera_lens.set_keyframes(real_currframes, lens_values)
-        anim_camera_focus_distance.set_keyframes(real_currframes, focus_distance_values)
-        all_anims.append(anim_camera_lens)
-        all_anims.append(anim_camera_focus_distance)
-
-    animations = {}
-
-    # And now, produce final data (usable by FBX export code)
-    for anim in all_anims:
-        anim.simplify(simplify_fac, bake_step, force_keep)
-        if not anim:
-            continue
-        for obj_key, group_key, group, fbx_group, fbx_gname in anim.get_final_data(scene, ref_id, force_keep):
-            anim_data = animations.setdefault(obj_key, ("dummy_unused_key", {}))
-            anim_data[1][fbx_group] = (group_key, group, fbx_gname)
-
-    astack_key = get_blender_anim_stack_key(scene, ref_id)
-    alayer_key = get_blender_anim_layer_key(scene, ref_id)
-    # UnDrew Add Start : Auto-gen a name from the last element of an iterable, if requested.
-    # NOTE: Using isinstance() for this, to stay consistent with fbx_utils.
-    #       This relies on importing Iterable from collections.abc tho.
-    if scene_data.settings.UE3_remove_anim_object_prefix and isinstance(ref_id, Iterable):
-        name = get_blenderID_name(ref_id[-1]).encode()
-    else:
-    # UnDrew Add End
-        name = (get_blenderID_name(ref_id) if ref_id else scene.name).encode()
 
     if start_zero:
         f_end -= f_start
         f_start = 0.0
 
-    return (astack_key, animations, alayer_key, name, f_start, f_end) if animations else None
+    results = []
+    ACNW = AnimationCurveNodeWrapper
+    for (ref_id, _objects), objects in zip(stacks, stacks_objects):
+        all_anims = []
+
+        # Set location/rotation/scale curves.
+        for ob_obj in objects:
+            if ob_obj.parented_to_armature:
+                continue
+            loc, rot_deg, scale = animdata_ob[ob_obj]
+            loc_xyz, rot_xyz, sca_xyz = ob_values_xyz[ob_obj]
+            force_key = (simplify_fac == 0.0) or (ob_obj.is_bone and force_keying)
+            anim_loc = ACNW(ob_obj.key, 'LCL_TRANSLATION', force_key, force_sek, loc)
+            anim_rot = ACNW(ob_obj.key, 'LCL_ROTATION', force_key, force_sek, rot_deg)
+            anim_scale = ACNW(ob_obj.key, 'LCL_SCALING', force_key, force_sek, scale)
+            anim_loc.set_keyframes(real_currframes, loc_xyz)
+            anim_rot.set_keyframes(real_currframes, rot_xyz)
+            anim_scale.set_keyframes(real_currframes, sca_xyz)
+            all_anims.extend((anim_loc, anim_rot, anim_scale))
+
+        force_key = (simplify_fac == 0.0)
+
+        # Set shape key curves.
+        # There's only one array per shape key, so there's no need to split `all_shape_key_values`.
+        zipped = zip(animdata_shapes.items(), all_shape_key_values)
+        for (channel_key, (me_key, _me, shape)), shape_key_values in zipped:
+            anim_shape = ACNW(channel_key, 'SHAPE_KEY', force_key, force_sek, (0.0,))
+            # Sooooo happy to have to twist again like a mad snake... Yes, we need to write those curves twice. :/
+            anim_shape.add_group(me_key, shape.name, shape.name, (shape.name,))
+            anim_shape.set_keyframes(real_currframes, shape_key_values)
+            all_anims.append(anim_shape)
+
+        # Set camera curves.
+        zipped = zip(animdata_cameras.items(), per_camera_values)
+        for (cam_key, (lens, focus_distance, _camera)), (lens_values, focus_distance_values) in zipped:
+            anim_camera_lens = ACNW(cam_key, 'CAMERA_FOCAL', force_key, force_sek, (lens,))
+            anim_camera_focus_distance = ACNW(cam_key, 'CAMERA_FOCUS_DISTANCE', force_key, force_sek,
+                                              (focus_distance,))
+            anim_camera_lens.set_keyframes(real_currframes, lens_values)
+            anim_camera_focus_distance.set_keyframes(real_currframes, focus_distance_values)
+            all_anims.append(anim_camera_lens)
+            all_anims.append(anim_camera_focus_distance)
+
+        animations = {}
+
+        # And now, produce final data (usable by FBX export code)
+        # UnDrew Edit Start : Simplify the curves of all the wrappers at once, optionally by curve fitting.
+        ACNW.simplify_multi(all_anims, simplify_fac, bake_step, force_keep,
+                            fit=scene_data.settings.UE3_bake_anim_simplify_mode == 'FIT')
+        # UnDrew Edit End
+        for anim in all_anims:
+            if not anim:
+                continue
+            for obj_key, group_key, group, fbx_group, fbx_gname in anim.get_final_data(scene, ref_id, force_keep):
+                anim_data = animations.setdefault(obj_key, ("dummy_unused_key", {}))
+                anim_data[1][fbx_group] = (group_key, group, fbx_gname)
+
+        astack_key = get_blender_anim_stack_key(scene, ref_id)
+        alayer_key = get_blender_anim_layer_key(scene, ref_id)
+        # UnDrew Edit Start : Auto-gen a name from the last element of an iterable, if requested.
+        name = UE3_get_anim_stack_name(scene_data, ref_id)
+        # UnDrew Edit End
+
+        results.append((astack_key, animations, alayer_key, name, f_start, f_end) if animations else None)
+
+    return results
 
 
 def fbx_animations(scene_data):
@@ -2897,6 +3031,42 @@ def fbx_animations(scene_data):
                 if not ob_to.is_property_readonly(p):
                     setattr(ob_to, p, getattr(ob_from, p))
 
+        def can_bake_together(ob):
+            # Only objects whose transforms cannot be affected by the action of another object are baked in the same
+            # pass over the frame range as other objects.
+            if ob.parent or ob.is_instancer or ob.constraints or ob.animation_data.drivers:
+                return False
+            if ob.type == 'ARMATURE':
+                # Drivers of the armature data, e.g. on bone properties, could read another object.
+                if ob.data.animation_data and ob.data.animation_data.drivers:
+                    return False
+                for pbo in ob.pose.bones:
+                    for con in pbo.constraints:
+                        # 'pole_target' being the pole of IK constraints.
+                        targets = [getattr(con, 'target', None), getattr(con, 'pole_target', None)]
+                        targets += [tgt.target for tgt in getattr(con, 'targets', ())]
+                        if any(target not in {None, ob} for target in targets):
+                            return False
+            return True
+
+        # Shape keys and cameras are baked into every animstack, so if any of them could be affected by the action of
+        # an object, each action has to be baked on its own.
+        bake_together = not any(me.shape_keys.animation_data and me.shape_keys.animation_data.drivers
+                                for me in scene_data.data_deformers_shape)
+        bake_together = bake_together and not any(cam_obj.bdata.data.animation_data
+                                                  and cam_obj.bdata.data.animation_data.drivers
+                                                  for cam_obj in scene_data.data_cameras)
+
+        # UnDrew Add Start : Incremental batch export of animations.
+        manifest = scene_data.settings.UE3_batch_manifest
+        if manifest is not None:
+            # Before any object gets animated by another action.
+            manifest.load(UE3_batch_scene_hash(scene_data, manifest.extra))
+        # UnDrew Add End
+
+        ob_states = []
+        # (ob_state, act, act_slot) of every action to export, in export order.
+        jobs = []
         for ob_obj in scene_data.objects:
             # Actions only for objects, not bones!
             if not ob_obj.is_object:
@@ -2917,12 +3087,17 @@ def fbx_animations(scene_data):
             pbones_matrices = [pbo.matrix_basis.copy() for pbo in ob.pose.bones] if ob.type == 'ARMATURE' else ...
 
             org_act = ob.animation_data.action
+            org_act_slot = act_slot = None
             # COMPAT ADD BEGIN
             if api_compat.HAS_ANIM_LAYERED_1_STABLE:
             # COMPAT ADD END
                 org_act_slot = ob.animation_data.action_slot
             path_resolve = ob.path_resolve
 
+            ob_state = (ob_obj, ob_copy, pbones_matrices, org_act, org_act_slot,
+                        bake_together and can_bake_together(ob))
+            ob_states.append(ob_state)
+
             for act in bpy.data.actions:
                 # For now, *all* paths in the action must be valid for the object, to validate the action.
                 # Unless that action was already assigned to the object!
@@ -2938,28 +3113,32 @@ def fbx_animations(scene_data):
                         act_slot = find_validate_action_slot(act, path_resolve)
                     if not act_slot:
                         continue
-                ob.animation_data.action = act
-                # COMPAT ADD BEGIN
-                if api_compat.HAS_ANIM_LAYERED_1_STABLE:
-                # COMPAT ADD END
-                    ob.animation_data.action_slot = act_slot
-                frame_start, frame_end = act.frame_range  # sic!
-                add_anim(animations, animated,
-                         fbx_animations_do(scene_data, (ob, act), frame_start, frame_end, True,
-                                           objects={ob_obj}, force_keep=True))
-                # Ugly! :/
-                if pbones_matrices is not ...:
-                    for pbo, mat in zip(ob.pose.bones, pbones_matrices):
-                        pbo.matrix_basis = mat.copy()
-                ob.animation_data.action = org_act
-                # COMPAT ADD BEGIN
-                if api_compat.HAS_ANIM_LAYERED_1_STABLE:
-                # COMPAT ADD END
-                    if org_act:
-                        ob.animation_data.action_slot = org_act_slot
-                restore_object(ob, ob_copy)
-                scene.frame_set(scene.frame_current, subframe=0.0)
+                jobs.append((ob_state, act, act_slot))
+
+        # UnDrew Add Start : Incremental batch export of animations. Actions whose file is up to date are not baked,
+        #                    only the properties their animation animates are gathered from the manifest.
+        if manifest is not None:
+            jobs_filenames = [UE3_get_batch_anim_filename(UE3_get_anim_stack_name(scene_data, (ob_state[0].bdata, act)))
+                              for ob_state, act, _act_slot in jobs]
+            # Files written by more than one action end up with the last one, so they are always written again.
+            filenames_count = {}
+            for filename in jobs_filenames:
+                filenames_count[filename] = filenames_count.get(filename, 0) + 1
+            dirty_jobs = []
+            for (ob_state, act, act_slot), filename in zip(jobs, jobs_filenames):
+                if filenames_count[filename] == 1:
+                    kept_animated = manifest.keep(filename, UE3_batch_anim_hash(ob_state[0].bdata, act, act_slot))
+                    if kept_animated is not None:
+                        animated |= kept_animated
+                        continue
+                dirty_jobs.append((ob_state, act, act_slot))
+            jobs = dirty_jobs
+        # UnDrew Add End
 
+        def restore_ob_state(ob_state):
+            ob_obj, ob_copy, pbones_matrices, org_act, org_act_slot, _bake_together = ob_state
+            ob = ob_obj.bdata
+            # Ugly! :/
             if pbones_matrices is not ...:
                 for pbo, mat in zip(ob.pose.bones, pbones_matrices):
                     pbo.matrix_basis = mat.copy()
@@ -2970,9 +3149,51 @@ def fbx_animations(scene_data):
                 if org_act:
                     ob.animation_data.action_slot = org_act_slot
 
-            bpy.data.objects.remove(ob_copy)
+        def bake_jobs(job_indices):
+            # Bake the actions of all given jobs (one action per object, all sharing the same frame range) at once.
+            stacks = []
+            for job_idx in job_indices:
+                ob_state, act, act_slot = jobs[job_idx]
+                ob_obj = ob_state[0]
+                ob = ob_obj.bdata
+                ob.animation_data.action = act
+                # COMPAT ADD BEGIN
+                if api_compat.HAS_ANIM_LAYERED_1_STABLE:
+                # COMPAT ADD END
+                    ob.animation_data.action_slot = act_slot
+                stacks.append(((ob, act), (ob_obj,)))
+            frame_start, frame_end = jobs[job_indices[0]][1].frame_range  # sic!
+            for job_idx, anim in zip(job_indices, fbx_animations_do_multi(scene_data, stacks, frame_start, frame_end,
+                                                                          True, force_keep=True)):
+                jobs_anims[job_idx] = anim
+            for job_idx in job_indices:
+                ob_state = jobs[job_idx][0]
+                restore_ob_state(ob_state)
+                restore_object(ob_state[0].bdata, ob_state[1])
             scene.frame_set(scene.frame_current, subframe=0.0)
 
+        jobs_anims = [None] * len(jobs)
+        # {frame_range: {ob_obj: [job_idx, ...]}} of the jobs that can be baked together with other objects' jobs.
+        jobs_by_range = {}
+        for job_idx, (ob_state, act, _act_slot) in enumerate(jobs):
+            if ob_state[5]:
+                jobs_by_range.setdefault(tuple(act.frame_range), {}).setdefault(ob_state[0], []).append(job_idx)
+            else:
+                bake_jobs((job_idx,))
+        for ob_jobs in jobs_by_range.values():
+            # Each pass over the frame range bakes (at most) one action of each object.
+            for job_indices in zip_longest(*ob_jobs.values()):
+                bake_jobs([job_idx for job_idx in job_indices if job_idx is not None])
+
+        # Keep the same order of animstacks as if each action was baked on its own.
+        for anim in jobs_anims:
+            add_anim(animations, animated, anim)
+
+        for ob_state in ob_states:
+            restore_ob_state(ob_state)
+            bpy.data.objects.remove(ob_state[1])
+        scene.frame_set(scene.frame_current, subframe=0.0)
+
     # Global (containing everything) animstack, only if not exporting NLA strips and/or all actions.
     if not scene_data.settings.bake_anim_use_nla_strips and not scene_data.settings.bake_anim_use_all_actions:
         add_anim(animations, animated, fbx_animations_do(scene_data, None, scene.frame_start, scene.frame_end, False))
@@ -3813,35 +4034,64 @@ def fbx_definitions_elements(root, scene_data):
     fbx_templates_generate(definitions, scene_data.templates)
 
 
-def fbx_objects_elements(root, scene_data):
+def fbx_objects_elements(root, scene_data, stream_writer=None, elem_cache=None):
     """
     Data (objects, geometry, material, textures, armatures, etc.).
+    When given an encode_bin.StreamWriter, each object is written (and freed) as soon as it is done.
+    When given an elem_cache dict, the elements of meshes, armatures and materials are stored in it, and reused when
+    exporting the same data again to another file, instead of being generated (and compressed) again.
     """
     perfmon = PerfMon()
     perfmon.level_up()
     objects = elem_empty(root, b"Objects")
+    if stream_writer is not None:
+        stream_writer.open_elem(objects)
+        flush = stream_writer.flush
+    else:
+        def flush():
+            pass
+
+    def add_elems_cached(key, elems_func, *args):
+        if elem_cache is None:
+            elems_func(objects, *args)
+            return
+        cached_elems = elem_cache.get(key)
+        if cached_elems is None:
+            first_new_elem_idx = len(objects.elems)
+            elems_func(objects, *args)
+            elem_cache[key] = tuple(objects.elems[first_new_elem_idx:])
+        else:
+            objects.elems.extend(elem.copy() for elem in cached_elems)
 
     perfmon.step("FBX export fetch empties (%d)..." % len(scene_data.data_empties))
 
     for empty in scene_data.data_empties:
         fbx_data_empty_elements(objects, empty, scene_data)
+        flush()
 
     perfmon.step("FBX export fetch lamps (%d)..." % len(scene_data.data_lights))
 
     for lamp in scene_data.data_lights:
         fbx_data_light_elements(objects, lamp, scene_data)
+        flush()
 
     perfmon.step("FBX export fetch cameras (%d)..." % len(scene_data.data_cameras))
 
     for cam in scene_data.data_cameras:
         fbx_data_camera_elements(objects, cam, scene_data)
+        flush()
 
     perfmon.step("FBX export fetch meshes (%d)..."
                  % len({me_key for me_key, _me, _free in scene_data.data_meshes.values()}))
 
     done_meshes = set()
-    for me_obj in scene_data.data_meshes:
-        fbx_data_mesh_elements(objects, me_obj, scene_data, done_meshes)
+    for me_obj, (me_key, _me, _free) in scene_data.data_meshes.items():
+        if me_key in done_meshes:
+            continue
+        # Written data also depends on the (first) object using the mesh.
+        add_elems_cached((b"Geometry", me_key, me_obj.key), fbx_data_mesh_elements, me_obj, scene_data, done_meshes)
+        done_meshes.add(me_key)
+        flush()
     del done_meshes
 
     perfmon.step("FBX export fetch objects (%d)..." % len(scene_data.objects))
@@ -3854,30 +4104,42 @@ def fbx_objects_elements(root, scene_data):
             if dp_obj not in scene_data.objects:
                 continue
             fbx_data_object_elements(objects, dp_obj, scene_data)
+        flush()
 
     perfmon.step("FBX export fetch remaining...")
 
     for ob_obj in scene_data.objects:
         if not (ob_obj.is_object and ob_obj.type == 'ARMATURE'):
             continue
-        fbx_data_armature_elements(objects, ob_obj, scene_data)
+        # Written data also depends on which meshes are deformed by the armature.
+        skin_keys = tuple(skin_key for skin_key, _ob_obj, _clusters
+                          in scene_data.data_deformers_skin.get(ob_obj, {}).values())
+        add_elems_cached((b"Deformer", ob_obj.key, skin_keys), fbx_data_armature_elements, ob_obj, scene_data)
+        flush()
 
     if scene_data.data_leaf_bones:
         fbx_data_leaf_bone_elements(objects, scene_data)
+        flush()
 
     for ma in scene_data.data_materials:
-        fbx_data_material_elements(objects, ma, scene_data)
+        add_elems_cached((b"Material", scene_data.data_materials[ma][0]), fbx_data_material_elements, ma, scene_data)
+        flush()
 
     for blender_tex_key in scene_data.data_textures:
         fbx_data_texture_file_elements(objects, blender_tex_key, scene_data)
+        flush()
 
     for vid in scene_data.data_videos:
         fbx_data_video_elements(objects, vid, scene_data)
+        flush()
 
     perfmon.step("FBX export fetch animations...")
     start_time = time.process_time()
 
-    fbx_data_animation_elements(objects, scene_data)
+    fbx_data_animation_elements(objects, scene_data, flush)
+
+    if stream_writer is not None:
+        stream_writer.close_elem(objects)
 
     perfmon.level_down()
 
@@ -3974,6 +4236,7 @@ def save_single(operator, scene, depsgraph, filepath="",
                 UE3_nla_force_export=False,
                 UE3_export_scale_inheritance=True,
                 UE3_force_aligned_scaling=True,
+                UE3_bake_anim_simplify_mode='DIFF',
                 # UnDrew Add End
                 primary_bone_axis='Y',
                 secondary_bone_axis='X',
@@ -3988,6 +4251,12 @@ def save_single(operator, scene, depsgraph, filepath="",
                 armature_nodetype='NULL',
                 colors_type='SRGB',
                 prioritize_active_color=False,
+                # UnDrew Add Start : Selectable array compression.
+                UE3_array_compression='FAST',
+                # UnDrew Add End
+                # UnDrew Add Start : Opt-in worker processes for array compression.
+                UE3_use_worker_processes=False,
+                # UnDrew Add End
                 **kwargs
                 ):
 
@@ -4049,6 +4318,15 @@ def save_single(operator, scene, depsgraph, filepath="",
         set(),  # embedded_set
     )
 
+    # UnDrew Add Start : Incremental batch export of animations.
+    UE3_batch_manifest = None
+    if bake_anim and kwargs["UE3_batch_anims"] and kwargs["UE3_batch_incremental"]:
+        UE3_batch_manifest = UE3BatchManifest(
+            os.path.abspath(os.path.join(os.path.dirname(filepath), kwargs["UE3_batch_subpath"])),
+            (kwargs["UE3_batch_object_filter"], UE3_array_compression),
+        )
+    # UnDrew Add End
+
     settings = FBXExportSettings(
         operator.report, (axis_up, axis_forward), global_matrix, global_scale, apply_unit_scale, unit_scale,
         bake_space_transform, global_matrix_inv, global_matrix_inv_transposed,
@@ -4059,11 +4337,14 @@ def save_single(operator, scene, depsgraph, filepath="",
         UE3_dont_add_armature_bone, UE3_matrix_double_precision,
         UE3_rest_default_pose, UE3_remove_anim_object_prefix, UE3_nla_modular_anim_support,
         UE3_nla_only_animate_owner, UE3_nla_force_export,
-        UE3_export_scale_inheritance, UE3_force_aligned_scaling,
+        UE3_export_scale_inheritance, UE3_force_aligned_scaling, UE3_bake_anim_simplify_mode,
         # UnDrew Add End
         # UnDrew Add Start : Not settings, but should be held here for performance reasons.
         UE3_global_matrix_no_scale,
         # UnDrew Add End
+        # UnDrew Add Start : Incremental batch export of animations.
+        UE3_batch_manifest,
+        # UnDrew Add End
         bone_correction_matrix, bone_correction_matrix_inv,
         bake_anim, bake_anim_use_all_bones, bake_anim_use_nla_strips, bake_anim_use_all_actions,
         bake_anim_step, bake_anim_simplify_factor, bake_anim_force_startend_keying,
@@ -4087,6 +4368,10 @@ def save_single(operator, scene, depsgraph, filepath="",
         # Copy the animations list, since we'll wanna export each animation individually.
         all_animations = scene_data.animations.copy() if scene_data.animations else ()
 
+        # The elements of meshes, armatures and materials are the same in every exported file, so only generate (and
+        # compress) them once, and reuse them for every file including them.
+        elem_cache = {}
+
         # Let's export the main file, if needed.
         if not kwargs["UE3_batch_skip_main"]:
             # Clear animations so they're not exported here.
@@ -4095,18 +4380,19 @@ def save_single(operator, scene, depsgraph, filepath="",
 
             write_start = time.time()
 
-            with encode_bin.FBXElem.enable_multithreading_cm():
-                root = elem_empty(None, b"")
+            root = elem_empty(None, b"")
+            # Elements are written as soon as they are done, once their arrays have been compressed, so that the whole
+            # tree does not have to be kept in memory.
+            with encode_bin.StreamWriter(filepath, root, FBX_VERSION) as stream_writer, \
+                    encode_bin.FBXElem.enable_multithreading_cm(UE3_use_worker_processes, UE3_array_compression):
                 fbx_header_elements(root, scene_data)
                 fbx_documents_elements(root, scene_data)
                 fbx_references_elements(root, scene_data)
                 fbx_definitions_elements(root, scene_data)
-                fbx_objects_elements(root, scene_data)
+                fbx_objects_elements(root, scene_data, stream_writer, elem_cache)
                 fbx_connections_elements(root, scene_data)
                 fbx_takes_elements(root, scene_data)
 
-            encode_bin.write(filepath, root, FBX_VERSION)
-
             print('Spent %.4f sec. writing %r' % (time.time() - write_start, filepath))
 
             # Restore them (leaving things as we found them).
@@ -4147,175 +4433,216 @@ def save_single(operator, scene, depsgraph, filepath="",
             curr_anim_list = [None]
 
         # Then, export each individual animation.
-        for anim in all_animations:
-            curr_anim_list[0] = anim
-
-            # Cleanup persistent data related to creating FBX elements, left behind by the prev export (e.g. FBXTemplate.written).
-            for template in scene_data.templates.values():
-                template.written[0] = False
-
-            if UE3_batch_object_filter != 'ALL':
-                # Determine all objects related to the animation.
-                anim_objects = {}
-                alayers = anim[1]
-                for ob_key in alayers.keys():
-                    ob_obj = object_wrapper_cache.get(ob_key)
-                    if ob_obj is None:
-                        continue
-                    if ob_obj.is_bone:
-                        # Don't gather any bones for now, just their armatures. For the sake of consistency
-                        # and performance, all bones of an armature will be exported.
-                        anim_objects[ob_obj.armature] = None
-                    else:
-                        anim_objects[ob_obj] = None
-
-                # Now that we know our animation's objects, only filter everything else if this object list actually differs from the last.
-                # NOTE: With dictionaries, "==" checks the object contents, not the object addresses.
-                if prev_anim_objects_no_bones is not None and anim_objects == prev_anim_objects_no_bones:
-                    # It's the same, so let's just use the prev list with bones.
-                    anim_objects = prev_anim_objects
-                else:
-                    # Now that we're sure this anim uses different objects from prev, let's mark this as the new prev, and include all bones.
-                    prev_anim_objects_no_bones = anim_objects.copy()
-                    for ob_obj in tuple(anim_objects):
-                        if not ob_obj.is_object:
-                            continue
-                        if ob_obj.type == 'ARMATURE':
-                            # TBH I'm not sure why there's a condition here... is there ever a situation where a bone *isn't* part of the ObjectWrapper list?
-                            anim_objects |= {bo_obj: None for bo_obj in ob_obj.bones if bo_obj in scene_data.objects}
-                            if UE3_batch_object_filter == 'ONLY_OWNER_AND_MESH':
-                                deformers = scene_data.data_deformers_skin[ob_obj]
-                                # NOTE: deformer[1] is the mesh object (ObjectWrapper) that a deformer is linked to.
-                                anim_objects |= {deformer[1]: None for deformer in deformers.values()}
-                    prev_anim_objects = anim_objects
-
-                    # Checks if a blender mesh data is present in data_meshes.
-                    def is_me_in_data_meshes(me, anim_data_meshes):
-                        # mesh_data[1] = The blender mesh data in a data_meshes entry.
-                        return any(me is mesh_data[1] for mesh_data in anim_data_meshes.values())
-
-                    # Time to filter the scene_data's other properties, so the FBX file doesn't save any garbage data
-                    # unrelated to this batched animation.
-
-                    # Only mesh data for our filtered objects.
-                    anim_data_meshes = {ob_obj: d
-                                        for ob_obj, d in scene_data.data_meshes.items() if ob_obj in anim_objects}
-                    # Only material data referenced by our filtered objects.
-                    # d[1] = the objects a material is applied on.
-                    anim_data_materials = {ma: d
-                                           for ma, d in scene_data.data_materials.items() if any(ob_obj in anim_objects for ob_obj in d[1])}
-                    # Only material index data for our used meshes.
-                    anim_mesh_material_indices = {me: d
-                                                  for me, d in scene_data.mesh_material_indices.items() if is_me_in_data_meshes(me, anim_data_meshes)}
-                    # Only textures referenced by our materials.
-                    # blender_tex_key = (material, socket) combo. [0] is a material.
-                    anim_data_textures = {blender_tex_key: d
-                                          for blender_tex_key, d in scene_data.data_textures.items() if blender_tex_key[0] in anim_data_materials.keys()}
-                    # Only "videos" (images) used by textures.
-                    # blender_tex_key = Same as above, but "videos" (images) have a whole list of them (d[1]).
-                    anim_data_videos = {img: d
-                                        for img, d in scene_data.data_videos.items() if any(blender_tex_key in anim_data_textures.keys() for blender_tex_key in d[1])}
-                    # Only bone data for our filtered objects.
-                    anim_data_bones = {ob_obj: d
-                                       for ob_obj, d in scene_data.data_bones.items() if ob_obj in anim_objects}
-                    # Only shape data for our used meshes.
-                    anim_data_deformers_shape = {me: d
-                                                 for me, d in scene_data.data_deformers_shape.items() if is_me_in_data_meshes(me, anim_data_meshes)}
-                    # Only skinning data for our used meshes and bones.
-                    anim_data_deformers_skin = {}
-                    for ob_obj, d in scene_data.data_deformers_skin.items():
-                        if ob_obj not in anim_objects:
+        # Files are exported in groups sharing the same multithreaded array compression, so that generating a file
+        # does not have to wait for the arrays of the previous one to be compressed. Files are only finished writing
+        # once all the arrays of their group are compressed, so the group size bounds how many unfinished files are
+        # kept in memory.
+        with ExitStack() as group_stack:
+            stream_writers_stack = None
+            # (output_path, write_start) of the files of the current group.
+            group_files = []
+            for anim_idx, anim in enumerate(all_animations):
+                curr_anim_list[0] = anim
+
+                # Cleanup persistent data related to creating FBX elements, left behind by the prev export (e.g. FBXTemplate.written).
+                for template in scene_data.templates.values():
+                    template.written[0] = False
+
+                if UE3_batch_object_filter != 'ALL':
+                    # Determine all objects related to the animation.
+                    anim_objects = {}
+                    alayers = anim[1]
+                    for ob_key in alayers.keys():
+                        ob_obj = object_wrapper_cache.get(ob_key)
+                        if ob_obj is None:
                             continue
-                        d_filtered = {me: deformer for me, deformer in d.items() if deformer[1] in anim_data_meshes.keys()}
-                        if d_filtered:  # If, and only if, the deformer list actually has contents, after being filtered.
-                            anim_data_deformers_skin[ob_obj] = d_filtered
-
-                    # Though, regenerate these properties. This is much easier (and probably faster) than filtering the existing ones.
-                    anim_data_lights = {ob_obj.bdata.data: get_blenderID_key(ob_obj.bdata.data)
-                                        for ob_obj in anim_objects if ob_obj.type == 'LIGHT'}
-                    anim_data_cameras = {ob_obj: get_blenderID_key(ob_obj.bdata.data)
-                                         for ob_obj in anim_objects if ob_obj.type == 'CAMERA'}
-                    anim_data_empties = {ob_obj: get_blender_empty_key(ob_obj.bdata)
-                                         for ob_obj in anim_objects if ob_obj.type in {'EMPTY', 'ARMATURE'}}  # + armatures, they're considered empties!
-                    if scene_data.settings.add_leaf_bones:
-                        anim_data_leaf_bones = fbx_generate_leaf_bones(scene_data.settings, anim_data_bones)
+                        if ob_obj.is_bone:
+                            # Don't gather any bones for now, just their armatures. For the sake of consistency
+                            # and performance, all bones of an armature will be exported.
+                            anim_objects[ob_obj.armature] = None
+                        else:
+                            anim_objects[ob_obj] = None
+
+                    # Now that we know our animation's objects, only filter everything else if this object list actually differs from the last.
+                    # NOTE: With dictionaries, "==" checks the object contents, not the object addresses.
+                    if prev_anim_objects_no_bones is not None and anim_objects == prev_anim_objects_no_bones:
+                        # It's the same, so let's just use the prev list with bones.
+                        anim_objects = prev_anim_objects
                     else:
-                        anim_data_leaf_bones = []
-
-                    # TODO: Technically, connections, template users and whatnot should be filtered here. Though,
-                    #       as far as I can tell, the FBX SDK is able to cleanly ignore mistakes like that. So for
-                    #       now, I'll just leave it be, and see if it spawns any issues.
-
-            # In any case, pack everything to a scene_data, which will be used when exporting this anim.
-            # TODO: No idea what's the deal with frame_start and frame_end, seems to be (intentionally??)
-            #       overwritten when actions are being exported. So I'll just leave it as-is, for now...
-            anim_scene_data = FBXExportData(
-                scene_data.templates, scene_data.templates_users, scene_data.connections,
-                scene_data.settings, scene_data.scene, scene_data.depsgraph, anim_objects, curr_anim_list, scene_data.animated, scene_data.frame_start, scene_data.frame_end,
-                anim_data_empties, anim_data_lights, anim_data_cameras, anim_data_meshes, anim_mesh_material_indices,
-                anim_data_bones, anim_data_leaf_bones, anim_data_deformers_skin, anim_data_deformers_shape,
-                scene_data.data_world, anim_data_materials, anim_data_textures, anim_data_videos,
-            )
+                        # Now that we're sure this anim uses different objects from prev, let's mark this as the new prev, and include all bones.
+                        prev_anim_objects_no_bones = anim_objects.copy()
+                        for ob_obj in tuple(anim_objects):
+                            if not ob_obj.is_object:
+                                continue
+                            if ob_obj.type == 'ARMATURE':
+                                # TBH I'm not sure why there's a condition here... is there ever a situation where a bone *isn't* part of the ObjectWrapper list?
+                                anim_objects |= {bo_obj: None for bo_obj in ob_obj.bones if bo_obj in scene_data.objects}
+                                if UE3_batch_object_filter == 'ONLY_OWNER_AND_MESH':
+                                    deformers = scene_data.data_deformers_skin[ob_obj]
+                                    # NOTE: deformer[1] is the mesh object (ObjectWrapper) that a deformer is linked to.
+                                    anim_objects |= {deformer[1]: None for deformer in deformers.values()}
+                        prev_anim_objects = anim_objects
+
+                        # Checks if a blender mesh data is present in data_meshes.
+                        def is_me_in_data_meshes(me, anim_data_meshes):
+                            # mesh_data[1] = The blender mesh data in a data_meshes entry.
+                            return any(me is mesh_data[1] for mesh_data in anim_data_meshes.values())
+
+                        # Time to filter the scene_data's other properties, so the FBX file doesn't save any garbage data
+                        # unrelated to this batched animation.
+
+                        # Only mesh data for our filtered objects.
+                        anim_data_meshes = {ob_obj: d
+                                            for ob_obj, d in scene_data.data_meshes.items() if ob_obj in anim_objects}
+                        # Only material data referenced by our filtered objects.
+                        # d[1] = the objects a material is applied on.
+                        anim_data_materials = {ma: d
+                                               for ma, d in scene_data.data_materials.items() if any(ob_obj in anim_objects for ob_obj in d[1])}
+                        # Only material index data for our used meshes.
+                        anim_mesh_material_indices = {me: d
+                                                      for me, d in scene_data.mesh_material_indices.items() if is_me_in_data_meshes(me, anim_data_meshes)}
+                        # Only textures referenced by our materials.
+                        # blender_tex_key = (material, socket) combo. [0] is a material.
+                        anim_data_textures = {blender_tex_key: d
+                                              for blender_tex_key, d in scene_data.data_textures.items() if blender_tex_key[0] in anim_data_materials.keys()}
+                        # Only "videos" (images) used by textures.
+                        # blender_tex_key = Same as above, but "videos" (images) have a whole list of them (d[1]).
+                        anim_data_videos = {img: d
+                                            for img, d in scene_data.data_videos.items() if any(blender_tex_key in anim_data_textures.keys() for blender_tex_key in d[1])}
+                        # Only bone data for our filtered objects.
+                        anim_data_bones = {ob_obj: d
+                                           for ob_obj, d in scene_data.data_bones.items() if ob_obj in anim_objects}
+                        # Only shape data for our used meshes.
+                        anim_data_deformers_shape = {me: d
+                                                     for me, d in scene_data.data_deformers_shape.items() if is_me_in_data_meshes(me, anim_data_meshes)}
+                        # Only skinning data for our used meshes and bones.
+                        anim_data_deformers_skin = {}
+                        for ob_obj, d in scene_data.data_deformers_skin.items():
+                            if ob_obj not in anim_objects:
+                                continue
+                            d_filtered = {me: deformer for me, deformer in d.items() if deformer[1] in anim_data_meshes.keys()}
+                            if d_filtered:  # If, and only if, the deformer list actually has contents, after being filtered.
+                                anim_data_deformers_skin[ob_obj] = d_filtered
+
+                        # Though, regenerate these properties. This is much easier (and probably faster) than filtering the existing ones.
+                        anim_data_lights = {ob_obj.bdata.data: get_blenderID_key(ob_obj.bdata.data)
+                                            for ob_obj in anim_objects if ob_obj.type == 'LIGHT'}
+                        anim_data_cameras = {ob_obj: get_blenderID_key(ob_obj.bdata.data)
+                                             for ob_obj in anim_objects if ob_obj.type == 'CAMERA'}
+                        anim_data_empties = {ob_obj: get_blender_empty_key(ob_obj.bdata)
+                                             for ob_obj in anim_objects if ob_obj.type in {'EMPTY', 'ARMATURE'}}  # + armatures, they're considered empties!
+                        if scene_data.settings.add_leaf_bones:
+                            anim_data_leaf_bones = fbx_generate_leaf_bones(scene_data.settings, anim_data_bones)
+                        else:
+                            anim_data_leaf_bones = []
+
+                        # TODO: Technically, connections, template users and whatnot should be filtered here. Though,
+                        #       as far as I can tell, the FBX SDK is able to cleanly ignore mistakes like that. So for
+                        #       now, I'll just leave it be, and see if it spawns any issues.
+
+                # In any case, pack everything to a scene_data, which will be used when exporting this anim.
+                # TODO: No idea what's the deal with frame_start and frame_end, seems to be (intentionally??)
+                #       overwritten when actions are being exported. So I'll just leave it as-is, for now...
+                anim_scene_data = FBXExportData(
+                    scene_data.templates, scene_data.templates_users, scene_data.connections,
+                    scene_data.settings, scene_data.scene, scene_data.depsgraph, anim_objects, curr_anim_list, scene_data.animated, scene_data.frame_start, scene_data.frame_end,
+                    anim_data_empties, anim_data_lights, anim_data_cameras, anim_data_meshes, anim_mesh_material_indices,
+                    anim_data_bones, anim_data_leaf_bones, anim_data_deformers_skin, anim_data_deformers_shape,
+                    scene_data.data_world, anim_data_materials, anim_data_textures, anim_data_videos,
+                )
 
-            # Then the actual export.
+                # Then the actual export.
 
-            # anim[3] is the animation's name. Decode to a string, since it seems ( bpy.path.clean_name ) has an oversight with bytes.
-            output_path = os.path.join(root_path, bpy.path.clean_name(anim[3].decode(errors='replace')) + ".fbx")
+                # anim[3] is the animation's name.
+                output_path = os.path.join(root_path, UE3_get_batch_anim_filename(anim[3]))
 
-            write_start = time.time()
+                write_start = time.time()
+
+                if stream_writers_stack is None:
+                    # Start a new group. The stream writers are closed after exiting the multithreading context manager.
+                    stream_writers_stack = group_stack.enter_context(ExitStack())
+                    group_stack.enter_context(
+                        encode_bin.FBXElem.enable_multithreading_cm(UE3_use_worker_processes, UE3_array_compression))
 
-            with encode_bin.FBXElem.enable_multithreading_cm():
                 root = elem_empty(None, b"")
+                # Elements are written as soon as they are done, once their arrays have been compressed, so that the
+                # whole tree does not have to be kept in memory.
+                stream_writer = stream_writers_stack.enter_context(
+                    encode_bin.StreamWriter(output_path, root, FBX_VERSION))
+                group_files.append((output_path, write_start))
                 fbx_header_elements(root, anim_scene_data)
                 fbx_documents_elements(root, anim_scene_data)
                 fbx_references_elements(root, anim_scene_data)
                 fbx_definitions_elements(root, anim_scene_data)
-                fbx_objects_elements(root, anim_scene_data)
+                fbx_objects_elements(root, anim_scene_data, stream_writer, elem_cache)
                 fbx_connections_elements(root, anim_scene_data)
                 fbx_takes_elements(root, anim_scene_data)
 
-            encode_bin.write(output_path, root, FBX_VERSION)
-
-            print('Spent %.4f sec. writing %r' % (time.time() - write_start, output_path))
+                if (anim_idx + 1) % UE3_BATCH_ANIMS_GROUP_SIZE == 0 or anim_idx == len(all_animations) - 1:
+                    # Wait for the group's arrays to be compressed and finish writing its files.
+                    group_stack.close()
+                    stream_writers_stack = None
+                    # Only now are the group's files completely written.
+                    for group_output_path, group_write_start in group_files:
+                        print('Spent %.4f sec. writing %r' % (time.time() - group_write_start, group_output_path))
+                    group_files.clear()
+
+                # UnDrew Add Start : Incremental batch export of animations.
+                if UE3_batch_manifest is not None:
+                    UE3_batch_manifest.set_written(os.path.basename(output_path), anim)
+                # UnDrew Add End
 
-            """ Debug stuff...
+                """ Debug stuff...
             
-            def print_scene_data_stuff(scene_datas):
-                to_print = (
-                    ("data_empties", "EMPTIES"),
-                    ("data_lights", "LIGHTS"),
-                    ("data_cameras", "CAMERAS"),
-                    ("data_meshes", "MESHES"),
-                    ("data_materials", "MATERIALS"),
-                    ("mesh_material_indices", "MATERIAL INDICES"),
-                    ("data_textures", "TEXTURES"),
-                    ("data_videos", "VIDEOS"),
-                    ("data_bones", "BONES"),
-                    ("data_leaf_bones", "LEAF BONES"),
-                    ("data_deformers_skin", "SKIN DEFORMERS"),
-                    ("data_deformers_shape", "SHAPE DEFORMERS")
-                )
-                for attr, name in to_print:
-                    for i, s in enumerate(scene_datas):
-                        # 400 char limit, enough for me to get *the gist* of it.
-                        print(str(i + 1) + ")", name + ":", '%.400s' % str(getattr(s, attr)))
-            print("Listing objects involved in animation:", anim[3])
-            for ob_obj in anim_scene_data.objects:
-                print("    ", ob_obj)
-            print_scene_data_stuff((scene_data, anim_scene_data))
-
-            """
+                def print_scene_data_stuff(scene_datas):
+                    to_print = (
+                        ("data_empties", "EMPTIES"),
+                        ("data_lights", "LIGHTS"),
+                        ("data_cameras", "CAMERAS"),
+                        ("data_meshes", "MESHES"),
+                        ("data_materials", "MATERIALS"),
+                        ("mesh_material_indices", "MATERIAL INDICES"),
+                        ("data_textures", "TEXTURES"),
+                        ("data_videos", "VIDEOS"),
+                        ("data_bones", "BONES"),
+                        ("data_leaf_bones", "LEAF BONES"),
+                        ("data_deformers_skin", "SKIN DEFORMERS"),
+                        ("data_deformers_shape", "SHAPE DEFORMERS")
+                    )
+                    for attr, name in to_print:
+                        for i, s in enumerate(scene_datas):
+                            # 400 char limit, enough for me to get *the gist* of it.
+                            print(str(i + 1) + ")", name + ":", '%.400s' % str(getattr(s, attr)))
+                print("Listing objects involved in animation:", anim[3])
+                for ob_obj in anim_scene_data.objects:
+                    print("    ", ob_obj)
+                print_scene_data_stuff((scene_data, anim_scene_data))
+
+                """
+
+        # UnDrew Add Start : Incremental batch export of animations. Only once all files have been written.
+        if UE3_batch_manifest is not None:
+            if UE3_batch_manifest.scene_hash is not None:
+                UE3_batch_manifest.save()
+            else:
+                # The manifest is only used when exporting all actions, every file has been written.
+                settings.report({'WARNING'},
+                                tip_("Incremental batch export only applies to 'All Actions', all files were written"))
+        # UnDrew Add End
 
         # Then finally, after all exports, cleanup. (like temp meshes)
         fbx_scene_data_cleanup(scene_data)
     else:
     # UnDrew Add End
+        # Writing elements into an FBX hierarchy can now begin.
+        root = elem_empty(None, b"")  # Root element has no id, as it is not saved per se!
+
+        # Elements are written to file as soon as they are done (and all their arrays have been compressed by the
+        # multithreaded tasks), so that the whole hierarchy does not have to be kept in memory.
         # Enable multithreaded array compression in FBXElem and wait until all threads are done before exiting the context
         # manager.
-        with encode_bin.FBXElem.enable_multithreading_cm():
-            # Writing elements into an FBX hierarchy can now begin.
-            root = elem_empty(None, b"")  # Root element has no id, as it is not saved per se!
-
+        with encode_bin.StreamWriter(filepath, root, FBX_VERSION) as stream_writer, \
+                encode_bin.FBXElem.enable_multithreading_cm(UE3_use_worker_processes, UE3_array_compression):
             # Mostly FBXHeaderExtension and GlobalSettings.
             fbx_header_elements(root, scene_data)
 
@@ -4327,7 +4654,7 @@ def save_single(operator, scene, depsgraph, filepath="",
             fbx_definitions_elements(root, scene_data)
 
             # Actual data.
-            fbx_objects_elements(root, scene_data)
+            fbx_objects_elements(root, scene_data, stream_writer)
 
             # How data are inter-connected.
             fbx_connections_elements(root, scene_data)
@@ -4338,8 +4665,7 @@ def save_single(operator, scene, depsgraph, filepath="",
             # Cleanup!
             fbx_scene_data_cleanup(scene_data)
 
-        # And we are done, all multithreaded tasks are complete, and we can write the whole thing to file!
-        encode_bin.write(filepath, root, FBX_VERSION)
+        # And we are done, all multithreaded tasks are complete, and the rest of the file has been written!
 
     # Clear cached ObjectWrappers!
     ObjectWrapper.cache_clear()
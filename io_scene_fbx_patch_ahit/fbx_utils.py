@@ -1,3 +1,4 @@
+import hashlib
 import math
 import time
 
@@ -14,6 +15,23 @@ from bpy.types import Object, Bone, PoseBone, DepsgraphObjectInstance
 from mathutils import Vector, Matrix
 
 from . import encode_bin, data_types
+# UnDrew Add Start : Animation math shared by the exporter and importer, kept in a module that does not import bpy.
+from .fbx_utils_math import (
+    bone_pose_levels,
+    bones_pose_to_local_matrices,
+    simplify_fit_keep_mask,
+    matrices_to_loc_euler_scale,
+    matrices_to_loc_quat_scale,
+    quats_to_axis_angles,
+    eulers_to_matrices,
+    BEZIER_INTERPOLATION_VALUE,
+    fbx_curve_interpolation,
+    fbx_curves_combine,
+)
+# UnDrew Add End
+# UnDrew Add Start : Incremental batch export of animations.
+from .fbx_utils_batch import UE3BatchManifest
+# UnDrew Add End
 
 # COMPAT ADD BEGIN
 from . import fbx_api_compat as api_compat
@@ -306,8 +324,9 @@ def array_to_matrix4(arr):
 
 
 def parray_as_ndarray(arr):
-    """Convert an array.array into an np.ndarray that shares the same memory"""
-    return np.frombuffer(arr, dtype=arr.typecode)
+    """Convert an array.array, or a typed memoryview (see `parse_fbx.parse(..., mmap=True)`), into an np.ndarray that
+    shares the same memory"""
+    return np.frombuffer(arr, dtype=arr.format if isinstance(arr, memoryview) else arr.typecode)
 
 
 def similar_values(v1, v2, e=1e-6):
@@ -1125,6 +1144,42 @@ def elem_data_single_byte_array(elem, name, value):
     return _elem_data_single(elem, name, value, "add_byte_array")
 
 
+# UnDrew Add Start : Share the props of identical array elements.
+# Maximum number of props kept by elem_data_single_array_shared in each `shared_props` dict, so that the arrays of
+# elements that have already been written by encode_bin.StreamWriter don't all have to be kept in memory.
+UE3_SHARED_ARRAY_PROPS_MAX_COUNT = 1024
+
+
+def elem_data_single_array_shared(elem, name, value, func_name, shared_props):
+    """Like the elem_data_single_*_array functions, with `func_name` being the FBXElem method to add `value` with, but
+    the new element shares its props with a previous element added with the same `shared_props` dict, name, method and
+    data, so that identical arrays are only converted and compressed once.
+
+    NumPy arrays are compared by a hash of their data, other sequences by value. Only the most recently used
+    UE3_SHARED_ARRAY_PROPS_MAX_COUNT props are kept. Like with FBXElem.copy, the shared props must not be modified."""
+    if isinstance(value, np.ndarray):
+        # Hashing the data avoids keeping a copy of every array as a key.
+        value = np.ascontiguousarray(value)
+        data_key = (value.dtype.str, value.size, hashlib.blake2b(value, digest_size=16).digest())
+    else:
+        data_key = tuple(value)
+    key = (name, func_name, data_key)
+    props = shared_props.pop(key, None)
+    if props is None:
+        sub_elem = _elem_data_single(elem, name, value, func_name)
+        props = (sub_elem.props, sub_elem.props_type)
+        if len(shared_props) >= UE3_SHARED_ARRAY_PROPS_MAX_COUNT:
+            # Dicts are ordered, so the first props are the least recently used.
+            del shared_props[next(iter(shared_props))]
+    else:
+        sub_elem = elem_empty(elem, name)
+        sub_elem.props, sub_elem.props_type = props
+    # (Re-)inserting the props makes them the most recently used.
+    shared_props[key] = props
+    return sub_elem
+# UnDrew Add End
+
+
 def elem_data_vec_float64(elem, name, value):
     return _elem_data_vec(elem, name, value, "add_float64")
 
@@ -1324,6 +1379,142 @@ def fbx_templates_generate(root, fbx_templates):
 # ##### FBX animation helpers. #####
 
 
+# UnDrew Add Start : Vectorized second pass of AnimationCurveNodeWrapper.simplify.
+# Number of values processed at once by _ue3_simplify_enable_nearest_diff, to limit the memory used by its tables.
+UE3_SIMPLIFY_CHUNK_SIZE = 1 << 16
+# Relative margin by which values must be within the tolerance for _ue3_simplify_enable_nearest_diff to skip them
+# without checking each one exactly, much larger than any rounding error of the check.
+UE3_SIMPLIFY_SKIP_MARGIN = 1e-6
+
+
+def _ue3_simplify_enable_nearest_diff(values, enabled_mask, min_reldiff_fac, min_absdiff_fac):
+    """Enable, in-place, the values in each row of `values` that differ enough from the nearest previous enabled value
+    (or the first value of the row if there is none), where newly enabled values become the nearest previous enabled
+    value of the values after them. This gives the exact same result as checking each value of each row in turn.
+
+    Checking in turn is sequential, so instead, each value that could be the nearest previous enabled value is given the
+    index of the first value after it that is enabled or that would be enabled. The values that don't differ enough
+    from a value are a range of values, so that index is found by a binary search over tables of the minimum and
+    maximum of power of two sized blocks of values. The values to enable are then those reached by following the
+    indices from each enabled value, found by pointer jumping."""
+    num_rows, num_values = values.shape
+    if num_values < 2:
+        return
+
+    # First, check each disabled value against its nearest previous enabled value from before any values are newly
+    # enabled. Only the values after a value that differs enough can be affected by the newly enabled values, so all
+    # other rows, and all other parts of the affected rows, are left as they are.
+    value_indices = np.arange(num_values)
+    nearest_enabled_indices = np.maximum.accumulate(np.where(enabled_mask, value_indices, 0), axis=1)
+    nearest_enabled_values = np.take_along_axis(values, nearest_enabled_indices, axis=1)
+    enough_diff_mask = ((np.abs(values - nearest_enabled_values)
+                         > min_reldiff_fac * np.maximum(np.abs(values) + np.abs(nearest_enabled_values),
+                                                        min_absdiff_fac))
+                        & ~enabled_mask)
+    affected_rows = np.flatnonzero(enough_diff_mask.any(axis=1))
+    if not affected_rows.size:
+        return
+
+    skip_fac = min_reldiff_fac * (1.0 - UE3_SIMPLIFY_SKIP_MARGIN)
+    chunk_rows = max(1, UE3_SIMPLIFY_CHUNK_SIZE // num_values)
+    for chunk_start in range(0, len(affected_rows), chunk_rows):
+        rows = affected_rows[chunk_start:chunk_start + chunk_rows]
+        chunk_enabled_mask = enabled_mask[rows]
+        chunk_values = values[rows].ravel()
+
+        # The nearest previous enabled value is reset by each enabled value and by the first value of each row. The
+        # values from one resetting value up to the next are a group. Only the groups containing values that differ
+        # enough are affected, so only the values of those groups are kept, with each group still starting with its
+        # resetting value.
+        row_start_mask = np.zeros(chunk_values.size, dtype=bool)
+        row_start_mask[::num_values] = True
+        reset_mask = chunk_enabled_mask.ravel() | row_start_mask
+        group_ids = np.cumsum(reset_mask) - 1
+        affected_groups_mask = np.zeros(group_ids[-1] + 1, dtype=bool)
+        affected_groups_mask[group_ids[enough_diff_mask[rows].ravel()]] = True
+        kept_indices = np.flatnonzero(affected_groups_mask[group_ids])
+        # A value equal to the value before it can't be enabled, because it would be no different from that value, so
+        # it doesn't need to be searched from.
+        prev_equal_mask = np.empty(chunk_values.size, dtype=bool)
+        prev_equal_mask[0] = False
+        np.equal(chunk_values[1:], chunk_values[:-1], out=prev_equal_mask[1:])
+
+        flat_values = chunk_values[kept_indices]
+        flat_abs_values = np.abs(flat_values)
+        reset_mask = reset_mask[kept_indices]
+        prev_equal_mask = prev_equal_mask[kept_indices]
+        size = flat_values.size
+        group_starts = np.flatnonzero(reset_mask)
+        group_ends = np.append(group_starts[1:], size)
+
+        # Level `k` of the tables is the minimum/maximum of the `2 ** k` values from each index. The values that reset
+        # are NaN, so that no block containing them can be skipped, meaning that no block larger than the largest group
+        # is ever needed. Blocks that would go past the end are NaN too.
+        level_values = np.full(size + 1, np.nan)
+        level_values[:size][~reset_mask] = flat_values[~reset_mask]
+        block_mins = [level_values]
+        block_maxs = [level_values]
+        max_group_size = (group_ends - group_starts).max()
+        block_size = 1
+        while block_size * 2 <= max_group_size:
+            level_mins = np.full(size + 1, np.nan)
+            level_maxs = np.full(size + 1, np.nan)
+            np.minimum(block_mins[-1][:-block_size], block_mins[-1][block_size:], out=level_mins[:-block_size])
+            np.maximum(block_maxs[-1][:-block_size], block_maxs[-1][block_size:], out=level_maxs[:-block_size])
+            block_mins.append(level_mins)
+            block_maxs.append(level_maxs)
+            block_size *= 2
+
+        # Follow each value to the first value after it that resets or that differs enough from it.
+        next_indices = np.full(size + 1, size)
+        search_from = np.flatnonzero(reset_mask | ~prev_equal_mask)
+        search_pos = search_from + 1
+        while search_from.size:
+            ref_values = flat_values[search_from]
+            ref_abs_values = flat_abs_values[search_from]
+            # The values that don't differ enough from a value `r` are those within `skip_fac * min_absdiff_fac` of
+            # `r`, or those between `r * (1 - skip_fac) / (1 + skip_fac)` and `r * (1 + skip_fac) / (1 - skip_fac)`.
+            abs_range = skip_fac * min_absdiff_fac
+            rel_range_lo = ref_values * ((1.0 - skip_fac) / (1.0 + skip_fac))
+            rel_range_hi = ref_values * ((1.0 + skip_fac) / (1.0 - skip_fac))
+            negative_refs = ref_values < 0.0
+            rel_range_lo[negative_refs], rel_range_hi[negative_refs] = (rel_range_hi[negative_refs],
+                                                                        rel_range_lo[negative_refs])
+            skip_range_lo = np.minimum(ref_values - abs_range, rel_range_lo)
+            skip_range_hi = np.maximum(ref_values + abs_range, rel_range_hi)
+            # Skip past the largest blocks of values that are all within the tolerance of the value searched from.
+            for level in range(len(block_mins) - 1, -1, -1):
+                can_skip = block_mins[level][search_pos] >= skip_range_lo
+                can_skip &= block_maxs[level][search_pos] <= skip_range_hi
+                search_pos[can_skip] += 1 << level
+
+            # Values near the edge of the tolerance are not skipped, so check the found values exactly, the same as
+            # checking in turn does, and continue searching past those that turn out to be within the tolerance.
+            found_idx = np.minimum(search_pos, size - 1)
+            found_values = flat_values[found_idx]
+            enough_diff = (np.abs(found_values - ref_values)
+                           > min_reldiff_fac * np.maximum(flat_abs_values[found_idx] + ref_abs_values, min_absdiff_fac))
+            found = (search_pos >= size) | reset_mask[found_idx] | enough_diff
+            next_indices[search_from[found]] = search_pos[found]
+            not_found = ~found
+            search_from = search_from[not_found]
+            search_pos = search_pos[not_found] + 1
+
+        # Pointer jumping from the start of each group: each iteration, every index reached so far is followed by as
+        # many indices as have been followed so far in total, doubling the number of followed indices, until the end of
+        # every group has been reached.
+        reached_mask = np.zeros(size + 1, dtype=bool)
+        reached_mask[group_starts] = True
+        while (next_indices[group_starts] < group_ends).any():
+            reached_mask[next_indices[reached_mask]] = True
+            next_indices = next_indices[next_indices]
+
+        newly_enabled_mask = np.zeros(chunk_values.size, dtype=bool)
+        newly_enabled_mask[kept_indices[reached_mask[:size] & ~reset_mask]] = True
+        enabled_mask[rows] = chunk_enabled_mask | newly_enabled_mask.reshape(chunk_enabled_mask.shape)
+# UnDrew Add End
+
+
 class AnimationCurveNodeWrapper:
     """
     This class provides a same common interface for all (FBX-wise) AnimationCurveNode and AnimationCurve elements,
@@ -1406,159 +1597,67 @@ class AnimationCurveNodeWrapper:
         if fac == 0.0:
             return
 
+        # UnDrew Edit Start : Split out so that the curves of many wrappers can be simplified at once, see
+        #                     simplify_multi.
+        self._simplify_write_mask(self._frame_values_array, self._frame_write_mask_array, fac)
+        self._simplify_force_keying(force_keep)
+
+    @staticmethod
+    def _simplify_write_mask(sampled_values, enabled_mask, fac):
+        """Set, in-place, `enabled_mask` to the samples of each row of `sampled_values` that `simplify` keeps."""
+        # UnDrew Edit End
         # So that, with default factor and step values (1), we get:
         min_reldiff_fac = fac * 1.0e-3  # min relative value evolution: 0.1% of current 'order of magnitude'.
         min_absdiff_fac = 0.1  # A tenth of reldiff...
 
         # Initialize to no values enabled for writing.
-        self._frame_write_mask_array[:] = False
+        enabled_mask[:] = False
 
         # Values are enabled for writing if they differ enough from either of their adjacent values or if they differ
         # enough from the closest previous value that is enabled due to either of these conditions.
-        for sampled_values, enabled_mask in zip(self._frame_values_array, self._frame_write_mask_array):
-            # Create overlapping views of the 'previous' (all but the last) and 'current' (all but the first)
-            # `sampled_values` and `enabled_mask`.
-            # Calculate absolute values from `sampled_values` so that the 'previous' and 'current' absolute arrays can
-            # be views into the same array instead of separately calculated arrays.
-            abs_sampled_values = np.abs(sampled_values)
-            # 'previous' views.
-            p_val_view = sampled_values[:-1]
-            p_abs_val_view = abs_sampled_values[:-1]
-            p_enabled_mask_view = enabled_mask[:-1]
-            # 'current' views.
-            c_val_view = sampled_values[1:]
-            c_abs_val_view = abs_sampled_values[1:]
-            c_enabled_mask_view = enabled_mask[1:]
-
-            # If enough difference from previous sampled value, enable the current value *and* the previous one!
-            # The difference check is symmetrical, so this will compare each value to both of its adjacent values.
-            # Unless it is forcefully enabled later, this is the only way that the first value can be enabled.
-            # This is a contracted form of relative + absolute-near-zero difference:
-            # def is_different(a, b):
-            #     abs_diff = abs(a - b)
-            #     if abs_diff < min_reldiff_fac * min_absdiff_fac:
-            #         return False
-            #     return (abs_diff / ((abs(a) + abs(b)) / 2)) > min_reldiff_fac
-            # Note that we ignore the '/ 2' part here, since it's not much significant for us.
-            # Contracted form using only builtin Python functions:
-            #     return abs(a - b) > (min_reldiff_fac * max(abs(a) + abs(b), min_absdiff_fac))
-            abs_diff = np.abs(c_val_view - p_val_view)
-            different_if_greater_than = min_reldiff_fac * np.maximum(c_abs_val_view + p_abs_val_view, min_absdiff_fac)
-            enough_diff_p_val_mask = abs_diff > different_if_greater_than
-            # Enable both the current values *and* the previous values where `enough_diff_p_val_mask` is True. Some
-            # values may get set to True twice because the views overlap, but this is not a problem.
-            p_enabled_mask_view[enough_diff_p_val_mask] = True
-            c_enabled_mask_view[enough_diff_p_val_mask] = True
-
-            # Else, if enough difference from previous enabled value, enable the current value only!
-            # For each 'current' value, get the index of the nearest previous enabled value in `sampled_values` (or
-            # itself if the value is enabled).
-            # Start with an array that is the index of the 'current' value in `sampled_values`. The 'current' values are
-            # all but the first value, so the indices will be from 1 to `len(sampled_values)` exclusive.
-            # Let len(sampled_values) == 9:
-            #   [1, 2, 3, 4, 5, 6, 7, 8]
-            p_enabled_idx_in_sampled_values = np.arange(1, len(sampled_values))
-            # Replace the indices of all disabled values with 0 in preparation of filling them in with the index of the
-            # nearest previous enabled value. We choose to replace with 0 so that if there is no nearest previous
-            # enabled value, we instead default to `sampled_values[0]`.
-            c_val_disabled_mask = ~c_enabled_mask_view
-            # Let `c_val_disabled_mask` be:
-            #   [F, F, T, F, F, T, T, T]
-            # Set indices to 0 where `c_val_disabled_mask` is True:
-            #   [1, 2, 3, 4, 5, 6, 7, 8]
-            #          v        v  v  v
-            #   [1, 2, 0, 4, 5, 0, 0, 0]
-            p_enabled_idx_in_sampled_values[c_val_disabled_mask] = 0
-            # Accumulative maximum travels across the array from left to right, filling in the zeroed indices with the
-            # maximum value so far, which will be the closest previous enabled index because the non-zero indices are
-            # strictly increasing.
-            #   [1, 2, 0, 4, 5, 0, 0, 0]
-            #          v        v  v  v
-            #   [1, 2, 2, 4, 5, 5, 5, 5]
-            p_enabled_idx_in_sampled_values = np.maximum.accumulate(p_enabled_idx_in_sampled_values)
-            # Only disabled values need to be checked against their nearest previous enabled values.
-            # We can additionally ignore all values which equal their immediately previous value because those values
-            # will never be enabled if they were not enabled by the earlier difference check against immediately
-            # previous values.
-            p_enabled_diff_to_check_mask = np.logical_and(c_val_disabled_mask, p_val_view != c_val_view)
-            # Convert from a mask to indices because we need the indices later and because the array of indices will
-            # usually be smaller than the mask array making it faster to index other arrays with.
-            p_enabled_diff_to_check_idx = np.flatnonzero(p_enabled_diff_to_check_mask)
-            # `p_enabled_idx_in_sampled_values` from earlier:
-            #   [1, 2, 2, 4, 5, 5, 5, 5]
-            # `p_enabled_diff_to_check_mask` assuming no values equal their immediately previous value:
-            #   [F, F, T, F, F, T, T, T]
-            # `p_enabled_diff_to_check_idx`:
-            #   [      2,       5, 6, 7]
-            # `p_enabled_idx_in_sampled_values_to_check`:
-            #   [      2,       5, 5, 5]
-            p_enabled_idx_in_sampled_values_to_check = p_enabled_idx_in_sampled_values[p_enabled_diff_to_check_idx]
-            # Get the 'current' disabled values that need to be checked.
-            c_val_to_check = c_val_view[p_enabled_diff_to_check_idx]
-            c_abs_val_to_check = c_abs_val_view[p_enabled_diff_to_check_idx]
-            # Get the nearest previous enabled value for each value to be checked.
-            nearest_p_enabled_val = sampled_values[p_enabled_idx_in_sampled_values_to_check]
-            abs_nearest_p_enabled_val = np.abs(nearest_p_enabled_val)
-            # Check the relative + absolute-near-zero difference again, but against the nearest previous enabled value
-            # this time.
-            abs_diff = np.abs(c_val_to_check - nearest_p_enabled_val)
-            different_if_greater_than = (min_reldiff_fac
-                                         * np.maximum(c_abs_val_to_check + abs_nearest_p_enabled_val, min_absdiff_fac))
-            enough_diff_p_enabled_val_mask = abs_diff > different_if_greater_than
-            # If there are any that are different enough from the previous enabled value, then we have to check them all
-            # iteratively because enabling a new value can change the nearest previous enabled value of some elements,
-            # which changes their relative + absolute-near-zero difference:
-            # `p_enabled_diff_to_check_idx`:
-            #   [2, 5, 6, 7]
-            # `p_enabled_idx_in_sampled_values_to_check`:
-            #   [2, 5, 5, 5]
-            # Let `enough_diff_p_enabled_val_mask` be:
-            #   [F, F, T, T]
-            # The first index that is newly enabled is 6:
-            #   [2, 5,>6<,5]
-            # But 6 > 5, so the next value's nearest previous enabled index is also affected:
-            #   [2, 5, 6,>6<]
-            # We had calculated a newly enabled index of 7 too, but that was calculated against the old nearest previous
-            # enabled index of 5, which has now been updated to 6, so whether 7 is enabled or not needs to be
-            # recalculated:
-            #   [F, F, T, ?]
-            if np.any(enough_diff_p_enabled_val_mask):
-                # Accessing .data, the memoryview of the array, iteratively or by individual index is faster than doing
-                # the same with the array itself.
-                zipped = zip(p_enabled_diff_to_check_idx.data,
-                             c_val_to_check.data,
-                             c_abs_val_to_check.data,
-                             p_enabled_idx_in_sampled_values_to_check.data,
-                             enough_diff_p_enabled_val_mask.data)
-                # While iterating, we could set updated values into `enough_diff_p_enabled_val_mask` as we go and then
-                # update `enabled_mask` in bulk after the iteration, but if we're going to update an array while
-                # iterating, we may as well update `enabled_mask` directly instead and skip the bulk update.
-                # Additionally, the number of `True` writes to `enabled_mask` is usually much less than the number of
-                # updates that would be required to `enough_diff_p_enabled_val_mask`.
-                c_enabled_mask_view_mv = c_enabled_mask_view.data
-
-                # While iterating, keep track of the most recent newly enabled index, so we can tell when we need to
-                # recalculate whether the current value needs to be enabled.
-                new_p_enabled_idx = -1
-                # Keep track of its value too for performance.
-                new_p_enabled_val = -1
-                new_abs_p_enabled_val = -1
-                for cur_idx, c_val, c_abs_val, old_p_enabled_idx, enough_diff in zipped:
-                    if new_p_enabled_idx > old_p_enabled_idx:
-                        # The nearest previous enabled value is newly enabled and was not included when
-                        # `enough_diff_p_enabled_val_mask` was calculated, so whether the current value is different
-                        # enough needs to be recalculated using the newly enabled value.
-                        # Check if the relative + absolute-near-zero difference is enough to enable this value.
-                        enough_diff = (abs(c_val - new_p_enabled_val)
-                                       > (min_reldiff_fac * max(c_abs_val + new_abs_p_enabled_val, min_absdiff_fac)))
-                    if enough_diff:
-                        # The current value needs to be enabled.
-                        c_enabled_mask_view_mv[cur_idx] = True
-                        # Update the index and values for this newly enabled value.
-                        new_p_enabled_idx = cur_idx
-                        new_p_enabled_val = c_val
-                        new_abs_p_enabled_val = c_abs_val
-
+        # Create overlapping views of the 'previous' (all but the last) and 'current' (all but the first)
+        # `sampled_values` and `enabled_mask`.
+        # Calculate absolute values from `sampled_values` so that the 'previous' and 'current' absolute arrays can
+        # be views into the same array instead of separately calculated arrays.
+        abs_sampled_values = np.abs(sampled_values)
+        # 'previous' views.
+        p_val_view = sampled_values[:, :-1]
+        p_abs_val_view = abs_sampled_values[:, :-1]
+        p_enabled_mask_view = enabled_mask[:, :-1]
+        # 'current' views.
+        c_val_view = sampled_values[:, 1:]
+        c_abs_val_view = abs_sampled_values[:, 1:]
+        c_enabled_mask_view = enabled_mask[:, 1:]
+
+        # If enough difference from previous sampled value, enable the current value *and* the previous one!
+        # The difference check is symmetrical, so this will compare each value to both of its adjacent values.
+        # Unless it is forcefully enabled later, this is the only way that the first value can be enabled.
+        # This is a contracted form of relative + absolute-near-zero difference:
+        # def is_different(a, b):
+        #     abs_diff = abs(a - b)
+        #     if abs_diff < min_reldiff_fac * min_absdiff_fac:
+        #         return False
+        #     return (abs_diff / ((abs(a) + abs(b)) / 2)) > min_reldiff_fac
+        # Note that we ignore the '/ 2' part here, since it's not much significant for us.
+        # Contracted form using only builtin Python functions:
+        #     return abs(a - b) > (min_reldiff_fac * max(abs(a) + abs(b), min_absdiff_fac))
+        abs_diff = np.abs(c_val_view - p_val_view)
+        different_if_greater_than = min_reldiff_fac * np.maximum(c_abs_val_view + p_abs_val_view, min_absdiff_fac)
+        enough_diff_p_val_mask = abs_diff > different_if_greater_than
+        # Enable both the current values *and* the previous values where `enough_diff_p_val_mask` is True. Some
+        # values may get set to True twice because the views overlap, but this is not a problem.
+        p_enabled_mask_view[enough_diff_p_val_mask] = True
+        c_enabled_mask_view[enough_diff_p_val_mask] = True
+
+        # Else, if enough difference from previous enabled value, enable the current value only!
+        # UnDrew Edit Start : Replaced the iteration over the values that need checking in turn with a vectorized
+        #                     equivalent, see _ue3_simplify_enable_nearest_diff.
+        _ue3_simplify_enable_nearest_diff(sampled_values, enabled_mask, min_reldiff_fac, min_absdiff_fac)
+        # UnDrew Edit End
+
+    # UnDrew Edit Start : Shared with simplify_fit and simplify_multi.
+    def _simplify_force_keying(self, force_keep):
+        # UnDrew Edit End
         # If we write nothing (action doing nothing) and are in 'force_keep' mode, we key everything! :P
         # See T41766.
         # Also, it seems some importers (e.g. UE4) do not handle correctly armatures where some bones
@@ -1577,6 +1676,66 @@ class AnimationCurveNodeWrapper:
                     frame_write_mask[:1] = True
                     frame_write_mask[-1:] = True
 
+    # UnDrew Add Start : Curve fitting keyframe reduction.
+    def simplify_fit(self, fac, step, force_keep=False):
+        """
+        Simplifies sampled curves by fitting them with linear segments and only enabling the samples at the ends of each
+        segment, such that:
+            * interpolating the enabled samples differs from every sample by less than the relative difference that
+              `simplify` uses.
+        Curves where no sample differs from the first sample by that much are not enabled at all, like with `simplify`.
+        """
+        if self._frame_times_array is None:
+            # Keyframes have not been added yet.
+            return
+
+        if fac == 0.0:
+            return
+
+        self._simplify_fit_write_mask(self._frame_times_array, self._frame_values_array, self._frame_write_mask_array,
+                                      fac)
+        self._simplify_force_keying(force_keep)
+
+    @staticmethod
+    def _simplify_fit_write_mask(times, values, write_mask, fac):
+        """Set, in-place, `write_mask` to the samples of each row of `values` that `simplify_fit` keeps."""
+        write_mask[:] = simplify_fit_keep_mask(times, values, fac)
+    # UnDrew Add End
+
+    # UnDrew Add Start : Simplify the curves of all the wrappers of an animation stack at once.
+    @classmethod
+    def simplify_multi(cls, anims, fac, step, force_keep=False, fit=False):
+        """
+        Simplifies the sampled curves of all `anims` exactly like calling `simplify` (or `simplify_fit` when `fit` is
+        True) on each of them would, but with all their curves stacked into a single 2D array that is simplified at
+        once, rather than each wrapper running its own NumPy operations on only one to three curves.
+        All `anims` must have had their keyframes set with the same keyframe times.
+        The write mask of each wrapper becomes a view of its rows of the write mask of all the curves.
+        """
+        anims = [anim for anim in anims if anim._frame_times_array is not None]
+        if not anims:
+            # Keyframes have not been added yet.
+            return
+
+        if fac == 0.0:
+            return
+
+        times = anims[0]._frame_times_array
+        values = np.concatenate([anim._frame_values_array for anim in anims])
+        write_mask = np.empty(values.shape, dtype=bool)
+        if fit:
+            cls._simplify_fit_write_mask(times, values, write_mask, fac)
+        else:
+            cls._simplify_write_mask(values, write_mask, fac)
+
+        row_start = 0
+        for anim in anims:
+            row_end = row_start + len(anim._frame_values_array)
+            anim._frame_write_mask_array = write_mask[row_start:row_end]
+            anim._simplify_force_keying(force_keep)
+            row_start = row_end
+    # UnDrew Add End
+
     def get_final_data(self, scene, ref_id, force_keep=False):
         """
         Yield final anim data for this 'curvenode' (for all curvenodes defined).
@@ -1667,6 +1826,7 @@ class ObjectWrapper(metaclass=MetaObjectWrapper):
         # UnDrew Add Start : Store InheritType-related values.
         "UE3_inherit_type",  # Cache the inherit type, since it only needs to be evaluated once.
         "UE3_bone_last_pose_matrix",  # Cache the calculated transform in pose-space so child bones can use it.
+        "UE3_bone_fast_matrix_local",  # Local-space matrix precomputed by UE3ArmaturePoseMatrices, used only once.
         # UnDrew Add End
         '_tag', '_ref', '_dupli_matrix'
     )
@@ -1739,6 +1899,7 @@ class ObjectWrapper(metaclass=MetaObjectWrapper):
         # UnDrew Add End
         # UnDrew Add Start : Init inherit_type.
         self.UE3_inherit_type = self.UE3_get_inherit_type(self.get_settings())
+        self.UE3_bone_fast_matrix_local = None
         # UnDrew Add End
 
     def __eq__(self, other):
@@ -1840,6 +2001,18 @@ class ObjectWrapper(metaclass=MetaObjectWrapper):
 
             return r
 
+    def UE3_bone_validate_matrix_local(self, matrix):
+        """
+        Compare a local-space matrix computed by UE3ArmaturePoseMatrices against the one from `convert_local_to_pose()`.
+        """
+        m = self.UE3_bone_local_to_pose(self._ref.pose.bones[self.bdata.name].matrix.copy(), invert=True)
+        l, r, s = m.decompose()
+        m = Matrix.LocRotScale(l, r, s)
+        error = max(abs(a - b) for row, ref_row in zip(matrix, m) for a, b in zip(row, ref_row))
+        if error > UE3_BONE_POSE_VALIDATE_TOLERANCE:
+            print("WARNING: Bone \"%s\" local matrix differs from the reference one by %f:\n%r\n%r"
+                  % (self.name, error, matrix, m))
+
     def UE3_get_inherit_type(self, settings):
         """
         Get the inherit_type that the exporter should write. Also used by `get_matrix_local()` to determine how to
@@ -1884,6 +2057,14 @@ class ObjectWrapper(metaclass=MetaObjectWrapper):
         elif self._tag == 'DP':
             return self._ref.matrix_world.inverted_safe() @ self._dupli_matrix
         else:  # 'BO', current pose
+            # UnDrew Add Start : Use the matrix precomputed for the whole armature, if any.
+            m = self.UE3_bone_fast_matrix_local
+            if m is not None:
+                self.UE3_bone_fast_matrix_local = None
+                if UE3_BONE_POSE_MODE == 'VALIDATE':
+                    self.UE3_bone_validate_matrix_local(m)
+                return m
+            # UnDrew Add End
             # UnDrew Add Start : Refactored matrix calculation to facilitate InheritType logic.
             # Pose Space -> FBX Local Space.
             m = self.UE3_bone_local_to_pose(self._ref.pose.bones[self.bdata.name].matrix.copy(), invert=True)
@@ -2064,6 +2245,56 @@ class ObjectWrapper(metaclass=MetaObjectWrapper):
 
         return matrix
 
+    # UnDrew Add Start : Get the bone's FBX matrix from its local matrix, without going through `fbx_object_matrix()`.
+    def UE3_get_bone_matrix_factors(self, scene_data):
+        """
+        Get the `(pre, post)` matrices such that `fbx_object_matrix(scene_data)` of this bone (in its current pose)
+        equals `pre @ matrix_local @ post`, or None if they would depend on the current transform of another object.
+        This must match what `fbx_object_matrix()` does for bones!
+        """
+        settings = scene_data.settings
+        pre = Matrix.Identity(4)
+        post = Matrix.Identity(4)
+        is_global = False
+        use_only_global_scale = False
+        parent = self.parent
+
+        if settings.UE3_dont_add_armature_bone:
+            if self.UE3_is_empty:
+                return None
+            elif parent and parent.UE3_is_empty:
+                pre = parent.UE3_empty_chain_offset_matrix @ pre
+                parent = parent.UE3_empty_chain_parent
+                if not parent:
+                    is_global = True
+                    use_only_global_scale = True
+
+        if not is_global and settings.bone_correction_matrix_inv and parent and parent.is_bone:
+            pre = settings.bone_correction_matrix_inv @ pre
+        if settings.bone_correction_matrix:
+            post = post @ settings.bone_correction_matrix
+
+        if settings.UE3_dont_add_armature_bone:
+            if not is_global and parent and parent._tag == 'BO':
+                armature = parent.armature
+                if armature and armature.UE3_is_empty:
+                    pre = armature.UE3_empty_chain_scale_matrix @ pre
+            armature = self.armature
+            if armature and armature.UE3_is_empty:
+                post = post @ armature.UE3_empty_chain_scale_matrix_inv
+
+        if parent and (is_global or parent.use_bake_space_transform(scene_data)):
+            return None
+
+        if settings.UE3_dont_add_armature_bone and is_global and use_only_global_scale:
+            return Matrix.Scale(settings.global_scale, 4) @ pre, post
+
+        if is_global:
+            pre = settings.global_matrix @ pre
+
+        return pre, post
+    # UnDrew Add End
+
     def fbx_object_tx(self, scene_data, rest=False, rot_euler_compat=None):
         """
         Generate object transform data (always in local space when possible).
@@ -2151,10 +2382,336 @@ class ObjectWrapper(metaclass=MetaObjectWrapper):
         return ()
 
 
+# UnDrew Add Start : Fast conversion of bone matrices between pose-space and FBX local-space, for baking animations.
+# How `ObjectWrapper.get_matrix_local()` gets the FBX local-space matrix of bones while baking animations:
+#     'NUMPY':    Computed for all bones of an armature at once by `UE3ArmaturePoseMatrices`, without any RNA writes.
+#     'RNA':      Computed bone by bone through `Bone.convert_local_to_pose()` (reference implementation).
+#     'VALIDATE': Same as 'NUMPY', but also compute the 'RNA' matrices and print the bones for which they differ.
+# 'NUMPY' re-implements Blender's pose-bone matrix evaluation, so it stays opt-in until 'VALIDATE' reports no difference
+# on real rigs, including bones with every inherit scale mode and parents with non-uniform scale.
+UE3_BONE_POSE_MODE = 'RNA'
+UE3_BONE_POSE_VALIDATE_TOLERANCE = 1e-4
+
+
+class UE3ArmaturePoseMatrices:
+    """
+    Computes the FBX local-space matrices of all bones of an armature at once (for the armature's current pose), and
+    stores them on the bones' ObjectWrappers, so that `ObjectWrapper.get_matrix_local()` does not have to compute them
+    one by one through `Bone.convert_local_to_pose()`, which requires temporarily changing properties of each Bone.
+    Gives the same results as `ObjectWrapper.UE3_bone_local_to_pose()`, up to floating point precision.
+    Can also compute the final FBX matrices of the bones at once, see `set_baked_bones()`.
+    """
+    __slots__ = (
+        "bones", "pose_bones", "pose_indices", "levels", "rest_local", "rest_local_inv", "pose_flat",
+        "matrix_bones", "scene_data", "baked_bones", "baked_indices", "baked_pre", "baked_post", "baked_matrices",
+    )
+
+    def __init__(self, arm_obj):
+        # Parent-first order.
+        self.bones = bones = arm_obj.bones
+        self.pose_bones = pose_bones = arm_obj.bdata.pose.bones
+        bones_indices = {bo_obj.bdata.name: bo_idx for bo_idx, bo_obj in enumerate(bones)}
+        self.pose_indices = np.array([pose_bones.find(bo_obj.bdata.name) for bo_obj in bones])
+        self.pose_flat = np.empty(len(pose_bones) * 16, dtype=np.float32)
+
+        rest_local = [bo_obj.matrix_rest_local for bo_obj in bones]
+        self.rest_local = np.array(rest_local, dtype=np.float64).reshape(-1, 4, 4)
+        self.rest_local_inv = np.array([m.inverted_safe() for m in rest_local], dtype=np.float64).reshape(-1, 4, 4)
+
+        parent_indices = [bones_indices[bo_obj.bdata.parent.name] if bo_obj.bdata.parent else -1 for bo_obj in bones]
+        self.levels = bone_pose_levels(parent_indices, [bo_obj.UE3_inherit_type for bo_obj in bones])
+
+        # Bones whose ObjectWrapper gets its local matrix set on each update.
+        self.matrix_bones = tuple(enumerate(bones))
+        self.scene_data = None
+        self.baked_bones = ()
+        self.baked_matrices = None
+
+    def set_baked_bones(self, scene_data, bones):
+        """
+        Also compute the final FBX matrices (as returned by `ObjectWrapper.fbx_object_matrix()`) of the given bones
+        (when possible) on each update, into `baked_matrices`.
+        Returns the bones that got accepted, in the same order as their matrices in `baked_matrices`.
+        """
+        bones_indices = {bo_obj: bo_idx for bo_idx, bo_obj in enumerate(self.bones)}
+        baked_bones = []
+        baked_indices = []
+        baked_pre = []
+        baked_post = []
+        for bo_obj in bones:
+            factors = bo_obj.UE3_get_bone_matrix_factors(scene_data)
+            if factors is None:
+                continue
+            pre, post = factors
+            baked_bones.append(bo_obj)
+            baked_indices.append(bones_indices[bo_obj])
+            baked_pre.append(pre)
+            baked_post.append(post)
+        self.scene_data = scene_data
+        self.baked_bones = tuple(baked_bones)
+        self.baked_indices = np.array(baked_indices, dtype=np.int64)
+        self.baked_pre = np.array(baked_pre, dtype=np.float64).reshape(-1, 4, 4)
+        self.baked_post = np.array(baked_post, dtype=np.float64).reshape(-1, 4, 4)
+        if UE3_BONE_POSE_MODE != 'VALIDATE':
+            # Baked bones do not need their local matrix anymore.
+            baked_bones = set(baked_bones)
+            self.matrix_bones = tuple((bo_idx, bo_obj) for bo_idx, bo_obj in enumerate(self.bones)
+                                      if bo_obj not in baked_bones)
+        return self.baked_bones
+
+    def update(self):
+        """
+        Compute and store the local-space matrices of all bones (and the FBX matrices of baked bones) for the current
+        pose of the armature.
+        """
+        pose_flat = self.pose_flat
+        self.pose_bones.foreach_get("matrix", pose_flat)
+        # Blender matrices are column-major.
+        pose_mats = pose_flat.reshape(-1, 4, 4).transpose(0, 2, 1)[self.pose_indices].astype(np.float64)
+
+        local_mats, last_pose_mats = bones_pose_to_local_matrices(pose_mats, self.rest_local, self.rest_local_inv,
+                                                                  self.levels)
+
+        for bo_idx, bo_obj in self.matrix_bones:
+            bo_obj.UE3_bone_fast_matrix_local = Matrix(local_mats[bo_idx].tolist())
+            bo_obj.UE3_bone_last_pose_matrix = Matrix(last_pose_mats[bo_idx].tolist())
+
+        baked_bones = self.baked_bones
+        if baked_bones:
+            self.baked_matrices = self.baked_pre @ local_mats[self.baked_indices] @ self.baked_post
+            if UE3_BONE_POSE_MODE == 'VALIDATE':
+                for bo_obj, baked_mat in zip(baked_bones, self.baked_matrices):
+                    m = np.array(bo_obj.fbx_object_matrix(self.scene_data))
+                    error = np.abs(baked_mat - m).max()
+                    if error > UE3_BONE_POSE_VALIDATE_TOLERANCE:
+                        print("WARNING: Bone \"%s\" FBX matrix differs from the reference one by %f:\n%r\n%r"
+                              % (bo_obj.name, error, baked_mat, m))
+
+    def clear(self):
+        """
+        Discard the stored matrices, so that they do not get used once the pose of the armature changed.
+        """
+        for bo_obj in self.bones:
+            bo_obj.UE3_bone_fast_matrix_local = None
+# UnDrew Add End
+
+
 def fbx_name_class(name, cls):
     return FBX_NAME_CLASS_SEP.join((name, cls))
 
 
+# UnDrew Add Start : Incremental batch export of animations.
+# (foreach_get property, number of values per item, dtype) of the data of each type of mesh attribute.
+_UE3_ATTRIBUTE_FOREACH = {
+    'FLOAT': ("value", 1, np.float32),
+    'INT': ("value", 1, np.int32),
+    'INT8': ("value", 1, np.int32),
+    'BOOLEAN': ("value", 1, bool),
+    'FLOAT2': ("vector", 2, np.float32),
+    'INT32_2D': ("value", 2, np.int32),
+    'FLOAT_VECTOR': ("vector", 3, np.float32),
+    'FLOAT_COLOR': ("color", 4, np.float32),
+    'BYTE_COLOR': ("color", 4, np.float32),
+    'QUATERNION': ("value", 4, np.float32),
+    'FLOAT4X4': ("value", 16, np.float32),
+}
+
+
+def _ue3_hash_update_repr(h, value):
+    h.update(repr(value).encode())
+
+
+def _ue3_hash_update_foreach(h, collection, prop, count, dtype):
+    data = np.empty(len(collection) * count, dtype=dtype)
+    collection.foreach_get(prop, data)
+    h.update(data)
+
+
+def _ue3_hash_update_rna(h, struct, id_targets=None):
+    """Update hash `h` with the values of all the RNA properties of `struct`, recursing into its collections (e.g. the
+    control points of an Envelope F-Modifier, or the variables of a driver).
+    IDs pointed to (e.g. the target of a constraint) are hashed by name and added to set `id_targets`, if given."""
+    for prop in struct.bl_rna.properties:
+        identifier = prop.identifier
+        if identifier == "rna_type":
+            continue
+        value = getattr(struct, identifier)
+        if prop.type == 'POINTER':
+            if isinstance(value, bpy.types.ID):
+                _ue3_hash_update_repr(h, (identifier, value.name_full))
+                if id_targets is not None:
+                    id_targets.add(value)
+            continue
+        if prop.type == 'COLLECTION':
+            _ue3_hash_update_repr(h, (identifier, len(value)))
+            for item in value:
+                _ue3_hash_update_rna(h, item, id_targets)
+            continue
+        if isinstance(value, (set, frozenset)):
+            # Enum flags.
+            value = sorted(value)
+        elif getattr(prop, "is_array", False):
+            value = tuple(value)
+        _ue3_hash_update_repr(h, (identifier, value))
+
+
+def _ue3_hash_update_fcurve(h, fc):
+    """Update hash `h` with the keyframes and modifiers of F-Curve `fc`."""
+    _ue3_hash_update_repr(h, (fc.data_path, fc.array_index, fc.mute, fc.extrapolation, len(fc.modifiers)))
+    # All the settings of the modifiers (strength, frame range, mute, ...), not only their type.
+    for mod in fc.modifiers:
+        _ue3_hash_update_rna(h, mod)
+    keyframes = fc.keyframe_points
+    for prop in ("co", "handle_left", "handle_right"):
+        _ue3_hash_update_foreach(h, keyframes, prop, 2, np.float32)
+    # The 'back', 'amplitude' and 'period' of the Back and Elastic easings.
+    for prop in ("back", "amplitude", "period"):
+        _ue3_hash_update_foreach(h, keyframes, prop, 1, np.float32)
+    for prop in ("interpolation", "easing"):
+        _ue3_hash_update_foreach(h, keyframes, prop, 1, np.int32)
+
+
+def _ue3_hash_update_action(h, act, act_slot):
+    """Update hash `h` with the F-Curves of action `act` (those of its slot `act_slot`, with layered actions)."""
+    _ue3_hash_update_repr(h, (act.name, tuple(act.frame_range)))
+    # COMPAT ADD BEGIN
+    if not api_compat.HAS_ANIM_LAYERED_1_STABLE:
+        fcurves = list(act.fcurves)
+    else:
+    # COMPAT ADD END
+        _ue3_hash_update_repr(h, act_slot.identifier if act_slot else None)
+        fcurves = [fc for layer in act.layers for strip in layer.strips for channelbag in strip.channelbags
+                   if channelbag.slot == act_slot for fc in channelbag.fcurves]
+    for fc in fcurves:
+        _ue3_hash_update_fcurve(h, fc)
+
+
+def _ue3_hash_update_anim_data(h, id_data):
+    """Update hash `h` with the active action of `id_data`, if any."""
+    anim_data = getattr(id_data, "animation_data", None)
+    act = anim_data.action if anim_data else None
+    if act is None:
+        _ue3_hash_update_repr(h, None)
+        return
+    act_slot = None
+    # COMPAT ADD BEGIN
+    if api_compat.HAS_ANIM_LAYERED_1_STABLE:
+    # COMPAT ADD END
+        act_slot = anim_data.action_slot
+    _ue3_hash_update_action(h, act, act_slot)
+
+
+def _ue3_hash_update_drivers(h, id_data, id_targets):
+    """Update hash `h` with the drivers of `id_data` (if any), adding the IDs their variables read to `id_targets`."""
+    anim_data = getattr(id_data, "animation_data", None)
+    if anim_data is None:
+        _ue3_hash_update_repr(h, None)
+        return
+    _ue3_hash_update_repr(h, len(anim_data.drivers))
+    for fc in anim_data.drivers:
+        _ue3_hash_update_fcurve(h, fc)
+        # Expression, variables and their targets.
+        _ue3_hash_update_rna(h, fc.driver, id_targets)
+
+
+def _ue3_hash_update_constraints(h, constraints, id_targets):
+    """Update hash `h` with all the settings of `constraints`, adding the IDs they read to set `id_targets`."""
+    _ue3_hash_update_repr(h, len(constraints))
+    for con in constraints:
+        _ue3_hash_update_rna(h, con, id_targets)
+
+
+def _ue3_hash_update_id_targets(h, id_targets):
+    """Update hash `h` with the transforms and active actions of the IDs read by constraints and drivers.
+    Only the IDs they read directly are hashed, not those that these IDs depend on in turn."""
+    for id_data in sorted(id_targets, key=lambda id_data: (type(id_data).__name__, id_data.name_full)):
+        _ue3_hash_update_repr(h, (type(id_data).__name__, id_data.name_full))
+        if isinstance(id_data, Object):
+            h.update(np.array(id_data.matrix_world, dtype=np.float64))
+            if id_data.pose:
+                _ue3_hash_update_foreach(h, id_data.pose.bones, "matrix_basis", 16, np.float32)
+        _ue3_hash_update_anim_data(h, id_data)
+
+
+def _ue3_hash_update_mesh(h, me):
+    """Update hash `h` with the geometry, attributes, vertex weights and shape keys of mesh `me`."""
+    _ue3_hash_update_repr(h, [ma.name if ma else None for ma in me.materials])
+    _ue3_hash_update_foreach(h, me.loops, "vertex_index", 1, np.int32)
+    _ue3_hash_update_foreach(h, me.polygons, "loop_total", 1, np.int32)
+    # Includes vertex positions, UVs, colors, material indices, smooth/sharp flags...
+    for attr in me.attributes:
+        _ue3_hash_update_repr(h, (attr.name, attr.domain, attr.data_type))
+        foreach = _UE3_ATTRIBUTE_FOREACH.get(attr.data_type)
+        if foreach is not None:
+            _ue3_hash_update_foreach(h, attr.data, *foreach)
+    # There is no bulk access to the vertex weights.
+    for v in me.vertices:
+        _ue3_hash_update_repr(h, [(vg.group, vg.weight) for vg in v.groups])
+    if me.shape_keys:
+        for kb in me.shape_keys.key_blocks:
+            _ue3_hash_update_repr(h, (kb.name, kb.relative_key.name, kb.vertex_group, kb.mute,
+                                      kb.slider_min, kb.slider_max))
+            _ue3_hash_update_foreach(h, kb.data, "co", 3, np.float32)
+        # Shape keys are baked into every animation.
+        _ue3_hash_update_anim_data(h, me.shape_keys)
+
+
+def UE3_batch_scene_hash(scene_data, extra):
+    """Hash of everything that the files of a batch export of animations contain besides the animations themselves,
+    for `UE3BatchManifest.load`."""
+    h = hashlib.sha1()
+    settings = scene_data.settings
+    settings_values = []
+    for name, value in zip(settings._fields, settings):
+        if name in {"report", "context_objects", "UE3_batch_manifest"}:
+            # The exported objects are hashed below.
+            continue
+        if name == "media_settings":
+            value = value._replace(copy_set=None, embedded_set=None)
+        elif isinstance(value, (set, frozenset)):
+            # The order of sets changes from one session to the next.
+            value = sorted(value)
+        settings_values.append((name, value))
+    _ue3_hash_update_repr(h, (UE3BatchManifest.VERSION, extra, settings_values))
+
+    # Transforms of the objects and bones, as written in the Models of every file.
+    rest = settings.bake_anim and settings.UE3_rest_default_pose
+    # Constraints and drivers are evaluated while baking every animation, so the IDs they read matter too.
+    id_targets = set()
+    for ob_obj in scene_data.objects:
+        _ue3_hash_update_repr(h, (ob_obj.key, ob_obj.name))
+        h.update(np.array(ob_obj.fbx_object_matrix(scene_data, rest=rest), dtype=np.float64))
+        if ob_obj.is_object:
+            ob = ob_obj.bdata
+            _ue3_hash_update_repr(h, [vg.name for vg in ob.vertex_groups])
+            if ob_obj.type == 'CAMERA':
+                # Cameras are baked into every animation.
+                _ue3_hash_update_anim_data(h, ob.data)
+            _ue3_hash_update_constraints(h, ob.constraints, id_targets)
+            if ob.pose:
+                for pbo in ob.pose.bones:
+                    _ue3_hash_update_repr(h, pbo.name)
+                    _ue3_hash_update_constraints(h, pbo.constraints, id_targets)
+            for id_data in (ob, ob.data, getattr(ob.data, "shape_keys", None)):
+                _ue3_hash_update_drivers(h, id_data, id_targets)
+    _ue3_hash_update_id_targets(h, id_targets)
+
+    meshes = {me_key: me for me_key, me, _free in scene_data.data_meshes.values()}
+    for me_key, me in meshes.items():
+        _ue3_hash_update_repr(h, me_key)
+        _ue3_hash_update_mesh(h, me)
+    return h.hexdigest()
+
+
+def UE3_batch_anim_hash(ob, act, act_slot):
+    """Hash of the animation of object `ob` with action `act` (and its slot `act_slot`), for `UE3BatchManifest.keep`."""
+    h = hashlib.sha1()
+    _ue3_hash_update_repr(h, ob.name)
+    _ue3_hash_update_action(h, act, act_slot)
+    return h.hexdigest()
+# UnDrew Add End
+
+
 # ##### Top-level FBX data container. #####
 
 # Helper sub-container gathering all exporter settings related to media (texture files).
@@ -2174,11 +2731,14 @@ FBXExportSettings = namedtuple("FBXExportSettings", (
     "UE3_dont_add_armature_bone", "UE3_matrix_double_precision",
     "UE3_rest_default_pose", "UE3_remove_anim_object_prefix", "UE3_nla_modular_anim_support",
     "UE3_nla_only_animate_owner", "UE3_nla_force_export",
-    "UE3_export_scale_inheritance", "UE3_force_aligned_scaling",
+    "UE3_export_scale_inheritance", "UE3_force_aligned_scaling", "UE3_bake_anim_simplify_mode",
     # UnDrew Add End
     # UnDrew Add Start : Not settings, but should be held here for performance reasons.
     "UE3_global_matrix_no_scale",
     # UnDrew Add End
+    # UnDrew Add Start : Not a setting either, the UE3BatchManifest of an incremental batch export of animations.
+    "UE3_batch_manifest",
+    # UnDrew Add End
     "bone_correction_matrix", "bone_correction_matrix_inv",
     "bake_anim", "bake_anim_use_all_bones", "bake_anim_use_nla_strips", "bake_anim_use_all_actions",
     "bake_anim_step", "bake_anim_simplify_factor", "bake_anim_force_startend_keying",
@@ -0,0 +1,81 @@
+import json
+import os
+
+# Note: `bpy` cannot be imported here, so that the manifest can be tested outside of Blender. The hashes it stores are
+# computed by `UE3_batch_scene_hash` and `UE3_batch_anim_hash` of fbx_utils.
+
+
+class UE3BatchManifest:
+    """
+    Manifest of the animation files written by a batch export of animations, stored as JSON next to them, so that
+    exporting again only bakes and writes the animations whose file is out of date.
+    Each file is recorded with a hash of its action, and with the properties its animation animates (which are flagged
+    as animated in the Models of all files).
+    Everything else the files contain (export settings, object and bone transforms, meshes, shape keys, cameras,
+    constraints, drivers and the objects they read...) is covered by a single scene hash, any change to which makes all
+    files out of date.
+    Changes to data that is not hashed (e.g. materials or Python handlers) are not detected.
+    """
+    __slots__ = ("dirpath", "extra", "scene_hash", "_files", "_pending", "_new_files")
+
+    FILENAME = ".ue3_batch_manifest.json"
+    # Increase when the contents of the files or the hashes change, so that files written before are not kept.
+    VERSION = 4
+
+    def __init__(self, dirpath, extra):
+        self.dirpath = dirpath
+        # Values that affect the files, other than export settings.
+        self.extra = extra
+        self.scene_hash = None
+        self._files = {}
+        self._pending = {}
+        self._new_files = {}
+
+    def load(self, scene_hash):
+        """
+        Load the manifest of the previous export, only keeping its files if it was written with the same `scene_hash`.
+        """
+        self.scene_hash = scene_hash
+        try:
+            with open(os.path.join(self.dirpath, self.FILENAME), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return
+        if manifest.get("version") == self.VERSION and manifest.get("scene") == self.scene_hash:
+            self._files = manifest["files"]
+
+    def keep(self, filename, anim_hash):
+        """
+        If file `filename` was last written with the same `anim_hash` and still exists, keep it and return the set of
+        (elem_key, fbx_prop) its animation animates. Otherwise, return None, `set_written` being expected to be called
+        once the file has been written again.
+        """
+        file_data = self._files.get(filename)
+        if (file_data is not None and file_data["hash"] == anim_hash
+                and os.path.isfile(os.path.join(self.dirpath, filename))):
+            self._new_files[filename] = file_data
+            return {tuple(animated) for animated in file_data["animated"]}
+        self._pending[filename] = anim_hash
+        return None
+
+    def set_written(self, filename, anim):
+        """Record that file `filename` has been written with animation `anim`, if its hash was given to `keep`."""
+        anim_hash = self._pending.pop(filename, None)
+        if anim_hash is None:
+            # Written with an animation that is not hashed (e.g. an NLA strip), so never up to date.
+            self._new_files.pop(filename, None)
+            return
+        _astack_key, astack, _alayer_key, _name, _fstart, _fend = anim
+        animated = [(elem_key, fbx_prop)
+                    for elem_key, (_alayer_key, acurvenodes) in astack.items() for fbx_prop in acurvenodes]
+        self._new_files[filename] = {"hash": anim_hash, "animated": animated}
+
+    def save(self):
+        """Write the manifest of the kept and written files."""
+        manifest = {"version": self.VERSION, "scene": self.scene_hash, "files": self._new_files}
+        os.makedirs(self.dirpath, exist_ok=True)
+        filepath = os.path.join(self.dirpath, self.FILENAME)
+        tmp_filepath = filepath + ".tmp"
+        with open(tmp_filepath, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp_filepath, filepath)
@@ -0,0 +1,750 @@
+from collections import namedtuple
+import math
+
+import numpy as np
+
+# Note: `bpy` and `mathutils` cannot be imported here, so that the math used for baking, simplifying and importing
+# animations can be tested outside of Blender.
+
+
+def _ue3_normalize_vectors(vecs):
+    """
+    Normalize an array of 3D vectors, returning the normalized vectors and their original lengths.
+    Like Blender's `normalize_v3_v3()`, (nearly) zero vectors are set to zero, with a length of zero.
+    """
+    lengths = np.sqrt(np.einsum('ij,ij->i', vecs, vecs))
+    valid = lengths > 1.0e-35
+    lengths[~valid] = 0.0
+    normalized = np.zeros_like(vecs)
+    np.divide(vecs, lengths[:, None], out=normalized, where=valid[:, None])
+    return normalized, lengths
+
+
+def _ue3_matrices_inverted_safe(mats):
+    """
+    Invert an array of 4x4 matrices, like `Matrix.inverted_safe()` does for a single one.
+    """
+    mats = mats.copy()
+    singular = np.linalg.det(mats) == 0.0
+    if singular.any():
+        # Degenerate matrices (e.g. zero scale on some axis) are slightly tweaked to make them invertible.
+        singular_idx = np.flatnonzero(singular)[:, None]
+        mats[singular_idx, (0, 1, 2), (0, 1, 2)] += 1.0e-8
+        singular = np.linalg.det(mats) == 0.0
+        mats[singular] = np.identity(4)
+    inverted = np.linalg.inv(mats)
+    inverted[singular] = np.identity(4)
+    return inverted
+
+
+def _ue3_orthogonalize_pose_matrices(mats):
+    """
+    Remove the shear from an array of 4x4 matrices, preserving the direction of the Y axis (like Blender's
+    `orthogonalize_m4_stable(mat, 1, False)`), then normalize their 3x3 part.
+    Returns the orthonormal matrices and the scale of their axes after the shear was removed.
+    """
+    mats = mats.copy()
+    # Y axis is the primary axis, X and Z are the secondary ones.
+    v1 = mats[:, :3, 1]
+    v2 = mats[:, :3, 0]
+    v3 = mats[:, :3, 2]
+
+    # Make secondary axis vectors orthogonal to the primary via plane projection, which preserves the determinant.
+    len_sq_v1 = np.einsum('ij,ij->i', v1, v1)
+    valid = len_sq_v1 > 0.0
+    if valid.any():
+        v1_valid = v1[valid]
+        for vec in (v2, v3):
+            vec[valid] -= v1_valid * (np.einsum('ij,ij->i', vec[valid], v1_valid) / len_sq_v1[valid])[:, None]
+
+    # Make secondary axis vectors orthogonal relative to each other.
+    norm_v2, length_v2 = _ue3_normalize_vectors(v2)
+    norm_v3, length_v3 = _ue3_normalize_vectors(v3)
+    cos_angle = np.einsum('ij,ij->i', norm_v2, norm_v3)
+    abs_cos_angle = np.abs(cos_angle)
+    # Apply correction if the shear angle is significant, and not degenerate.
+    sheared = np.flatnonzero((abs_cos_angle > 1.0e-4) & (abs_cos_angle < 1.0 - np.finfo(np.float32).eps))
+    if len(sheared):
+        cos_angle = cos_angle[sheared]
+        fix_v2 = norm_v2[sheared]
+        fix_v3 = norm_v3[sheared]
+        # Adjust v2 by half of the necessary angle correction, thus the angle change is the same for both axes.
+        angle = np.arccos(cos_angle)
+        target_angle = angle + (math.pi / 2 - angle) / 2
+        fix_v2 -= fix_v3 * cos_angle[:, None]
+        fix_v2 *= (np.sin(target_angle) / np.linalg.norm(fix_v2, axis=1))[:, None]
+        fix_v2 += fix_v3 * np.cos(target_angle)[:, None]
+        # Make v3 orthogonal.
+        fix_v3, _lengths = _ue3_normalize_vectors(np.cross(np.cross(fix_v2, fix_v3), fix_v2))
+        norm_v2[sheared] = fix_v2
+        norm_v3[sheared] = fix_v3
+        # Re-apply scale, preserving area and proportion.
+        scale_fac = np.sqrt(np.sin(angle))
+        length_v2[sheared] *= scale_fac
+        length_v3[sheared] *= scale_fac
+
+    norm_v1, length_v1 = _ue3_normalize_vectors(v1)
+    mats[:, :3, 0] = norm_v2
+    mats[:, :3, 1] = norm_v1
+    mats[:, :3, 2] = norm_v3
+    return mats, np.stack((length_v2, length_v1, length_v3), axis=1)
+
+
+def _ue3_matrices_decompose_quat(mats):
+    """
+    Array version of `Matrix.decompose()`, for an array of 4x4 matrices.
+    Returns the locations, the rotations (as quaternions) and the scales.
+    """
+    rot_x, size_x = _ue3_normalize_vectors(mats[:, :3, 0])
+    rot_y, size_y = _ue3_normalize_vectors(mats[:, :3, 1])
+    rot_z, size_z = _ue3_normalize_vectors(mats[:, :3, 2])
+    rot = np.stack((rot_x, rot_y, rot_z), axis=2)
+    size = np.stack((size_x, size_y, size_z), axis=1)
+    negative = np.linalg.det(rot) < 0.0
+    rot[negative] *= -1.0
+    size[negative] *= -1.0
+
+    # Rotation matrix to quaternion, choosing the same formula as Blender's `mat3_normalized_to_quat()` does, since
+    # `rot` is not necessarily orthogonal.
+    m00, m11, m22 = rot[:, 0, 0], rot[:, 1, 1], rot[:, 2, 2]
+    # Off-diagonal elements, named after Blender's column-major `mat[col][row]` notation.
+    m12, m21 = rot[:, 2, 1], rot[:, 1, 2]
+    m20, m02 = rot[:, 0, 2], rot[:, 2, 0]
+    m01, m10 = rot[:, 1, 0], rot[:, 0, 1]
+    trace = m00 + m11 + m22
+    use_w = trace > 0.0
+    use_x = ~use_w & (m00 > m11) & (m00 > m22)
+    use_y = ~use_w & ~use_x & (m11 > m22)
+    use_z = ~use_w & ~use_x & ~use_y
+    quat = np.empty((len(mats), 4))
+    for use, diag, w, x, y, z in (
+            (use_w, 1.0 + trace, None, m12 - m21, m20 - m02, m01 - m10),
+            (use_x, 1.0 + m00 - m11 - m22, m12 - m21, None, m10 + m01, m20 + m02),
+            (use_y, 1.0 - m00 + m11 - m22, m20 - m02, m10 + m01, None, m21 + m12),
+            (use_z, 1.0 - m00 - m11 + m22, m01 - m10, m20 + m02, m21 + m12, None)):
+        if not use.any():
+            continue
+        s = 2.0 * np.sqrt(diag[use])
+        quat[use] = np.stack([0.25 * s if c is None else c[use] / s for c in (w, x, y, z)], axis=1)
+    # Make sure W is non-negative for a canonical result.
+    quat[quat[:, 0] < 0.0] *= -1.0
+    quat /= np.linalg.norm(quat, axis=1)[:, None]
+
+    return mats[:, :3, 3].copy(), quat, size
+
+
+def _ue3_quats_to_rot_matrices(quat):
+    """
+    Array version of `Quaternion.to_matrix()`, for an array of normalized quaternions.
+    """
+    w, x, y, z = quat.T
+    rot = np.empty((len(quat), 3, 3))
+    rot[:, 0, 0] = 1.0 - 2.0 * (y * y + z * z)
+    rot[:, 0, 1] = 2.0 * (x * y - w * z)
+    rot[:, 0, 2] = 2.0 * (x * z + w * y)
+    rot[:, 1, 0] = 2.0 * (x * y + w * z)
+    rot[:, 1, 1] = 1.0 - 2.0 * (x * x + z * z)
+    rot[:, 1, 2] = 2.0 * (y * z - w * x)
+    rot[:, 2, 0] = 2.0 * (x * z - w * y)
+    rot[:, 2, 1] = 2.0 * (y * z + w * x)
+    rot[:, 2, 2] = 1.0 - 2.0 * (x * x + y * y)
+    return rot
+
+
+def _ue3_matrices_decompose(mats):
+    """
+    Array version of `Matrix.decompose()`, for an array of 4x4 matrices.
+    Returns the locations, the rotations (as 3x3 rotation matrices rather than quaternions) and the scales.
+    """
+    loc, quat, size = _ue3_matrices_decompose_quat(mats)
+    return loc, _ue3_quats_to_rot_matrices(quat), size
+
+
+def _ue3_matrices_remove_shear(mats):
+    """
+    Array version of `Matrix.LocRotScale(*mat.decompose())`, removing the shear from an array of 4x4 matrices.
+    """
+    _loc, rot, size = _ue3_matrices_decompose(mats)
+    result = mats.copy()
+    result[:, :3, :3] = rot * size[:, None, :]
+    result[:, 3] = (0.0, 0.0, 0.0, 1.0)
+    return result
+
+
+# Axes (i, j, k) and parity of each euler rotation order, like Blender's `rotOrders` table.
+_EULER_ORDERS = {
+    'XYZ': ((0, 1, 2), False),
+    'XZY': ((0, 2, 1), True),
+    'YXZ': ((1, 0, 2), True),
+    'YZX': ((1, 2, 0), False),
+    'ZXY': ((2, 0, 1), False),
+    'ZYX': ((2, 1, 0), True),
+}
+
+
+def _ue3_rot_matrices_to_eulers(rot, order='XYZ'):
+    """
+    Both euler solutions of an array of 3x3 rotation matrices, like Blender's `mat3_normalized_to_eulo2()`.
+    """
+    (i, j, k), parity = _EULER_ORDERS[order]
+    # Blender's column-major `mat[col][row]`.
+    mat = rot.transpose(0, 2, 1)
+    cy = np.hypot(mat[:, i, i], mat[:, i, j])
+    eul1 = np.empty((len(rot), 3))
+    eul2 = np.empty((len(rot), 3))
+    eul1[:, i] = np.arctan2(mat[:, j, k], mat[:, k, k])
+    eul1[:, j] = np.arctan2(-mat[:, i, k], cy)
+    eul1[:, k] = np.arctan2(mat[:, i, j], mat[:, i, i])
+    eul2[:, i] = np.arctan2(-mat[:, j, k], -mat[:, k, k])
+    eul2[:, j] = np.arctan2(-mat[:, i, k], -cy)
+    eul2[:, k] = np.arctan2(-mat[:, i, j], -mat[:, i, i])
+    gimbal_lock = cy <= 16.0 * np.finfo(np.float32).eps
+    if gimbal_lock.any():
+        eul1[gimbal_lock, i] = np.arctan2(-mat[:, k, j], mat[:, j, j])[gimbal_lock]
+        eul1[gimbal_lock, k] = 0.0
+        eul2[gimbal_lock] = eul1[gimbal_lock]
+    if parity:
+        eul1 *= -1.0
+        eul2 *= -1.0
+    return eul1, eul2
+
+
+def _ue3_compatible_eulers(eul, oldrot):
+    """
+    Array version of Blender's `compatible_eul()`, making each euler of `eul` as close as possible to the matching
+    euler of `oldrot`.
+    """
+    pi_thresh = 5.1
+    pi_x2 = 2.0 * math.pi
+    eul = eul.copy()
+
+    # Correct differences of about 360 degrees first.
+    deul = eul - oldrot
+    too_big = deul > pi_thresh
+    eul[too_big] -= np.floor(deul[too_big] / pi_x2 + 0.5) * pi_x2
+    too_small = deul < -pi_thresh
+    eul[too_small] += np.floor(-deul[too_small] / pi_x2 + 0.5) * pi_x2
+    deul = eul - oldrot
+
+    # Is one of the axis rotations larger than 180 degrees and the other ones small?
+    abs_deul = np.abs(deul)
+    for i, j, k in ((0, 1, 2), (1, 2, 0), (2, 0, 1)):
+        flip = (abs_deul[:, i] > 3.2) & (abs_deul[:, j] < 1.6) & (abs_deul[:, k] < 1.6)
+        eul[flip, i] -= np.copysign(pi_x2, deul[flip, i])
+    return eul
+
+
+def matrices_to_loc_euler_scale(mats, order='XYZ', euler_compat=None):
+    """
+    Decompose an (N, ..., 4, 4) array of matrices into location, euler rotation and scale arrays, of shape (N, ..., 3)
+    each. Same as `loc, rot, scale = mat.decompose()` then `rot.to_euler(order, euler_compat)` for each matrix, where
+    each euler is made compatible with the previous one along the first axis (e.g. the previous frame's one), and the
+    first ones with `euler_compat`, an array of shape (..., 3), if given.
+    """
+    shape = mats.shape[:-2]
+    num_items = int(np.prod(shape[1:]))
+    loc, rot, scale = _ue3_matrices_decompose(mats.reshape(-1, 4, 4))
+    eul1, eul2 = _ue3_rot_matrices_to_eulers(rot, order)
+    eul1 = eul1.reshape(-1, num_items, 3)
+    eul2 = eul2.reshape(-1, num_items, 3)
+
+    eulers = np.empty_like(eul1)
+    prev_eul = None if euler_compat is None else np.reshape(euler_compat, (num_items, 3))
+    for idx, (item_eul1, item_eul2) in enumerate(zip(eul1, eul2)):
+        if prev_eul is None:
+            # Return best, which is just the one with lowest values in it.
+            use_eul2 = np.abs(item_eul1).sum(axis=1) > np.abs(item_eul2).sum(axis=1)
+        else:
+            item_eul1 = _ue3_compatible_eulers(item_eul1, prev_eul)
+            item_eul2 = _ue3_compatible_eulers(item_eul2, prev_eul)
+            # Return best, which is just the one with lowest difference.
+            use_eul2 = np.abs(item_eul1 - prev_eul).sum(axis=1) > np.abs(item_eul2 - prev_eul).sum(axis=1)
+        prev_eul = eulers[idx] = np.where(use_eul2[:, None], item_eul2, item_eul1)
+
+    return loc.reshape(shape + (3,)), eulers.reshape(shape + (3,)), scale.reshape(shape + (3,))
+
+
+def matrices_to_loc_quat_scale(mats, quat_compat=None):
+    """
+    Decompose an (N, 4, 4) array of matrices into location, quaternion rotation and scale arrays, of shape (N, 3),
+    (N, 4) and (N, 3). Same as `loc, rot, scale = mat.decompose()` for each matrix, where each quaternion is negated
+    when needed to be on the same side as the previous one, and the first one as `quat_compat`, if given.
+    """
+    loc, quat, scale = _ue3_matrices_decompose_quat(mats)
+    if len(quat):
+        # Negating a quaternion also flips the side of all the next ones, compared to the original quaternions.
+        flip = np.empty(len(quat), dtype=bool)
+        flip[1:] = np.einsum('ij,ij->i', quat[1:], quat[:-1]) < 0.0
+        flip[0] = quat_compat is not None and np.dot(quat[0], quat_compat) < 0.0
+        quat[np.logical_xor.accumulate(flip)] *= -1.0
+    return loc, quat, scale
+
+
+def quats_to_axis_angles(quats):
+    """
+    Array version of `Quaternion.to_axis_angle()`, for an (N, 4) array of quaternions.
+    Returns the (N,) array of angles and the (N, 3) array of axes.
+    """
+    quats = quats / np.linalg.norm(quats, axis=1)[:, None]
+    half_angles = np.arccos(np.clip(quats[:, 0], -1.0, 1.0))
+    sin_half_angles = np.sin(half_angles)
+    sin_half_angles[np.abs(sin_half_angles) < np.finfo(np.float32).eps] = 1.0
+    axes = quats[:, 1:] / sin_half_angles[:, None]
+    # Zero axes are replaced with the X axis.
+    axes[~axes.any(axis=1)] = (1.0, 0.0, 0.0)
+    return half_angles * 2.0, axes
+
+
+def eulers_to_matrices(eulers, order='XYZ'):
+    """
+    Array version of `Euler(euler, order).to_matrix()`, for an (N, 3) array of eulers.
+    Returns an (N, 3, 3) array of rotation matrices.
+    """
+    mats = np.broadcast_to(np.identity(3), (len(eulers), 3, 3))
+    # The rotation around the first axis of `order` is applied first.
+    for axis in order:
+        i = 'XYZ'.index(axis)
+        j = (i + 1) % 3
+        k = (i + 2) % 3
+        cos = np.cos(eulers[:, i])
+        sin = np.sin(eulers[:, i])
+        axis_rot = np.zeros((len(eulers), 3, 3))
+        axis_rot[:, i, i] = 1.0
+        axis_rot[:, j, j] = cos
+        axis_rot[:, j, k] = -sin
+        axis_rot[:, k, j] = sin
+        axis_rot[:, k, k] = cos
+        mats = axis_rot @ mats
+    return mats
+
+
+def _ue3_bone_parent_transforms(offs_bone, parent_pose_mat, aligned):
+    """
+    Array version of Blender's `BKE_bone_parent_transform_calc_from_matrices()`, for bones inheriting the rotation of
+    their parent, with local location, and an inherit_scale of either 'ALIGNED' or 'NONE'.
+    Returns the rotscale matrices, loc matrices and post scales.
+    """
+    tmat, post_scale = _ue3_orthogonalize_pose_matrices(parent_pose_mat)
+    post_scale[~aligned] = 1.0
+    return tmat @ offs_bone, parent_pose_mat @ offs_bone, post_scale
+
+
+def _ue3_bone_parent_transforms_apply(rotscale_mat, loc_mat, post_scale, mats):
+    """
+    Array version of Blender's `BKE_bone_parent_transform_apply()`.
+    """
+    result = rotscale_mat @ mats
+    result[:, :3, 3] = np.einsum('nij,nj->ni', loc_mat[:, :3, :3], mats[:, :3, 3]) + loc_mat[:, :3, 3]
+    result[:, :3, :3] *= post_scale[:, None, :]
+    return result
+
+
+def bone_pose_levels(parent_indices, inherit_types):
+    """
+    Group bones by level of their hierarchy, for `bones_pose_to_local_matrices()`.
+    `parent_indices` gives the index of the parent of each bone (-1 for root bones), parents before their children, and
+    `inherit_types` gives their `ObjectWrapper.UE3_inherit_type`.
+    Returns a list of (full_idx, full_par_idx, conv_idx, conv_par_idx, conv_aligned) arrays for each level, where root
+    bones use `len(parent_indices)` as parent index.
+    """
+    no_parent_idx = len(parent_indices)
+    levels = []
+    depths = []
+    for bo_idx, (par_idx, inherit_type) in enumerate(zip(parent_indices, inherit_types)):
+        if par_idx < 0:
+            par_idx = no_parent_idx
+            depth = 0
+        else:
+            depth = depths[par_idx] + 1
+        depths.append(depth)
+        if depth == len(levels):
+            levels.append(([], [], [], [], []))
+        full_idx, full_par_idx, conv_idx, conv_par_idx, conv_aligned = levels[depth]
+        if inherit_type == 1:  # == RSrs
+            full_idx.append(bo_idx)
+            full_par_idx.append(par_idx)
+        else:
+            conv_idx.append(bo_idx)
+            conv_par_idx.append(par_idx)
+            conv_aligned.append(inherit_type == 0)
+    return [tuple(np.array(a, dtype=(bool if i == 4 else np.int64)) for i, a in enumerate(level)) for level in levels]
+
+
+def bones_pose_to_local_matrices(pose_mats, rest_local, rest_local_inv, levels):
+    """
+    Array version of `ObjectWrapper.UE3_bone_local_to_pose(pose_mat, invert=True)`, for all bones of an armature.
+    `pose_mats`, `rest_local` and `rest_local_inv` are (N, 4, 4) arrays of the bones' pose-space matrices, rest
+    matrices relative to their parent and their inverse, and `levels` comes from `bone_pose_levels()`.
+    Returns the FBX local-space matrices of the bones, and their pose-space matrices recomputed from those (i.e. what
+    `ObjectWrapper.UE3_bone_last_pose_matrix` gets set to), as (N, 4, 4) arrays.
+    """
+    num_bones = len(pose_mats)
+    local_mats = np.empty((num_bones, 4, 4))
+    # Bones are processed one level of the hierarchy at a time, since each bone's pose-space matrix (once shear was
+    # removed) is needed to compute its children's matrices. Root bones use the extra identity matrix at the end of
+    # the pose-space matrices array as parent matrix.
+    last_pose_mats = np.empty((num_bones + 1, 4, 4))
+    last_pose_mats[num_bones] = np.identity(4)
+    for full_idx, full_par_idx, conv_idx, conv_par_idx, conv_aligned in levels:
+        if len(full_idx):
+            par_pose_mats = last_pose_mats[full_par_idx]
+            m = _ue3_matrices_inverted_safe(par_pose_mats) @ pose_mats[full_idx]
+            m = _ue3_matrices_remove_shear(m)
+            local_mats[full_idx] = m
+            last_pose_mats[full_idx] = par_pose_mats @ m
+        if len(conv_idx):
+            offs_bone = rest_local[conv_idx]
+            rotscale_mat, loc_mat, post_scale = _ue3_bone_parent_transforms(offs_bone, last_pose_mats[conv_par_idx],
+                                                                            conv_aligned)
+            # Pose Space (armature-relative) -> Blender Local Space (rest-rel) -> FBX Local Space (parent-rel).
+            post_scale_inv = np.zeros_like(post_scale)
+            np.divide(1.0, post_scale, out=post_scale_inv, where=(post_scale != 0.0))
+            m = offs_bone @ _ue3_bone_parent_transforms_apply(_ue3_matrices_inverted_safe(rotscale_mat),
+                                                              _ue3_matrices_inverted_safe(loc_mat),
+                                                              post_scale_inv, pose_mats[conv_idx])
+            m = _ue3_matrices_remove_shear(m)
+            local_mats[conv_idx] = m
+            # FBX Local Space (parent-relative) -> Blender Local Space (rest-rel) -> Pose Space (armature-rel).
+            last_pose_mats[conv_idx] = _ue3_bone_parent_transforms_apply(rotscale_mat, loc_mat, post_scale,
+                                                                         rest_local_inv[conv_idx] @ m)
+    return local_mats, last_pose_mats[:num_bones]
+
+
+def _ue3_fit_linear_keyframes(times, values, tolerances):
+    """Fit sampled curves with linear segments, splitting every segment at its worst fitted sample until linearly
+    interpolating between the ends of each segment is within tolerance of every sample. This is Douglas-Peucker, using
+    the error in value rather than the perpendicular distance, with all the segments of all the curves split at once.
+
+    `values` and `tolerances` are 2D arrays with a row per curve and a column per time in `times`.
+
+    Returns a mask of the samples at the ends of the segments, which always includes the first and last samples."""
+    keep_mask = np.zeros(values.shape, dtype=bool)
+    num_curves, num_samples = values.shape
+    if num_samples == 0:
+        return keep_mask
+    keep_mask[:, 0] = True
+    keep_mask[:, -1] = True
+    if num_samples < 3:
+        return keep_mask
+
+    # The first and last samples of each curve are always kept, so no segment can span two curves, meaning the curves
+    # can be flattened into a single array.
+    flat_keep_mask = keep_mask.ravel()
+    flat_values = values.astype(np.float64).ravel()
+    flat_times = np.tile(np.asarray(times, dtype=np.float64), num_curves)
+    flat_tolerances = tolerances.ravel()
+
+    # Only the samples of segments that have been split need to be checked again.
+    to_check = np.flatnonzero(~flat_keep_mask)
+    while to_check.size:
+        # The indices of the kept samples at the start and end of the segment that each sample is in.
+        kept_indices = np.flatnonzero(flat_keep_mask)
+        segment_end_idx = np.searchsorted(kept_indices, to_check)
+        segment_starts = kept_indices[segment_end_idx - 1]
+        segment_ends = kept_indices[segment_end_idx]
+
+        start_times = flat_times[segment_starts]
+        start_values = flat_values[segment_starts]
+        interp_fac = (flat_times[to_check] - start_times) / (flat_times[segment_ends] - start_times)
+        fitted_values = start_values + (flat_values[segment_ends] - start_values) * interp_fac
+        error_ratios = np.abs(flat_values[to_check] - fitted_values) / flat_tolerances[to_check]
+
+        # `to_check` is sorted, so the samples of each segment are contiguous.
+        segment_first_check_idx = np.flatnonzero(np.diff(segment_starts, prepend=-1))
+        segment_max_error_ratios = np.maximum.reduceat(error_ratios, segment_first_check_idx)
+        segment_lengths = np.diff(segment_first_check_idx, append=len(to_check))
+        max_error_ratios = np.repeat(segment_max_error_ratios, segment_lengths)
+
+        # Split each segment that is outside tolerance at its worst sample. Several samples can be equally bad (e.g. on
+        # a linear ramp, where the error and the relative tolerance grow together), only the first of them is used.
+        segment_outside_tolerance = max_error_ratios > 1.0
+        split_candidates = np.flatnonzero(segment_outside_tolerance & (error_ratios == max_error_ratios))
+        _unique, first_candidates = np.unique(segment_starts[split_candidates], return_index=True)
+        split_mask = np.zeros(len(to_check), dtype=bool)
+        split_mask[split_candidates[first_candidates]] = True
+        flat_keep_mask[to_check[split_mask]] = True
+        to_check = to_check[segment_outside_tolerance & ~split_mask]
+
+    return keep_mask
+
+
+def simplify_fit_keep_mask(times, values, fac):
+    """Mask of the samples of each row of `values` that `AnimationCurveNodeWrapper.simplify_fit` keeps, with the same
+    tolerances as `AnimationCurveNodeWrapper.simplify`. Rows where no sample differs from the first sample by more than
+    the tolerance are static, and get no samples kept at all."""
+    min_reldiff_fac = fac * 1.0e-3
+    min_absdiff_fac = 0.1
+
+    tolerances = min_reldiff_fac * np.maximum(2.0 * np.abs(values), min_absdiff_fac)
+    keep_mask = _ue3_fit_linear_keyframes(times, values, tolerances)
+    is_static = np.all(np.abs(values - values[:, :1]) <= tolerances, axis=1)
+    keep_mask[is_static] = False
+    return keep_mask
+
+
+# Blender's `eBezTriple_Interpolation` values, which are the values of the `Keyframe.interpolation` enum items.
+CONSTANT_INTERPOLATION_VALUE = 0
+LINEAR_INTERPOLATION_VALUE = 1
+BEZIER_INTERPOLATION_VALUE = 2
+
+# KeyAttrFlags bits, see FbxAnimCurveDef in the FBX SDK.
+FBX_KEY_INTERPOLATION_MASK = 0x0000000e
+FBX_KEY_INTERPOLATION_CONSTANT = 0x00000002
+FBX_KEY_INTERPOLATION_LINEAR = 0x00000004
+FBX_KEY_INTERPOLATION_CUBIC = 0x00000008
+FBX_KEY_TANGENT_USER = 0x00000400
+FBX_KEY_TANGENT_CLAMP = 0x00001000
+FBX_KEY_TANGENT_CLAMP_PROGRESSIVE = 0x00004000
+FBX_KEY_WEIGHTED_RIGHT = 0x01000000
+FBX_KEY_WEIGHTED_NEXT_LEFT = 0x02000000
+# The tangent weights of a key are packed as two 16-bit integers into the bits of the third KeyAttrDataFloat value.
+FBX_KEY_WEIGHT_DIVISOR = 10000.0
+FBX_KEY_WEIGHT_DEFAULT = 1.0 / 3.0
+# Minimum tangent weight, so that the slope at the end of a weighted segment is always defined.
+FBX_KEY_WEIGHT_MIN = 1e-3
+
+# Per-key interpolation of an animation curve. `interpolation` contains the Blender interpolation enum value of the
+# segment starting at each key. The slopes are in value per FBX ktime, and the weights are the length of each tangent
+# handle as a fraction of the time to the previous/next key.
+FBXCurveInterpolation = namedtuple("FBXCurveInterpolation", (
+    "interpolation", "left_slopes", "right_slopes", "left_weights", "right_weights",
+))
+
+
+def fbx_curve_interpolation(key_times, key_values, attr_flags, attr_data, attr_refcount, fbx_ktime):
+    """Compute the interpolation of a valid animation curve from its KeyAttrFlags, KeyAttrDataFloat and KeyAttrRefCount
+    arrays.
+
+    Returns an FBXCurveInterpolation, or None if the curve only uses linear interpolation or its key attributes are
+    invalid.
+
+    TCB tangents are read as auto tangents and 'constant next' keys are read as regular constant keys."""
+    num_keys = len(key_times)
+    if num_keys < 2:
+        return None
+    attr_data = attr_data.astype(np.float32, copy=False)
+    num_attrs = len(attr_flags)
+    if (len(attr_refcount) != num_attrs or len(attr_data) != num_attrs * 4 or (attr_refcount < 0).any()
+            or attr_refcount.sum() != num_keys):
+        return None
+
+    # Each key attribute is shared by the next `refcount` keys.
+    key_attr_indices = np.repeat(np.arange(num_attrs), attr_refcount)
+    key_flags = attr_flags[key_attr_indices]
+    key_interp_flags = key_flags & FBX_KEY_INTERPOLATION_MASK
+    is_constant = key_interp_flags == FBX_KEY_INTERPOLATION_CONSTANT
+    is_cubic = key_interp_flags == FBX_KEY_INTERPOLATION_CUBIC
+    # The interpolation of the last key is unused because there is no segment after it.
+    if not (is_constant[:-1].any() or is_cubic[:-1].any()):
+        return None
+
+    interpolation = np.full(num_keys, LINEAR_INTERPOLATION_VALUE, dtype=np.uint8)
+    interpolation[is_constant] = CONSTANT_INTERPOLATION_VALUE
+    interpolation[is_cubic] = BEZIER_INTERPOLATION_VALUE
+
+    times = key_times.astype(np.float64)
+    values = key_values.astype(np.float64)
+
+    # Auto (cardinal spline) tangents are not stored, so compute them from the neighbouring keys. The first and last
+    # keys only have one neighbour.
+    prev_times = np.concatenate((times[:1], times[:-1]))
+    next_times = np.concatenate((times[1:], times[-1:]))
+    prev_values = np.concatenate((values[:1], values[:-1]))
+    next_values = np.concatenate((values[1:], values[-1:]))
+    auto_slopes = (next_values - prev_values) / (next_times - prev_times)
+    # Clamped tangents are flat at keys that are a local minimum or maximum.
+    is_clamped = (key_flags & (FBX_KEY_TANGENT_CLAMP | FBX_KEY_TANGENT_CLAMP_PROGRESSIVE)) != 0
+    is_extreme = (values - prev_values) * (next_values - values) <= 0.0
+    auto_slopes[is_clamped & is_extreme] = 0.0
+
+    # User tangents are stored as the key's right slope and the next key's left slope, in value per second.
+    key_data = attr_data.reshape(num_attrs, 4)[key_attr_indices]
+    is_user = (key_flags & FBX_KEY_TANGENT_USER) != 0
+    right_slopes = np.where(is_user, key_data[:, 0] / fbx_ktime, auto_slopes)
+    left_slopes = auto_slopes.copy()
+    left_slopes[1:][is_user[1:]] = key_data[:-1, 1][is_user[1:]] / fbx_ktime
+
+    key_weights = np.ascontiguousarray(key_data[:, 2]).view(np.uint32)
+    right_weights = np.full(num_keys, FBX_KEY_WEIGHT_DEFAULT)
+    is_weighted = (key_flags & FBX_KEY_WEIGHTED_RIGHT) != 0
+    right_weights[is_weighted] = (key_weights[is_weighted] & 0xffff) / FBX_KEY_WEIGHT_DIVISOR
+    left_weights = np.full(num_keys, FBX_KEY_WEIGHT_DEFAULT)
+    is_weighted = (key_flags[:-1] & FBX_KEY_WEIGHTED_NEXT_LEFT) != 0
+    left_weights[1:][is_weighted] = (key_weights[:-1][is_weighted] >> 16) / FBX_KEY_WEIGHT_DIVISOR
+    # The handles of a segment must not overlap in time, otherwise its value would not be a function of time. Like
+    # Blender does for overlapping handles, scale both handles down until they meet.
+    segment_weights = right_weights[:-1] + left_weights[1:]
+    overlapping = segment_weights > 1.0
+    right_weights[:-1][overlapping] /= segment_weights[overlapping]
+    left_weights[1:][overlapping] /= segment_weights[overlapping]
+    np.clip(right_weights, FBX_KEY_WEIGHT_MIN, 1.0, out=right_weights)
+    np.clip(left_weights, FBX_KEY_WEIGHT_MIN, 1.0, out=left_weights)
+
+    return FBXCurveInterpolation(interpolation, left_slopes, right_slopes, left_weights, right_weights)
+
+
+def _fbx_curve_segments_evaluate(key_times, key_values, key_interp, segments, offsets):
+    """Evaluate the value and slope of an animation curve at `offsets` time into each of `segments`, where the segment
+    index is the index of the key at its start.
+
+    Cubic segments are Bézier curves with control points at the key values and along the key tangents, which, when the
+    tangents are not weighted, reduces to Hermite interpolation."""
+    segments_next = segments + 1
+    t0 = key_times[segments].astype(np.float64)
+    dt = key_times[segments_next] - t0
+    v0 = key_values[segments].astype(np.float64)
+    v1 = key_values[segments_next].astype(np.float64)
+
+    u = offsets / dt
+    slopes = (v1 - v0) / dt
+    values = v0 + (v1 - v0) * u
+    if key_interp is None:
+        return values, slopes
+
+    interpolation = key_interp.interpolation[segments]
+    is_constant = interpolation == CONSTANT_INTERPOLATION_VALUE
+    values[is_constant] = v0[is_constant]
+    slopes[is_constant] = 0.0
+
+    is_bezier = interpolation == BEZIER_INTERPOLATION_VALUE
+    if is_bezier.any():
+        bez_segments = segments[is_bezier]
+        bez_dt = dt[is_bezier]
+        w0 = key_interp.right_weights[bez_segments]
+        w1 = key_interp.left_weights[bez_segments + 1]
+        # Control points, with the time normalized to the segment.
+        x1 = w0
+        x2 = 1.0 - w1
+        y0 = v0[is_bezier]
+        y3 = v1[is_bezier]
+        y1 = y0 + key_interp.right_slopes[bez_segments] * w0 * bez_dt
+        y2 = y3 - key_interp.left_slopes[bez_segments + 1] * w1 * bez_dt
+
+        x = u[is_bezier]
+        bez_u = x.copy()
+        # With the default weights, the time is linear in `u`, otherwise, find `u` by bisection, which always converges
+        # because the time is increasing in `u` when the handles don't overlap.
+        is_weighted = ((np.abs(w0 - FBX_KEY_WEIGHT_DEFAULT) > 1e-6)
+                       | (np.abs(w1 - FBX_KEY_WEIGHT_DEFAULT) > 1e-6))
+        if is_weighted.any():
+            wx = x[is_weighted]
+            wx1 = x1[is_weighted]
+            wx2 = x2[is_weighted]
+            lo = np.zeros_like(wx)
+            hi = np.ones_like(wx)
+            for _i in range(40):
+                mid = (lo + hi) * 0.5
+                inv_mid = 1.0 - mid
+                mid_x = 3.0 * inv_mid * mid * (inv_mid * wx1 + mid * wx2) + mid * mid * mid
+                below = mid_x < wx
+                lo = np.where(below, mid, lo)
+                hi = np.where(below, hi, mid)
+            bez_u[is_weighted] = (lo + hi) * 0.5
+
+        inv_u = 1.0 - bez_u
+        values[is_bezier] = (inv_u * inv_u * inv_u * y0 + 3.0 * inv_u * bez_u * (inv_u * y1 + bez_u * y2)
+                             + bez_u * bez_u * bez_u * y3)
+        dy_du = 3.0 * (inv_u * inv_u * (y1 - y0) + 2.0 * inv_u * bez_u * (y2 - y1) + bez_u * bez_u * (y3 - y2))
+        dx_du = 3.0 * (inv_u * inv_u * x1 + 2.0 * inv_u * bez_u * (x2 - x1) + bez_u * bez_u * (1.0 - x2))
+        slopes[is_bezier] = dy_du / (dx_du * bez_dt)
+
+    return values, slopes
+
+
+def _fbx_curve_evaluate(key_times, key_values, key_interp, times, initial_value):
+    """Evaluate an animation curve at each of the sorted `times`.
+
+    Returns the values, the slopes on either side of each time and the interpolation of the curve from each time
+    onwards. Like `np.interp(times, key_times, key_values, left=initial_value)`, the curve is `initial_value` before its
+    first key and the value of its last key after its last key."""
+    num_times = len(times)
+    last_segment = len(key_times) - 2
+
+    values = np.empty(num_times, dtype=np.float64)
+    left_slopes = np.zeros(num_times, dtype=np.float64)
+    right_slopes = np.zeros(num_times, dtype=np.float64)
+    interpolation = np.full(num_times, CONSTANT_INTERPOLATION_VALUE, dtype=np.uint8)
+
+    # The segment that each time starts, and the segment that each time ends.
+    right_segments = np.searchsorted(key_times, times, side='right') - 1
+    left_segments = np.searchsorted(key_times, times, side='left') - 1
+
+    values[right_segments < 0] = initial_value
+    values[right_segments > last_segment] = key_values[-1]
+
+    in_curve = (right_segments >= 0) & (right_segments <= last_segment)
+    segments = right_segments[in_curve]
+    values[in_curve], right_slopes[in_curve] = _fbx_curve_segments_evaluate(
+        key_times, key_values, key_interp, segments, times[in_curve] - key_times[segments])
+    if key_interp is None:
+        interpolation[in_curve] = LINEAR_INTERPOLATION_VALUE
+    else:
+        interpolation[in_curve] = key_interp.interpolation[segments]
+
+    in_curve = (left_segments >= 0) & (left_segments <= last_segment)
+    segments = left_segments[in_curve]
+    left_slopes[in_curve] = _fbx_curve_segments_evaluate(
+        key_times, key_values, key_interp, segments, times[in_curve] - key_times[segments])[1]
+
+    return values, left_slopes, right_slopes, interpolation
+
+
+def _fbx_curves_evaluate_combined(times_and_values_tuples, initial_values, times):
+    """Evaluate each animation curve at `times`. Returns the values, slopes and interpolation of each curve, and the
+    interpolation of each combined keyframe, which is constant when all the curves are constant, cubic when any curve
+    is cubic and linear otherwise."""
+    num_times = len(times)
+    all_constant = np.ones(num_times, dtype=bool)
+    any_bezier = np.zeros(num_times, dtype=bool)
+    evaluated = []
+    for (key_times, key_values, key_interp), initial_value in zip(times_and_values_tuples, initial_values):
+        values, left_slopes, right_slopes, interpolation = _fbx_curve_evaluate(
+            key_times, key_values, key_interp, times, initial_value)
+        all_constant &= interpolation == CONSTANT_INTERPOLATION_VALUE
+        any_bezier |= interpolation == BEZIER_INTERPOLATION_VALUE
+        evaluated.append((values, left_slopes, right_slopes, interpolation))
+
+    combined_interpolation = np.full(num_times, LINEAR_INTERPOLATION_VALUE, dtype=np.uint8)
+    combined_interpolation[all_constant] = CONSTANT_INTERPOLATION_VALUE
+    combined_interpolation[any_bezier] = BEZIER_INTERPOLATION_VALUE
+    return evaluated, combined_interpolation
+
+
+def fbx_curves_combine(times, times_and_values_tuples, initial_values, hold_step):
+    """Evaluate multiple animation curves, at least one of which has an FBXCurveInterpolation, at the sorted combined
+    keyframe `times` of all of them. Each combined keyframe gets a single interpolation for all the curves, see
+    `_fbx_curves_evaluate_combined`.
+
+    A constant curve whose value steps at the end of a combined keyframe that is not constant would instead ramp
+    between the two values, so an extra keyframe is inserted `hold_step` time before the step (or halfway through the
+    keyframe if it is shorter), where the curve still holds its value. The step then only takes `hold_step` time.
+
+    Returns the combined keyframe times, the values of each curve and an FBXCurveInterpolation for each curve, with the
+    slopes of that curve at every combined keyframe."""
+    evaluated, combined_interpolation = _fbx_curves_evaluate_combined(times_and_values_tuples, initial_values, times)
+
+    if len(times) > 1:
+        steps = np.zeros(len(times) - 1, dtype=bool)
+        for (key_times, _key_values, _key_interp), (values, _left_slopes, _right_slopes, interpolation) in zip(
+                times_and_values_tuples, evaluated):
+            # Before its first key, a curve is interpolated linearly from its initial value like linear curves are.
+            steps |= ((interpolation[:-1] == CONSTANT_INTERPOLATION_VALUE) & (times[:-1] >= key_times[0])
+                      & (values[1:] != values[:-1]))
+        steps &= combined_interpolation[:-1] != CONSTANT_INTERPOLATION_VALUE
+        if steps.any():
+            step_starts = times[:-1][steps]
+            step_ends = times[1:][steps]
+            hold_times = np.maximum(step_ends - hold_step, step_starts + (step_ends - step_starts) // 2)
+            hold_times = hold_times[hold_times > step_starts]
+            if hold_times.size:
+                times = np.union1d(times, hold_times.astype(times.dtype))
+                evaluated, combined_interpolation = _fbx_curves_evaluate_combined(times_and_values_tuples,
+                                                                                  initial_values, times)
+
+    # Weighted tangents of the individual curves can't be kept once the curves are split at each other's keyframes.
+    default_weights = np.full(len(times), FBX_KEY_WEIGHT_DEFAULT)
+    values_arrays = [values for values, _left_slopes, _right_slopes, _interpolation in evaluated]
+    key_interps = [FBXCurveInterpolation(combined_interpolation, left_slopes, right_slopes, default_weights,
+                                         default_weights)
+                   for _values, left_slopes, right_slopes, _interpolation in evaluated]
+    return times, values_arrays, key_interps
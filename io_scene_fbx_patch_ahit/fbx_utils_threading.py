@@ -1,6 +1,12 @@
+from collections import deque
 from contextlib import contextmanager, nullcontext
+from functools import partial
+from itertools import islice
 import os
+import sys
 from queue import SimpleQueue
+from threading import Semaphore
+import zlib
 
 # Note: `bpy` cannot be imported here because this module is also used by the fbx2json.py and json2fbx.py scripts.
 
@@ -24,6 +30,27 @@ else:
         # Assume that multithreading is not supported and fall back to single-threaded execution.
         _MULTITHREADING_ENABLED = False
 
+# For debugging/profiling purposes, can be modified at runtime to disable the use of worker processes.
+_MULTIPROCESSING_ENABLED = _MULTITHREADING_ENABLED
+# Worker processes must be started with the 'fork' start method: a 'spawn'-ed process would have to import this module
+# through the add-on's package, which imports `bpy` and so can't be imported outside of Blender. Forking is also not
+# safe on macOS, where system libraries may crash in the forked process.
+# Before Python 3.11, ProcessPoolExecutor starts its worker processes on demand as tasks are submitted (bpo-39207),
+# so they could be forked after other threads have been started. Since Python 3.11, with the 'fork' start method, they
+# are all started by the first submitted task (gh-90622), which `MultiProcessZlibConsumer` relies on.
+if _MULTIPROCESSING_ENABLED and sys.version_info < (3, 11):
+    _MULTIPROCESSING_ENABLED = False
+if _MULTIPROCESSING_ENABLED:
+    try:
+        from concurrent.futures import ProcessPoolExecutor
+        from multiprocessing import get_all_start_methods, get_context, resource_tracker, shared_memory
+    except ImportError:
+        _MULTIPROCESSING_ENABLED = False
+    else:
+        _MULTIPROCESSING_ENABLED = sys.platform != "darwin" and "fork" in get_all_start_methods()
+# Worker processes are only worth their overhead when there are more CPUs than threads can keep busy.
+_MULTIPROCESSING_MIN_CPU_COUNT = 6
+
 
 def get_cpu_count():
     """Get the number of CPUs assigned to the current process if that information is available on this system.
@@ -188,3 +215,179 @@ class MultiThreadedTaskConsumer:
                         # If one of the threads raised an exception, propagate it to the main thread.
                         # Only the first exception will be propagated if there were multiple.
                         raise ex
+
+
+def map_cpu_bound_ordered(function, iterable, other_cpu_bound_threads_in_use=1, hard_max_threads=32,
+                          max_ahead_per_thread=2):
+    """Yield `function(item)` for each item of `iterable`, in order, running `function` on separate threads.
+
+    Unlike MultiThreadedTaskConsumer, the results are returned to the calling thread, and only a bounded number of items
+    are scheduled ahead of the result being consumed (`max_ahead_per_thread` per thread), so that the results that are
+    not consumed yet do not all have to be held in memory at once.
+
+    The number of threads is determined like with MultiThreadedTaskConsumer.new_cpu_bound_cm(). If the system can't use
+    multithreading, `function` is instead called on the calling thread as each result is consumed.
+
+    An exception raised by `function` is propagated when its result would have been yielded. Items scheduled ahead of
+    it that have not started running yet are cancelled."""
+    max_threads = 0
+    if _MULTITHREADING_ENABLED:
+        max_threads = min(get_cpu_count() - other_cpu_bound_threads_in_use, hard_max_threads)
+    if max_threads <= 0:
+        # Fall back to single-threaded.
+        yield from map(function, iterable)
+        return
+
+    iterator = iter(iterable)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max_threads) as executor:
+        try:
+            for item in islice(iterator, max_threads * max_ahead_per_thread):
+                pending.append(executor.submit(function, item))
+            while pending:
+                # .result() waits for the future to finish and re-raises its exception, if any.
+                result = pending.popleft().result()
+                # Keep the same number of items scheduled ahead.
+                for item in islice(iterator, 1):
+                    pending.append(executor.submit(function, item))
+                yield result
+        finally:
+            # Don't wait on the items that have not started yet when stopped early (closed or due to an exception).
+            for future in pending:
+                future.cancel()
+
+
+def _zlib_shared_memory_task(shm_name, in_len, out_len, level):
+    """Run in a worker process by MultiProcessZlibConsumer.
+
+    Decompresses (when `level` is None) or compresses (with the compression `level`) the first `in_len` bytes of the
+    shared memory block named `shm_name` and writes the result after them, returning the length of the result.
+    When decompressing, `out_len` is the expected length of the result, when compressing, it's the maximum length."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        with shm.buf[:in_len] as in_view:
+            if level is None:
+                data = zlib.decompress(in_view, bufsize=out_len)
+            else:
+                data = zlib.compress(in_view, level)
+        out_len = len(data)
+        shm.buf[in_len:in_len + out_len] = data
+        return out_len
+    finally:
+        shm.close()
+
+
+class MultiProcessZlibConsumer:
+    """Helper class to run zlib compression and decompression of large buffers in worker processes.
+
+    zlib releases the GIL so MultiThreadedTaskConsumer can run it on multiple threads, but the Python code run around
+    each task, such as creating and inserting arrays, still needs the GIL, which limits how many threads can be kept
+    busy on machines with many CPUs. Each worker process has its own GIL.
+
+    The input and output of each task are passed through a `multiprocessing.shared_memory` block instead of being
+    pickled, the block being freed once the task's callback has been called with a view of the output.
+
+    Worker processes are only used when explicitly requested, see `new_cpu_bound_cm`. They are forked when the context
+    manager is entered, which should be done before any other thread of the calling code is started."""
+    __slots__ = ("_max_processes", "_executor", "_in_flight", "_exception")
+
+    def __init__(self, max_processes, max_in_flight):
+        # It's recommended to use MultiProcessZlibConsumer.new_cpu_bound_cm() instead of creating new instances
+        # directly.
+        assert _MULTIPROCESSING_ENABLED
+        self._max_processes = max_processes
+        self._executor = None
+        # Bounds the number of tasks, and so the amount of shared memory, in flight at any one time.
+        self._in_flight = Semaphore(max_in_flight)
+        # The first exception raised by a task or its callback, re-raised by the context manager.
+        self._exception = None
+
+    @classmethod
+    def new_cpu_bound_cm(cls, use_processes=False, other_cpu_bound_threads_in_use=1, hard_max_processes=32):
+        """Return a context manager that, when entered, returns a new MultiProcessZlibConsumer, or None if worker
+        processes are not requested with `use_processes`, can't be used, or are unlikely to be faster than threads, on
+        the current system.
+
+        Worker processes are forked, and forking a process that is running other threads, such as Blender, can deadlock
+        the forked process, which is why they must be opted into. Forking is not available on Windows and not safe on
+        macOS, so there, None is always returned.
+
+        When exiting the context manager, it waits for all submitted tasks and their callbacks to complete, re-raising
+        the first exception raised by any of them."""
+        if use_processes and _MULTIPROCESSING_ENABLED:
+            cpu_count = get_cpu_count()
+            if cpu_count >= _MULTIPROCESSING_MIN_CPU_COUNT:
+                max_processes = min(cpu_count - other_cpu_bound_threads_in_use, hard_max_processes)
+                return cls(max_processes, max_processes * 2)._wrap_executor_cm()
+        return nullcontext(None)
+
+    def decompress(self, data, out_len, callback):
+        """Decompress `data`, which is expected to decompress to `out_len` bytes, and call `callback` with a memoryview
+        of the decompressed bytes. The memoryview is released once `callback` returns."""
+        self._submit(data, out_len, None, callback)
+
+    def compress(self, data, level, callback):
+        """Compress `data` with the compression `level` and call `callback` with a memoryview of the compressed bytes.
+        The memoryview is released once `callback` returns."""
+        in_len = len(data)
+        # zlib's compressBound(), the maximum length of the compressed data.
+        out_len = in_len + (in_len >> 12) + (in_len >> 14) + (in_len >> 25) + 13
+        self._submit(data, out_len, level, callback)
+
+    def _submit(self, data, out_len, level, callback):
+        if self._exception is not None:
+            # Stop submitting new tasks as soon as one has failed.
+            raise self._exception
+
+        in_len = len(data)
+        # Blocks while too many tasks are in flight.
+        self._in_flight.acquire()
+        shm = None
+        try:
+            shm = shared_memory.SharedMemory(create=True, size=in_len + out_len)
+            shm.buf[:in_len] = data
+            future = self._executor.submit(_zlib_shared_memory_task, shm.name, in_len, out_len, level)
+        except BaseException:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            self._in_flight.release()
+            raise
+        future.add_done_callback(partial(self._task_done, shm, in_len, callback))
+
+    def _task_done(self, shm, in_len, callback, future):
+        """Called once a task has completed, from a thread of the executor."""
+        try:
+            if self._exception is None:
+                ex = future.exception()
+                if ex is not None:
+                    self._exception = ex
+                else:
+                    result_len = future.result()
+                    with shm.buf[in_len:in_len + result_len] as out_view:
+                        callback(out_view)
+        except BaseException as ex:
+            if self._exception is None:
+                self._exception = ex
+        finally:
+            shm.close()
+            shm.unlink()
+            self._in_flight.release()
+
+    @contextmanager
+    def _wrap_executor_cm(self):
+        # Start the resource tracker before forking, so that the worker processes share it instead of each starting
+        # their own.
+        resource_tracker.ensure_running()
+        self._executor = ProcessPoolExecutor(max_workers=self._max_processes, mp_context=get_context("fork"))
+        try:
+            # With the 'fork' start method, all the worker processes are started by the first submitted task (only since
+            # Python 3.11, see `_MULTIPROCESSING_ENABLED`), so submit one and wait for it now, rather than forking later
+            # on, once the caller has started other threads.
+            self._executor.submit(int).result()
+            yield self
+        finally:
+            # Waits for all the tasks to complete and for their callbacks to be called.
+            self._executor.shutdown(wait=True)
+        if self._exception is not None:
+            raise self._exception
@@ -17,7 +17,7 @@ if not api_compat.HAS_TRANSLATION_FOR_REPORTS:
 # COMPAT ADD END
 else:
     from bpy.app.translations import pgettext_rpt as rpt_
-from mathutils import Matrix, Euler, Vector, Quaternion
+from mathutils import Matrix, Euler, Vector
 from bpy_extras import anim_utils
 
 # Also imported in .fbx_utils, so importing here is unlikely to further affect Blender startup time.
@@ -31,6 +31,9 @@ from .parse_fbx import (
     data_types,
     FBXElem,
 )
+# UnDrew Add Start : Parallel mesh decoding.
+from .fbx_utils_threading import map_cpu_bound_ordered
+# UnDrew Add End
 from .fbx_utils import (
     PerfMon,
     units_blender_to_fbx_factor,
@@ -50,19 +53,61 @@ from .fbx_utils import (
     MESH_ATTRIBUTE_SHARP_FACE,
     MESH_ATTRIBUTE_SHARP_EDGE,
     expand_shape_key_range,
+    matrices_to_loc_euler_scale,
+    matrices_to_loc_quat_scale,
+    quats_to_axis_angles,
+    eulers_to_matrices,
+    BEZIER_INTERPOLATION_VALUE,
+    fbx_curve_interpolation,
+    fbx_curves_combine,
     FBX_KTIME_V7,
     FBX_KTIME_V8,
     FBX_TIMECODE_DEFINITION_TO_KTIME_PER_SECOND,
 )
 
 LINEAR_INTERPOLATION_VALUE = bpy.types.Keyframe.bl_rna.properties['interpolation'].enum_items['LINEAR'].value
+# UnDrew Add Start : Import constant and cubic keyframe interpolation.
+FREE_HANDLE_TYPE_VALUE = bpy.types.Keyframe.bl_rna.properties['handle_left_type'].enum_items['FREE'].value
+# UnDrew Add End
 
 # global singleton, assign on execution
 fbx_elem_nil = None
 
+# UnDrew Add Start : Indexed element lookups.
+# Elements with at least this many children are indexed on their first lookup, instead of having their children scanned
+# by every lookup, see _elem_children_index and _elem_props_index.
+UE3_ELEM_INDEX_MIN_CHILDREN = 16
+# {id(elem): (elem, index)} of the indexed elements, only while `load` is importing a file (None otherwise). The
+# elements are kept alive by their entry, so that their id cannot be reused by another element.
+_elem_children_indices = None
+_elem_props_indices = None
+# UnDrew Add End
+
 # Units converters...
 convert_deg_to_rad_iter = units_convertor_iter("degree", "radian")
 
+# Elements whose arrays are never read when importing, decompressing their arrays is deferred until they are accessed.
+# The KeyAttr* arrays of animation curves are read to import keyframe interpolation, so are not included.
+LAZY_ARRAY_ELEM_IDS = frozenset((
+    b'Binormals', b'BinormalsW', b'BinormalsIndex',
+    b'Tangents', b'TangentsW', b'TangentsIndex',
+    b'NormalsW',
+))
+# Objects that are only read when importing animation.
+ANIM_OBJECT_ELEM_IDS = frozenset((b'AnimationStack', b'AnimationLayer', b'AnimationCurveNode', b'AnimationCurve'))
+
+
+def skip_elem_unused(parent_id, elem_id, _elem_props):
+    """Parse filter for top-level elements that are never read when importing."""
+    return parent_id == b'' and elem_id == b'Takes'
+
+
+def skip_elem_unused_no_anim(parent_id, elem_id, elem_props):
+    """Parse filter for when animation is not imported."""
+    if parent_id == b'Objects':
+        return elem_id in ANIM_OBJECT_ELEM_IDS
+    return skip_elem_unused(parent_id, elem_id, elem_props)
+
 MAT_CONVERT_BONE = fbx_utils.MAT_CONVERT_BONE.inverted()
 MAT_CONVERT_LIGHT = fbx_utils.MAT_CONVERT_LIGHT.inverted()
 MAT_CONVERT_CAMERA = fbx_utils.MAT_CONVERT_CAMERA.inverted()
@@ -85,7 +130,48 @@ def validate_blend_names(name):
         return name.decode('utf-8', 'replace')
 
 
+# UnDrew Add Start : Indexed element lookups.
+def _elem_children_index(elem):
+    """Return the {id: [children]} index of the children of `elem`, or None if it is not indexed."""
+    if _elem_children_indices is None or len(elem.elems) < UE3_ELEM_INDEX_MIN_CHILDREN:
+        return None
+    entry = _elem_children_indices.get(id(elem))
+    if entry is None:
+        index = {}
+        for fbx_item in elem.elems:
+            children = index.get(fbx_item.id)
+            if children is None:
+                index[fbx_item.id] = [fbx_item]
+            else:
+                children.append(fbx_item)
+        entry = _elem_children_indices[id(elem)] = (elem, index)
+    return entry[1]
+
+
+def _elem_props_index(elem):
+    """Return the {name: P} index of the (non-user) properties of Properties70 `elem`, or None if it is not indexed."""
+    if _elem_props_indices is None or len(elem.elems) < UE3_ELEM_INDEX_MIN_CHILDREN:
+        return None
+    entry = _elem_props_indices.get(id(elem))
+    if entry is None:
+        index = {}
+        for subelem in elem.elems:
+            assert subelem.id == b'P'
+            # Same as elem_props_find_first, the first property of each name wins and user properties are ignored.
+            if b'U' not in subelem.props[3]:
+                index.setdefault(subelem.props[0], subelem)
+        entry = _elem_props_indices[id(elem)] = (elem, index)
+    return entry[1]
+# UnDrew Add End
+
+
 def elem_find_first(elem, id_search, default=None):
+    # UnDrew Add Start : Indexed element lookups.
+    index = _elem_children_index(elem)
+    if index is not None:
+        children = index.get(id_search)
+        return children[0] if children is not None else default
+    # UnDrew Add End
     for fbx_item in elem.elems:
         if fbx_item.id == id_search:
             return fbx_item
@@ -93,6 +179,12 @@ def elem_find_first(elem, id_search, default=None):
 
 
 def elem_find_iter(elem, id_search):
+    # UnDrew Add Start : Indexed element lookups.
+    index = _elem_children_index(elem)
+    if index is not None:
+        yield from index.get(id_search, ())
+        return
+    # UnDrew Add End
     for fbx_item in elem.elems:
         if fbx_item.id == id_search:
             yield fbx_item
@@ -191,6 +283,11 @@ def elem_props_find_first(elem, elem_prop_id):
         assert len(elem) > 0
         return None
 
+    # UnDrew Add Start : Indexed element lookups.
+    index = _elem_props_index(elem)
+    if index is not None:
+        return index.get(elem_prop_id)
+    # UnDrew Add End
     for subelem in elem.elems:
         assert subelem.id == b'P'
         # 'U' flag indicates that the property has been defined by the user.
@@ -481,15 +578,41 @@ def blen_read_object_transform_do(transform_data):
 #     name collisions become more likely, will have to make this more robust!!!
 def add_vgroup_to_objects(vg_indices, vg_weights, vg_name, objects):
     assert len(vg_indices) == len(vg_weights)
-    if vg_indices:
+    # UnDrew Edit Start : Bulk vertex group assignment.
+    if len(vg_indices):
+        vg_indices = np.asarray(vg_indices)
+        vg_weights = np.asarray(vg_weights)
+        # Only the last weight of each index would be left by setting the weights one by one with 'REPLACE', so keep
+        # only that one, by finding the first occurrence of each index in the reversed arrays.
+        vg_indices, last_idx = np.unique(vg_indices[::-1], return_index=True)
+        vg_weights = vg_weights[::-1][last_idx]
+        # Group the indices by weight, so that each unique weight is set with a single VertexGroup.add call.
+        # VertexGroup.add only accepts Python ints and floats, hence the .tolist() calls.
+        unique_weights, weights_inverse = np.unique(vg_weights, return_inverse=True)
+        indices_by_weight = np.split(vg_indices[np.argsort(weights_inverse, kind='stable')],
+                                     np.cumsum(np.bincount(weights_inverse))[:-1])
+        weight_groups = tuple(zip(unique_weights.tolist(), [indices.tolist() for indices in indices_by_weight]))
         for obj in objects:
             # We replace/override here...
             vg = obj.vertex_groups.get(vg_name)
             if vg is None:
                 vg = obj.vertex_groups.new(name=vg_name)
             vg_add = vg.add
-            for i, w in zip(vg_indices, vg_weights):
-                vg_add((i,), w, 'REPLACE')
+            for w, indices in weight_groups:
+                vg_add(indices, w, 'REPLACE')
+    # UnDrew Edit End
+
+
+# UnDrew Add Start : Vectorized bone weights.
+def blen_read_cluster_weights(fbx_cluster):
+    """Return the (indices, weights) np.ndarrays of a Cluster, trimmed to the same length."""
+    indices = elem_prop_first(elem_find_first(fbx_cluster, b'Indexes', default=None), default=None)
+    weights = elem_prop_first(elem_find_first(fbx_cluster, b'Weights', default=None), default=None)
+    indices = parray_as_ndarray(indices) if indices else np.empty(0, dtype=data_types.ARRAY_INT32)
+    weights = parray_as_ndarray(weights) if weights else np.empty(0, dtype=data_types.ARRAY_FLOAT64)
+    num_weights = min(len(indices), len(weights))
+    return indices[:num_weights], weights[:num_weights]
+# UnDrew Add End
 
 
 def blen_read_object_transform_preprocess(fbx_props, fbx_obj, rot_alt_mat, use_prepost_rot):
@@ -549,14 +672,13 @@ def blen_read_object_transform_preprocess(fbx_props, fbx_obj, rot_alt_mat, use_p
 
 # ---------
 # Animation
-def _blen_read_object_transform_do_anim(transform_data, lcl_translation_mat, lcl_rot_euler, lcl_scale_mat,
-                                        extra_pre_matrix, extra_post_matrix):
+def _blen_read_object_transform_do_anim(transform_data, extra_pre_matrix, extra_post_matrix):
     """Specialized version of blen_read_object_transform_do for animation that pre-calculates the non-animated matrices
-    and returns a function that calculates (base_mat @ geom_mat). See the comments in blen_read_object_transform_do for
-    a full description of what this function is doing.
-
-    The lcl_translation_mat, lcl_rot_euler and lcl_scale_mat arguments should have their values updated each frame and
-    then calling the returned function will calculate the matrix for the current frame.
+    and returns them as arrays (pre_lcl_translation, post_lcl_translation, post_lcl_rotation, post_lcl_scaling), such
+    that (base_mat @ geom_mat) is
+    (pre_lcl_translation @ lcl_translation @ post_lcl_translation @ lcl_rotation @ post_lcl_rotation @ lcl_scaling @
+    post_lcl_scaling). See the comments in blen_read_object_transform_do for a full description of what this function
+    is doing.
 
     extra_pre_matrix and extra_post_matrix are any extra matrices to multiply first/last."""
     # Translation
@@ -589,41 +711,18 @@ def _blen_read_object_transform_do_anim(transform_data, lcl_translation_mat, lcl
     post_lcl_rotation = transform_data.rot_alt_mat @ pst_rot_inv @ rot_piv_inv @ sca_ofs @ sca_piv
     post_lcl_scaling = sca_piv_inv @ geom_mat @ extra_post_matrix
 
-    # Get the bound to_matrix method to avoid re-binding it on each call.
-    lcl_rot_euler_to_matrix_3x3 = lcl_rot_euler.to_matrix
-    # Get the unbound Matrix.to_4x4 method to avoid having to look it up again on each call.
-    matrix_to_4x4 = Matrix.to_4x4
-
-    if extra_pre_matrix == Matrix():
-        # There aren't any other matrices that must be multiplied before lcl_translation_mat that extra_pre_matrix can
-        # be combined with, so skip extra_pre_matrix when it's the identity matrix.
-        return lambda: (lcl_translation_mat @
-                        post_lcl_translation @
-                        matrix_to_4x4(lcl_rot_euler_to_matrix_3x3()) @
-                        post_lcl_rotation @
-                        lcl_scale_mat @
-                        post_lcl_scaling)
-    else:
-        return lambda: (extra_pre_matrix @
-                        lcl_translation_mat @
-                        post_lcl_translation @
-                        matrix_to_4x4(lcl_rot_euler_to_matrix_3x3()) @
-                        post_lcl_rotation @
-                        lcl_scale_mat @
-                        post_lcl_scaling)
+    return (np.array(extra_pre_matrix), np.array(post_lcl_translation), np.array(post_lcl_rotation),
+            np.array(post_lcl_scaling))
 
 
-def _transformation_curves_gen(item, values_arrays, channel_keys):
-    """Yields flattened location/rotation/scaling values for imported PoseBone/Object Lcl Translation/Rotation/Scaling
-    animation curve values.
+def _transformation_curves_values(item, values_arrays, channel_keys):
+    """Returns location/rotation/scaling values for imported PoseBone/Object Lcl Translation/Rotation/Scaling animation
+    curve values, as an array with one row per keyframe and one column per location/rotation/scaling channel.
 
     The value arrays must have the same lengths, where each index of each array corresponds to a single keyframe.
 
     Each value array must have a corresponding channel key tuple that identifies the fbx property
     (b'Lcl Translation'/b'Lcl Rotation'/b'Lcl Scaling') and the channel (x/y/z as 0/1/2) of that property."""
-    from operator import setitem
-    from functools import partial
-
     if item.is_bone:
         bl_obj = item.bl_obj.pose.bones[item.bl_bone]
     else:
@@ -649,89 +748,95 @@ def _transformation_curves_gen(item, values_arrays, channel_keys):
     if item.post_matrix:
         combined_post_matrix @= item.post_matrix
 
-    # Create matrices/euler from the initial transformation values of this item.
-    # These variables will be updated in-place as we iterate through each frame.
-    lcl_translation_mat = Matrix.Translation(transform_data.loc)
-    lcl_rotation_eul = Euler(convert_deg_to_rad_iter(transform_data.rot), transform_data.rot_ord)
-    lcl_scaling_mat = Matrix()
-    lcl_scaling_mat[0][0], lcl_scaling_mat[1][1], lcl_scaling_mat[2][2] = transform_data.sca
-
-    # Create setters into lcl_translation_mat, lcl_rotation_eul and lcl_scaling_mat for each values_array and convert
-    # any rotation values into radians.
-    lcl_setters = []
-    values_arrays_converted = []
+    # Initial transformation values of this item, for each frame.
+    # FBX rotations are in degrees, but Blender uses radians, so convert all rotation values in advance.
+    num_frames = len(values_arrays[0])
+    lcl_values = {
+        b'Lcl Translation': np.tile(np.array(transform_data.loc, dtype=np.float64), (num_frames, 1)),
+        b'Lcl Rotation': np.tile(np.deg2rad(np.array(transform_data.rot, dtype=np.float64)), (num_frames, 1)),
+        b'Lcl Scaling': np.tile(np.array(transform_data.sca, dtype=np.float64), (num_frames, 1)),
+    }
+    # Note that an FBX animation does not have to animate all the channels, so only the animated channels of each
+    # property are replaced with the animated values.
     for values_array, (fbx_prop, channel) in zip(values_arrays, channel_keys):
-        if fbx_prop == b'Lcl Translation':
-            # lcl_translation_mat.translation[channel] = value
-            setter = partial(setitem, lcl_translation_mat.translation, channel)
-        elif fbx_prop == b'Lcl Rotation':
-            # FBX rotations are in degrees, but Blender uses radians, so convert all rotation values in advance.
+        if fbx_prop == b'Lcl Rotation':
             values_array = np.deg2rad(values_array)
-            # lcl_rotation_eul[channel] = value
-            setter = partial(setitem, lcl_rotation_eul, channel)
         else:
-            assert fbx_prop == b'Lcl Scaling'
-            # lcl_scaling_mat[channel][channel] = value
-            setter = partial(setitem, lcl_scaling_mat[channel], channel)
-        lcl_setters.append(setter)
-        values_arrays_converted.append(values_array)
-
-    # Create an iterator that gets one value from each array. Each iterated tuple will be all the imported
-    # Lcl Translation/Lcl Rotation/Lcl Scaling values for a single frame, in that order.
-    # Note that an FBX animation does not have to animate all the channels, so only the animated channels of each
-    # property will be present.
-    # .data, the memoryview of an np.ndarray, is faster to iterate than the ndarray itself.
-    frame_values_it = zip(*(arr.data for arr in values_arrays_converted))
-
-    # Getting the unbound methods in advance avoids having to look them up again on each call within the loop.
-    mat_decompose = Matrix.decompose
-    quat_to_axis_angle = Quaternion.to_axis_angle
-    quat_to_euler = Quaternion.to_euler
-    quat_dot = Quaternion.dot
-
-    calc_mat = _blen_read_object_transform_do_anim(transform_data,
-                                                   lcl_translation_mat, lcl_rotation_eul, lcl_scaling_mat,
-                                                   combined_pre_matrix, combined_post_matrix)
-
-    # Iterate through the values for each frame.
-    for frame_values in frame_values_it:
-        # Set each value into its corresponding lcl matrix/euler.
-        for lcl_setter, value in zip(lcl_setters, frame_values):
-            lcl_setter(value)
-
-        # Calculate the updated matrix for this frame.
-        mat = calc_mat()
-
-        # Now we have a virtual matrix of transform from AnimCurves, we can yield keyframe values!
-        loc, rot, sca = mat_decompose(mat)
-        if rot_mode == 'QUATERNION':
-            if quat_dot(rot_quat_prev, rot) < 0.0:
-                rot = -rot
-            rot_quat_prev = rot
-        elif rot_mode == 'AXIS_ANGLE':
-            vec, ang = quat_to_axis_angle(rot)
-            rot = ang, vec.x, vec.y, vec.z
-        else:  # Euler
-            rot = quat_to_euler(rot, rot_mode, rot_eul_prev)
-            rot_eul_prev = rot
+            assert fbx_prop in {b'Lcl Translation', b'Lcl Scaling'}
+        lcl_values[fbx_prop][:, channel] = values_array
+
+    pre_lcl_translation, post_lcl_translation, post_lcl_rotation, post_lcl_scaling = (
+        _blen_read_object_transform_do_anim(transform_data, combined_pre_matrix, combined_post_matrix))
+
+    # Calculate the matrices of all frames at once.
+    lcl_translation_mats = np.tile(np.identity(4), (num_frames, 1, 1))
+    lcl_translation_mats[:, :3, 3] = lcl_values[b'Lcl Translation']
+    lcl_rotation_mats = np.tile(np.identity(4), (num_frames, 1, 1))
+    lcl_rotation_mats[:, :3, :3] = eulers_to_matrices(lcl_values[b'Lcl Rotation'], transform_data.rot_ord)
+    frame_mats = pre_lcl_translation @ lcl_translation_mats @ post_lcl_translation
+    frame_mats = frame_mats @ lcl_rotation_mats @ post_lcl_rotation
+    # Multiplying by the Lcl Scaling matrix scales the first three columns.
+    frame_mats[:, :, :3] *= lcl_values[b'Lcl Scaling'][:, None, :]
+    frame_mats = frame_mats @ post_lcl_scaling
+
+    # Now we have virtual matrices of transform from AnimCurves, we can get keyframe values!
+    if rot_mode == 'QUATERNION':
+        loc, rot, sca = matrices_to_loc_quat_scale(frame_mats, quat_compat=rot_quat_prev)
+    elif rot_mode == 'AXIS_ANGLE':
+        loc, rot, sca = matrices_to_loc_quat_scale(frame_mats)
+        angles, axes = quats_to_axis_angles(rot)
+        rot = np.concatenate((angles[:, None], axes), axis=1)
+    else:  # Euler
+        loc, rot, sca = matrices_to_loc_euler_scale(frame_mats, rot_mode, euler_compat=rot_eul_prev)
+
+    # Column order matches the order that the location/rotation/scale FCurves are created in.
+    return np.concatenate((loc, rot, sca), axis=1)
+
+
+# UnDrew Add Start : Read the interpolation of FBX animation curves, so that imported constant and cubic curves don't
+#                    need to be baked to stay correct.
+def blen_read_animation_curve_interpolation(fbx_curve, key_times, key_values, fbx_ktime):
+    """Read the KeyAttrFlags, KeyAttrDataFloat and KeyAttrRefCount of a valid animation curve.
+
+    Returns an FBXCurveInterpolation, or None if the curve only uses linear interpolation or its key attributes could
+    not be read, see fbx_curve_interpolation."""
+    if len(key_times) < 2:
+        return None
 
-        # Yield order matches the order that the location/rotation/scale FCurves are created in.
-        yield from loc
-        yield from rot
-        yield from sca
+    fbx_flags = elem_find_first(fbx_curve, b'KeyAttrFlags')
+    fbx_data = elem_find_first(fbx_curve, b'KeyAttrDataFloat')
+    fbx_refcount = elem_find_first(fbx_curve, b'KeyAttrRefCount')
+    if fbx_flags is None or fbx_data is None or fbx_refcount is None:
+        return None
+    return fbx_curve_interpolation(key_times, key_values, parray_as_ndarray(elem_prop_first(fbx_flags)),
+                                   parray_as_ndarray(elem_prop_first(fbx_data)),
+                                   parray_as_ndarray(elem_prop_first(fbx_refcount)), fbx_ktime)
+
+
+def _curve_interpolation_scaled(key_interp, fac):
+    """Return the interpolation of an animation curve whose values have been multiplied by `fac`."""
+    if key_interp is None:
+        return None
+    return key_interp._replace(left_slopes=key_interp.left_slopes * fac, right_slopes=key_interp.right_slopes * fac)
+# UnDrew Add End
 
 
-def _combine_curve_keyframe_times(times_and_values_tuples, initial_values):
+# UnDrew Edit Start : Evaluate constant and cubic curves.
+def _combine_curve_keyframe_times(times_and_values_tuples, initial_values, hold_step):
+# UnDrew Edit End
     """Combine multiple parsed animation curves, that affect different channels, such that every animation curve
     contains the keyframes from every other curve, interpolating the values for the newly inserted keyframes in each
     curve.
 
-    Currently, linear interpolation is assumed, but FBX does store how keyframes should be interpolated, so correctly
-    interpolating the keyframe values is a TODO."""
+    When none of the curves have interpolation other than linear, linear interpolation is assumed and None is returned
+    in place of the interpolation of each curve. Otherwise, each curve is evaluated according to its interpolation and
+    an FBXCurveInterpolation is returned for each curve, with the slopes of that curve at every combined keyframe, see
+    fbx_curves_combine. Keyframes may then be inserted `hold_step` time before the steps of constant curves."""
+    # UnDrew Edit Start : Evaluate constant and cubic curves.
     if len(times_and_values_tuples) == 1:
         # Nothing to do when there is only a single curve.
-        times, values = times_and_values_tuples[0]
-        return times, [values]
+        times, values, key_interp = times_and_values_tuples[0]
+        return times, [values], None if key_interp is None else [key_interp]
 
     all_times = [t[0] for t in times_and_values_tuples]
 
@@ -739,17 +844,20 @@ def _combine_curve_keyframe_times(times_and_values_tuples, initial_values):
     sorted_all_times = np.unique(np.concatenate(all_times))
 
     values_arrays = []
-    for (times, values), initial_value in zip(times_and_values_tuples, initial_values):
-        if sorted_all_times.size == times.size:
-            # `sorted_all_times` will always contain all values in `times` and both `times` and `sorted_all_times` must
-            # be strictly increasing, so if both arrays have the same size, they must be identical.
-            extended_values = values
-        else:
-            # For now, linear interpolation is assumed. NumPy conveniently has a fast C-compiled function for this.
-            # Efficiently implementing other FBX supported interpolation will most likely be much more complicated.
-            extended_values = np.interp(sorted_all_times, times, values, left=initial_value)
-        values_arrays.append(extended_values)
-    return sorted_all_times, values_arrays
+    if all(t[2] is None for t in times_and_values_tuples):
+        for (times, values, _key_interp), initial_value in zip(times_and_values_tuples, initial_values):
+            if sorted_all_times.size == times.size:
+                # `sorted_all_times` will always contain all values in `times` and both `times` and `sorted_all_times`
+                # must be strictly increasing, so if both arrays have the same size, they must be identical.
+                extended_values = values
+            else:
+                # NumPy conveniently has a fast C-compiled function for linear interpolation.
+                extended_values = np.interp(sorted_all_times, times, values, left=initial_value)
+            values_arrays.append(extended_values)
+        return sorted_all_times, values_arrays, None
+
+    return fbx_curves_combine(sorted_all_times, times_and_values_tuples, initial_values, hold_step)
+    # UnDrew Edit End
 
 
 def blen_read_invalid_animation_curve(key_times, key_values):
@@ -840,10 +948,15 @@ def _convert_fbx_time_to_blender_time(key_times, blen_start_offset, fbx_start_of
     return key_times
 
 
-def blen_read_animation_curve(fbx_curve):
+# UnDrew Edit Start : Also read the interpolation of the curve.
+def blen_read_animation_curve(fbx_curve, fbx_ktime):
     """Read an animation curve from FBX data.
 
-    The parsed keyframe times are guaranteed to be strictly increasing."""
+    The parsed keyframe times are guaranteed to be strictly increasing.
+
+    Returns the keyframe times, the keyframe values and the interpolation of the curve, see
+    blen_read_animation_curve_interpolation."""
+# UnDrew Edit End
     key_times = parray_as_ndarray(elem_prop_first(elem_find_first(fbx_curve, b'KeyTime')))
     key_values = parray_as_ndarray(elem_prop_first(elem_find_first(fbx_curve, b'KeyValueFloat')))
 
@@ -853,27 +966,37 @@ def blen_read_animation_curve(fbx_curve):
     # https://help.autodesk.com/view/FBX/2020/ENU/?guid=FBX_Developer_Help_cpp_ref_class_fbx_anim_curve_html
     all_times_strictly_increasing = (key_times[1:] > key_times[:-1]).all()
 
+    # UnDrew Edit Start : Also read the interpolation of the curve.
     if all_times_strictly_increasing:
-        return key_times, key_values
+        key_interp = blen_read_animation_curve_interpolation(fbx_curve, key_times, key_values, fbx_ktime)
+        return key_times, key_values, key_interp
     else:
         # FBX will still read animation curves even if they are invalid.
-        return blen_read_invalid_animation_curve(key_times, key_values)
+        # The keys of invalid curves don't match their key attributes, so they are always read as linear.
+        key_times, key_values = blen_read_invalid_animation_curve(key_times, key_values)
+        return key_times, key_values, None
+    # UnDrew Edit End
 
 
-def blen_store_keyframes(fbx_key_times, blen_fcurve, key_values, blen_start_offset, fps, fbx_ktime, fbx_start_offset=0):
+# UnDrew Edit Start : Store the interpolation of the curve.
+def blen_store_keyframes(fbx_key_times, blen_fcurve, key_values, blen_start_offset, fps, fbx_ktime, fbx_start_offset=0,
+                         key_interp=None):
     """Set all keyframe times and values for a newly created FCurve.
-    Linear interpolation is currently assumed.
+    Linear interpolation is assumed when `key_interp` is None.
 
     This is a convenience function for calling blen_store_keyframes_multi with only a single fcurve and values array."""
-    blen_store_keyframes_multi(fbx_key_times, [(blen_fcurve, key_values)], blen_start_offset, fps, fbx_ktime,
-                               fbx_start_offset)
+    blen_store_keyframes_multi(fbx_key_times, [(blen_fcurve, key_values, key_interp)], blen_start_offset, fps,
+                               fbx_ktime, fbx_start_offset)
 
 
-def blen_store_keyframes_multi(fbx_key_times, fcurve_and_key_values_pairs, blen_start_offset, fps, fbx_ktime,
+def blen_store_keyframes_multi(fbx_key_times, fcurve_and_key_values_tuples, blen_start_offset, fps, fbx_ktime,
                                fbx_start_offset=0):
-    """Set all keyframe times and values for multiple pairs of newly created FCurves and keyframe values arrays, where
-    each pair has the same keyframe times.
-    Linear interpolation is currently assumed."""
+    """Set all keyframe times and values for multiple tuples of newly created FCurves, keyframe values arrays and
+    FBXCurveInterpolation, where each tuple has the same keyframe times.
+    Linear interpolation is assumed when the FBXCurveInterpolation is None.
+
+    Cubic keyframes are stored as Bézier keyframes with 'FREE' handles pointing along their tangents."""
+# UnDrew Edit End
     bl_key_times = _convert_fbx_time_to_blender_time(fbx_key_times, blen_start_offset, fbx_start_offset, fps, fbx_ktime)
     num_keys = len(bl_key_times)
 
@@ -899,7 +1022,21 @@ def blen_store_keyframes_multi(fbx_key_times, fcurve_and_key_values_pairs, blen_
     # COMPAT ADD END
         interpolation_array = np.full(num_keys, LINEAR_INTERPOLATION_VALUE, dtype=bl_enum_dtype)
 
-    for blen_fcurve, key_values in fcurve_and_key_values_pairs:
+    # UnDrew Add Start : Bézier handles.
+    # The handles are accessed as flattened pairs of (time, value), the same as 'co'.
+    handles_left = np.empty(num_keys * 2, dtype=bl_keyframe_dtype)
+    handles_right = np.empty(num_keys * 2, dtype=bl_keyframe_dtype)
+    if num_keys > 1:
+        # The handles of each key extend a fraction of the time to the previous and next keys. The first and last keys
+        # only have one neighbour.
+        bl_key_intervals = np.diff(bl_key_times)
+        bl_left_intervals = np.concatenate((bl_key_intervals[:1], bl_key_intervals))
+        bl_right_intervals = np.concatenate((bl_key_intervals, bl_key_intervals[-1:]))
+    # Convert slopes in value per FBX ktime into value per Blender frame.
+    slope_fac = fbx_ktime / fps
+    # UnDrew Add End
+
+    for blen_fcurve, key_values, key_interp in fcurve_and_key_values_tuples:
         # The fcurve must be newly created and thus have no keyframe_points.
         assert len(blen_fcurve.keyframe_points) == 0
 
@@ -909,14 +1046,49 @@ def blen_store_keyframes_multi(fbx_key_times, fcurve_and_key_values_pairs, blen_
         # Add the keyframe points to the FCurve and then set the 'co' and 'interpolation' of each point.
         blen_fcurve.keyframe_points.add(num_keys)
         blen_fcurve.keyframe_points.foreach_set('co', keyframe_points_co)
-        # COMPAT ADD BEGIN
-        if not api_compat.HAS_FOREACH_SET_ENUM_SUPPORT:
-            # Pre-2.90 versions don't provide any way to set this more efficiently... I think.
-            for key in blen_fcurve.keyframe_points:
-                key.interpolation = 'LINEAR'
+        # UnDrew Edit Start : Store the interpolation of the curve.
+        if key_interp is None:
+            # COMPAT ADD BEGIN
+            if not api_compat.HAS_FOREACH_SET_ENUM_SUPPORT:
+                # Pre-2.90 versions don't provide any way to set this more efficiently... I think.
+                for key in blen_fcurve.keyframe_points:
+                    key.interpolation = 'LINEAR'
+            else:
+            # COMPAT ADD END
+                blen_fcurve.keyframe_points.foreach_set('interpolation', interpolation_array)
         else:
-        # COMPAT ADD END
-            blen_fcurve.keyframe_points.foreach_set('interpolation', interpolation_array)
+            # COMPAT ADD BEGIN
+            if not api_compat.HAS_FOREACH_SET_ENUM_SUPPORT:
+                interpolation_enum_items = bpy.types.Keyframe.bl_rna.properties['interpolation'].enum_items
+                interpolation_names = {item.value: item.identifier for item in interpolation_enum_items}
+                for key, interpolation in zip(blen_fcurve.keyframe_points, key_interp.interpolation.tolist()):
+                    key.interpolation = interpolation_names[interpolation]
+            else:
+            # COMPAT ADD END
+                blen_fcurve.keyframe_points.foreach_set('interpolation',
+                                                        key_interp.interpolation.astype(bl_enum_dtype, copy=False))
+
+            if num_keys > 1 and (key_interp.interpolation == BEZIER_INTERPOLATION_VALUE).any():
+                left_lengths = key_interp.left_weights * bl_left_intervals
+                right_lengths = key_interp.right_weights * bl_right_intervals
+                handles_left[0::2] = bl_key_times - left_lengths
+                handles_left[1::2] = key_values - key_interp.left_slopes * slope_fac * left_lengths
+                handles_right[0::2] = bl_key_times + right_lengths
+                handles_right[1::2] = key_values + key_interp.right_slopes * slope_fac * right_lengths
+                # Set the handle types first, so that setting the handles doesn't recalculate them.
+                # COMPAT ADD BEGIN
+                if not api_compat.HAS_FOREACH_SET_ENUM_SUPPORT:
+                    for key in blen_fcurve.keyframe_points:
+                        key.handle_left_type = 'FREE'
+                        key.handle_right_type = 'FREE'
+                else:
+                # COMPAT ADD END
+                    handle_types = np.full(num_keys, FREE_HANDLE_TYPE_VALUE, dtype=bl_enum_dtype)
+                    blen_fcurve.keyframe_points.foreach_set('handle_left_type', handle_types)
+                    blen_fcurve.keyframe_points.foreach_set('handle_right_type', handle_types)
+                blen_fcurve.keyframe_points.foreach_set('handle_left', handles_left)
+                blen_fcurve.keyframe_points.foreach_set('handle_right', handles_right)
+        # UnDrew Edit End
 
         # Since we inserted our keyframes in 'ultra-fast' mode, we have to update the fcurves now.
         blen_fcurve.update()
@@ -996,8 +1168,9 @@ def blen_read_animations_action_item(channelbag_or_act, item, cnodes, fps, anim_
             for channel, curve in channel_to_curve.items():
                 assert channel in {0, 1, 2}
                 blen_curve = blen_curves[channel]
-                fbx_key_times, values = blen_read_animation_curve(curve)
-                blen_store_keyframes(fbx_key_times, blen_curve, values, anim_offset, fps, fbx_ktime)
+                fbx_key_times, values, key_interp = blen_read_animation_curve(curve, fbx_ktime)
+                blen_store_keyframes(fbx_key_times, blen_curve, values, anim_offset, fps, fbx_ktime,
+                                     key_interp=key_interp)
 
     elif isinstance(item, ShapeKey):
         for fbxprop, channel_to_curve in fbx_curves.items():
@@ -1006,10 +1179,12 @@ def blen_read_animations_action_item(channelbag_or_act, item, cnodes, fps, anim_
                 assert channel == 0
                 blen_curve = blen_curves[channel]
 
-                fbx_key_times, values = blen_read_animation_curve(curve)
+                fbx_key_times, values, key_interp = blen_read_animation_curve(curve, fbx_ktime)
                 # A fully activated shape key in FBX DeformPercent is 100.0 whereas it is 1.0 in Blender.
                 values = values / 100.0
-                blen_store_keyframes(fbx_key_times, blen_curve, values, anim_offset, fps, fbx_ktime)
+                key_interp = _curve_interpolation_scaled(key_interp, 1.0 / 100.0)
+                blen_store_keyframes(fbx_key_times, blen_curve, values, anim_offset, fps, fbx_ktime,
+                                     key_interp=key_interp)
 
                 # Store the minimum and maximum shape key values, so that the shape key's slider range can be expanded
                 # if necessary after reading all animations.
@@ -1027,12 +1202,14 @@ def blen_read_animations_action_item(channelbag_or_act, item, cnodes, fps, anim_
                 # The indices are determined by the creation of the `props` list above.
                 blen_curve = blen_curves[1 if is_focus_distance else 0]
 
-                fbx_key_times, values = blen_read_animation_curve(curve)
+                fbx_key_times, values, key_interp = blen_read_animation_curve(curve, fbx_ktime)
                 if is_focus_distance:
                     # Remap the imported values from FBX to Blender.
                     values = values / 1000.0
                     values *= global_scale
-                blen_store_keyframes(fbx_key_times, blen_curve, values, anim_offset, fps, fbx_ktime)
+                    key_interp = _curve_interpolation_scaled(key_interp, global_scale / 1000.0)
+                blen_store_keyframes(fbx_key_times, blen_curve, values, anim_offset, fps, fbx_ktime,
+                                     key_interp=key_interp)
 
     else:  # Object or PoseBone:
         transform_data = item.fbx_transform_data
@@ -1054,13 +1231,13 @@ def blen_read_animations_action_item(channelbag_or_act, item, cnodes, fps, anim_
                 continue
             for channel, curve in channel_to_curve.items():
                 assert channel in {0, 1, 2}
-                fbx_key_times, values = blen_read_animation_curve(curve)
+                fbx_key_times, values, key_interp = blen_read_animation_curve(curve, fbx_ktime)
 
                 channel_keys.append((fbxprop, channel))
 
                 initial_values.append(transform_prop_to_attr[fbxprop][channel])
 
-                times_and_values_tuples.append((fbx_key_times, values))
+                times_and_values_tuples.append((fbx_key_times, values, key_interp))
         if not times_and_values_tuples:
             # If `times_and_values_tuples` is empty, all the imported animation curves are for properties other than
             # transformation (e.g. animated custom properties), so there is nothing to do until support for those other
@@ -1068,7 +1245,11 @@ def blen_read_animations_action_item(channelbag_or_act, item, cnodes, fps, anim_
             return
 
         # Combine the keyframe times of all the transformation curves so that each curve has a value at every time.
-        combined_fbx_times, values_arrays = _combine_curve_keyframe_times(times_and_values_tuples, initial_values)
+        # UnDrew Edit Start : Steps of constant curves combined with other curves take 1/64th of a frame.
+        hold_step = max(1, round(fbx_ktime / (fps * 64)))
+        combined_fbx_times, values_arrays, key_interps = _combine_curve_keyframe_times(times_and_values_tuples,
+                                                                                       initial_values, hold_step)
+        # UnDrew Edit End
 
         # Convert from FBX Lcl Translation/Lcl Rotation/Lcl Scaling to the Blender location/rotation/scaling properties
         # of this Object/PoseBone.
@@ -1078,22 +1259,48 @@ def blen_read_animations_action_item(channelbag_or_act, item, cnodes, fps, anim_
         num_sca_channels = 3
         num_channels = num_loc_channels + num_rot_channels + num_sca_channels
         num_frames = len(combined_fbx_times)
-        full_length = num_channels * num_frames
 
         # Do the conversion.
-        flattened_channel_values_gen = _transformation_curves_gen(item, values_arrays, channel_keys)
-        flattened_channel_values = np.fromiter(flattened_channel_values_gen, dtype=np.single, count=full_length)
+        # UnDrew Edit Start : Convert the slopes of cubic curves too.
+        if key_interps is None or not (key_interps[0].interpolation == BEZIER_INTERPOLATION_VALUE).any():
+            channel_values = _transformation_curves_values(item, values_arrays, channel_keys).astype(np.single)
+            assert channel_values.shape == (num_frames, num_channels)
+            # Every curve has the same combined interpolation and the slopes are only used by cubic keyframes.
+            channel_interps = [None if key_interps is None else key_interps[0]] * num_channels
+        else:
+            # The conversion is not linear, so the slopes of the converted channels are found by also converting the
+            # values a small step in time before and after each keyframe, following the slopes of the FBX curves.
+            # The stepped values are interleaved with the keyframe values, so that euler and quaternion compatibility
+            # is kept between consecutive rows.
+            slope_step = fbx_ktime * 1e-3
+            stepped_values_arrays = [
+                np.stack((values - key_interp.left_slopes * slope_step,
+                          values,
+                          values + key_interp.right_slopes * slope_step), axis=1).ravel()
+                for values, key_interp in zip(values_arrays, key_interps)
+            ]
+            stepped_channel_values = _transformation_curves_values(item, stepped_values_arrays, channel_keys)
+            assert stepped_channel_values.shape == (num_frames * 3, num_channels)
+            stepped_channel_values = stepped_channel_values.reshape(num_frames, 3, num_channels)
+            channel_values = stepped_channel_values[:, 1].astype(np.single)
+            left_slopes = (stepped_channel_values[:, 1] - stepped_channel_values[:, 0]) / slope_step
+            right_slopes = (stepped_channel_values[:, 2] - stepped_channel_values[:, 1]) / slope_step
+            channel_interps = [key_interps[0]._replace(left_slopes=channel_left_slopes,
+                                                       right_slopes=channel_right_slopes)
+                               for channel_left_slopes, channel_right_slopes in zip(left_slopes.T, right_slopes.T)]
+        # UnDrew Edit End
 
-        # Reshape to one row per frame and then view the transpose so that each row corresponds to a single channel.
+        # View the transpose so that each row corresponds to a single channel.
         # e.g.
         # loc_channels = channel_values[:num_loc_channels]
         # rot_channels = channel_values[num_loc_channels:num_loc_channels + num_rot_channels]
         # sca_channels = channel_values[num_loc_channels + num_rot_channels:]
-        channel_values = flattened_channel_values.reshape(num_frames, num_channels).T
+        channel_values = channel_values.T
 
         # Each channel has the same keyframe times, so the combined times can be passed once along with all the curves
         # and values arrays.
-        blen_store_keyframes_multi(combined_fbx_times, zip(blen_curves, channel_values), anim_offset, fps, fbx_ktime)
+        blen_store_keyframes_multi(combined_fbx_times, zip(blen_curves, channel_values, channel_interps), anim_offset,
+                                   fps, fbx_ktime)
 
 
 # UnDrew Edit Start : Pass the FPS fix setting.
@@ -1634,7 +1841,9 @@ def blen_read_geom_array_mapped_polyloop(
     return False
 
 
-def blen_read_geom_layer_material(fbx_obj, mesh):
+# UnDrew Edit Start : Parallel mesh decoding, `layers_data` is the dict of blen_read_geom_prepare_layers.
+def blen_read_geom_layer_material(fbx_obj, mesh, layers_data=None):
+# UnDrew Edit End
     fbx_layer = elem_find_first(fbx_obj, b'LayerElementMaterial')
 
     if fbx_layer is None:
@@ -1660,6 +1869,12 @@ def blen_read_geom_layer_material(fbx_obj, mesh):
         blen_attr = MESH_ATTRIBUTE_MATERIAL_INDEX.foreach_attribute
         blen_dtype = MESH_ATTRIBUTE_MATERIAL_INDEX.dtype
         assert fbx_item_size == MESH_ATTRIBUTE_MATERIAL_INDEX.item_size
+    # UnDrew Edit Start : Parallel mesh decoding.
+    layer_data = layers_data.get(id(fbx_layer)) if layers_data else None
+    if layer_data is not None:
+        blen_data.foreach_set(blen_attr, layer_data)
+        return
+    # UnDrew Edit End
     blen_read_geom_array_mapped_polygon(
         mesh, blen_data, blen_attr, blen_dtype,
         fbx_layer_data, None,
@@ -1668,7 +1883,9 @@ def blen_read_geom_layer_material(fbx_obj, mesh):
     )
 
 
-def blen_read_geom_layer_uv(fbx_obj, mesh):
+# UnDrew Edit Start : Parallel mesh decoding, `layers_data` is the dict of blen_read_geom_prepare_layers.
+def blen_read_geom_layer_uv(fbx_obj, mesh, layers_data=None):
+# UnDrew Edit End
     for layer_id in (b'LayerElementUV',):
         for fbx_layer in elem_find_iter(fbx_obj, layer_id):
             # all should be valid
@@ -1701,6 +1918,12 @@ def blen_read_geom_layer_uv(fbx_obj, mesh):
                 print("%r %r missing data" % (layer_id, fbx_layer_name))
                 continue
 
+            # UnDrew Edit Start : Parallel mesh decoding.
+            layer_data = layers_data.get(id(fbx_layer)) if layers_data else None
+            if layer_data is not None:
+                blen_data.foreach_set(blen_attr, layer_data)
+                continue
+            # UnDrew Edit End
             blen_read_geom_array_mapped_polyloop(
                 mesh, blen_data, blen_attr, np.single,
                 fbx_layer_data, fbx_layer_index,
@@ -1709,7 +1932,9 @@ def blen_read_geom_layer_uv(fbx_obj, mesh):
             )
 
 
-def blen_read_geom_layer_color(fbx_obj, mesh, colors_type):
+# UnDrew Edit Start : Parallel mesh decoding, `layers_data` is the dict of blen_read_geom_prepare_layers.
+def blen_read_geom_layer_color(fbx_obj, mesh, colors_type, layers_data=None):
+# UnDrew Edit End
     # COMPAT ADD BEGIN
     using_color_attributes_api = api_compat.HAS_MESH_COL_ATTRS_PROP and api_compat.HAS_COL_ATTR_SRGB_PROP
     if not using_color_attributes_api:
@@ -1753,6 +1978,12 @@ def blen_read_geom_layer_color(fbx_obj, mesh, colors_type):
                 print("%r %r missing data" % (layer_id, fbx_layer_name))
                 continue
 
+            # UnDrew Edit Start : Parallel mesh decoding.
+            layer_data = layers_data.get(id(fbx_layer)) if layers_data else None
+            if layer_data is not None:
+                blen_data.foreach_set(color_prop_name, layer_data)
+                continue
+            # UnDrew Edit End
             blen_read_geom_array_mapped_polyloop(
                 mesh, blen_data, color_prop_name, np.single,
                 fbx_layer_data, fbx_layer_index,
@@ -1761,7 +1992,9 @@ def blen_read_geom_layer_color(fbx_obj, mesh, colors_type):
             )
 
 
-def blen_read_geom_layer_smooth(fbx_obj, mesh):
+# UnDrew Edit Start : Parallel mesh decoding, `layers_data` is the dict of blen_read_geom_prepare_layers.
+def blen_read_geom_layer_smooth(fbx_obj, mesh, layers_data=None):
+# UnDrew Edit End
     fbx_layer = elem_find_first(fbx_obj, b'LayerElementSmoothing')
 
     if fbx_layer is None:
@@ -1780,6 +2013,10 @@ def blen_read_geom_layer_smooth(fbx_obj, mesh):
     if fbx_layer_data is None:
         return False
 
+    # UnDrew Add Start : Parallel mesh decoding.
+    layer_data = layers_data.get(id(fbx_layer)) if layers_data else None
+    # UnDrew Add End
+
     if fbx_layer_mapping == b'ByEdge':
         # some models have bad edge data, we can't use this info...
         if not mesh.edges:
@@ -1798,13 +2035,18 @@ def blen_read_geom_layer_smooth(fbx_obj, mesh):
             blen_attr = MESH_ATTRIBUTE_SHARP_EDGE.foreach_attribute
             blen_dtype = MESH_ATTRIBUTE_SHARP_EDGE.dtype
             assert fbx_item_size == MESH_ATTRIBUTE_SHARP_EDGE.item_size
-        blen_read_geom_array_mapped_edge(
-            mesh, blen_data, blen_attr, blen_dtype,
-            fbx_layer_data, None,
-            fbx_layer_mapping, fbx_layer_ref,
-            1, fbx_item_size, layer_id,
-            xform=np.logical_not,  # in FBX, 0 (False) is sharp, but in Blender True is sharp.
-        )
+        # UnDrew Edit Start : Parallel mesh decoding.
+        if layer_data is not None:
+            blen_data.foreach_set(blen_attr, layer_data)
+        else:
+            blen_read_geom_array_mapped_edge(
+                mesh, blen_data, blen_attr, blen_dtype,
+                fbx_layer_data, None,
+                fbx_layer_mapping, fbx_layer_ref,
+                1, fbx_item_size, layer_id,
+                xform=np.logical_not,  # in FBX, 0 (False) is sharp, but in Blender True is sharp.
+            )
+        # UnDrew Edit End
         # COMPAT ADD BEGIN
         if not api_compat.HAS_REFACTORED_MESH_SMOOTHING:
             # We only set sharp edges here, not face smoothing itself...
@@ -1828,13 +2070,19 @@ def blen_read_geom_layer_smooth(fbx_obj, mesh):
             blen_dtype = MESH_ATTRIBUTE_SHARP_FACE.dtype
             xform = lambda s: (s == 0)
             assert fbx_item_size == MESH_ATTRIBUTE_SHARP_FACE.item_size
-        sharp_face_set_successfully = blen_read_geom_array_mapped_polygon(
-            mesh, blen_data, blen_attr, blen_dtype,
-            fbx_layer_data, None,
-            fbx_layer_mapping, fbx_layer_ref,
-            1, fbx_item_size, layer_id,
-            xform=xform,  # smooth-group bit-flags, treat as booleans for now.
-        )
+        # UnDrew Edit Start : Parallel mesh decoding.
+        if layer_data is not None:
+            blen_data.foreach_set(blen_attr, layer_data)
+            sharp_face_set_successfully = True
+        else:
+            sharp_face_set_successfully = blen_read_geom_array_mapped_polygon(
+                mesh, blen_data, blen_attr, blen_dtype,
+                fbx_layer_data, None,
+                fbx_layer_mapping, fbx_layer_ref,
+                1, fbx_item_size, layer_id,
+                xform=xform,  # smooth-group bit-flags, treat as booleans for now.
+            )
+        # UnDrew Edit End
         # COMPAT EDIT BEGIN
         if not sharp_face_set_successfully and sharp_face is not None:
         # COMPAT EDIT BEGIN
@@ -1844,7 +2092,9 @@ def blen_read_geom_layer_smooth(fbx_obj, mesh):
         print("warning layer %r mapping type unsupported: %r" % (fbx_layer.id, fbx_layer_mapping))
         return False
 
-def blen_read_geom_layer_edge_crease(fbx_obj, mesh):
+# UnDrew Edit Start : Parallel mesh decoding, `layers_data` is the dict of blen_read_geom_prepare_layers.
+def blen_read_geom_layer_edge_crease(fbx_obj, mesh, layers_data=None):
+# UnDrew Edit End
     fbx_layer = elem_find_first(fbx_obj, b'LayerElementEdgeCrease')
 
     if fbx_layer is None:
@@ -1884,6 +2134,12 @@ def blen_read_geom_layer_edge_crease(fbx_obj, mesh):
         # COMPAT ADD END
             blen_data = mesh.edge_creases_ensure().data
             blen_attr = "value"
+        # UnDrew Add Start : Parallel mesh decoding.
+        layer_data = layers_data.get(id(fbx_layer)) if layers_data else None
+        if layer_data is not None:
+            blen_data.foreach_set(blen_attr, layer_data)
+            return True
+        # UnDrew Add End
         return blen_read_geom_array_mapped_edge(
             mesh, blen_data, blen_attr, np.single,
             fbx_layer_data, None,
@@ -1898,7 +2154,9 @@ def blen_read_geom_layer_edge_crease(fbx_obj, mesh):
         return False
 
 
-def blen_read_geom_layer_normal(fbx_obj, mesh, xform=None):
+# UnDrew Edit Start : Parallel mesh decoding, `layers_data` is the dict of blen_read_geom_prepare_layers.
+def blen_read_geom_layer_normal(fbx_obj, mesh, xform=None, layers_data=None):
+# UnDrew Edit End
     fbx_layer = elem_find_first(fbx_obj, b'LayerElementNormal')
 
     if fbx_layer is None:
@@ -1929,6 +2187,12 @@ def blen_read_geom_layer_normal(fbx_obj, mesh, xform=None):
     # COMPAT ADD END
         corner_blen_data = mesh.attributes["temp_custom_normals"].data
         corner_blen_attr = "vector"
+    # UnDrew Add Start : Parallel mesh decoding, already expanded to per-loop normals.
+    layer_data = layers_data.get(id(fbx_layer)) if layers_data else None
+    if layer_data is not None:
+        corner_blen_data.foreach_set(corner_blen_attr, layer_data)
+        return True
+    # UnDrew Add End
     tries = ((corner_blen_data, "Loops", False, blen_read_geom_array_mapped_polyloop),
              (mesh.polygons, "Polygons", True, blen_read_geom_array_mapped_polygon),
              (mesh.vertices, "Vertices", True, blen_read_geom_array_mapped_vert))
@@ -1967,19 +2231,168 @@ if not api_compat.HAS_CPP_NORMAL_NORMALIZATION:
 # COMPAT ADD END
 
 
-def blen_read_geom(fbx_tmpl, fbx_obj, settings):
-    # Vertices are in object space, but we are post-multiplying all transforms with the inverse of the
-    # global matrix, so we need to apply the global matrix to the vertices to get the correct result.
-    geom_mat_co = settings.global_matrix if settings.bake_space_transform else None
+# UnDrew Add Start : Parallel mesh decoding.
+# FBX mapping of the layers of each domain of a mesh, as read by the blen_read_geom_array_mapped_* functions.
+_GEOM_DOMAIN_FBX_MAPPING = {
+    'POINT': b'ByVertice',
+    'EDGE': b'ByEdge',
+    'FACE': b'ByPolygon',
+    'CORNER': b'ByPolygonVertex',
+}
+
+
+def blen_read_geom_normal_matrix(settings):
+    """The matrix to transform the normals of Geometries with, or None."""
     # We need to apply the inverse transpose of the global matrix when transforming normals.
     geom_mat_no = Matrix(settings.global_matrix_inv_transposed) if settings.bake_space_transform else None
     if geom_mat_no is not None:
         # Remove translation & scaling!
         geom_mat_no.translation = Vector()
         geom_mat_no.normalize()
+    return geom_mat_no
+
+
+def blen_read_geom_array_prepare(fbx_layer_data, fbx_layer_index, fbx_layer_mapping, fbx_layer_ref, stride, item_size,
+                                 blen_dtype, domain, num_items, loop_vertex_indices=None, xform=None):
+    """Counterpart of the blen_read_geom_array_mapped_* function of `domain` that returns the flat array to foreach_set
+    into the `num_items` items of the domain, instead of setting it.
+
+    Only layers whose data exactly fills the domain are prepared. None is returned for the others (unsupported
+    mappings, partial, missing or excess data, invalid indices), which are left to the blen_read_geom_array_mapped_*
+    function, so that it reports the errors and keeps the existing values of the items that have no data."""
+    if fbx_layer_data is None or not fbx_layer_data or len(fbx_layer_data) % stride:
+        return None
+
+    if fbx_layer_mapping == b'AllSame':
+        if fbx_layer_ref != b'IndexToDirect' or fbx_layer_index is not None:
+            return None
+        fbx_data_np = blen_read_geom_xform(blen_read_geom_parse_fbx_data(fbx_layer_data, stride, item_size), xform)
+        return np.full((num_items, item_size), fbx_data_np[0], dtype=blen_dtype).ravel()
+
+    if fbx_layer_mapping == _GEOM_DOMAIN_FBX_MAPPING[domain] and fbx_layer_ref in {b'Direct', b'IndexToDirect'}:
+        if domain == 'EDGE' and fbx_layer_ref != b'Direct':
+            return None
+        # IndexToDirect layers without indices are read as Direct.
+        indices = fbx_layer_index if fbx_layer_ref == b'IndexToDirect' else None
+    elif domain == 'CORNER' and fbx_layer_mapping == b'ByVertice' and fbx_layer_ref == b'Direct':
+        if fbx_layer_index is not None:
+            return None
+        indices = loop_vertex_indices
+    else:
+        return None
+
+    fbx_data_np = blen_read_geom_xform(blen_read_geom_parse_fbx_data(fbx_layer_data, stride, item_size), xform)
+    # Cast to the Blender C type first, so that indexing creates the array to foreach_set directly.
+    fbx_data_np = astype_view_signedness(fbx_data_np, blen_dtype)
+    if indices is None:
+        if len(fbx_data_np) != num_items:
+            return None
+        return fbx_data_np.ravel()
+
+    if not isinstance(indices, np.ndarray):
+        indices = parray_as_ndarray(indices)
+    fbx_num_items = len(fbx_data_np)
+    if len(indices) != num_items or not np.all((indices >= -fbx_num_items) & (indices < fbx_num_items)):
+        return None
+    return fbx_data_np[indices].ravel()
+
+
+def blen_read_geom_prepare_layers(fbx_obj, settings, loop_vertex_indices, poly_loop_starts, tot_verts, tot_edges):
+    """Decode the material, UV, color, smoothing, edge crease and normal layers of a Geometry into the flat NumPy
+    arrays to foreach_set into its Blender mesh, keyed by the id() of each layer element.
+
+    Does not touch `bpy`, so can be run on a separate thread. The layers that are not prepared, see
+    blen_read_geom_array_prepare, are read by the blen_read_geom_layer_* functions as usual."""
+    layers_data = {}
+    tot_loops = len(loop_vertex_indices)
+    tot_polys = len(poly_loop_starts)
+
+    def prepare(fbx_layer, data_id, index_id, stride, item_size, blen_dtype, domain, num_items, xform=None):
+        _fbx_layer_name, fbx_layer_mapping, fbx_layer_ref = blen_read_geom_layerinfo(fbx_layer)
+        fbx_layer_data = elem_prop_first(elem_find_first(fbx_layer, data_id))
+        fbx_layer_index = elem_prop_first(elem_find_first(fbx_layer, index_id)) if index_id else None
+        layer_data = blen_read_geom_array_prepare(fbx_layer_data, fbx_layer_index, fbx_layer_mapping, fbx_layer_ref,
+                                                  stride, item_size, blen_dtype, domain, num_items,
+                                                  loop_vertex_indices, xform)
+        if layer_data is not None:
+            layers_data[id(fbx_layer)] = layer_data
+        return layer_data
+
+    fbx_layer = elem_find_first(fbx_obj, b'LayerElementMaterial')
+    if fbx_layer is not None:
+        # COMPAT ADD BEGIN
+        if not MESH_ATTRIBUTE_MATERIAL_INDEX:
+            blen_dtype = np.uintc
+        else:
+        # COMPAT ADD END
+            blen_dtype = MESH_ATTRIBUTE_MATERIAL_INDEX.dtype
+        prepare(fbx_layer, b'Materials', None, 1, 1, blen_dtype, 'FACE', tot_polys)
+
+    for fbx_layer in elem_find_iter(fbx_obj, b'LayerElementUV'):
+        prepare(fbx_layer, b'UV', b'UVIndex', 2, 2, np.single, 'CORNER', tot_loops)
+
+    if settings.colors_type != 'NONE':
+        for fbx_layer in elem_find_iter(fbx_obj, b'LayerElementColor'):
+            prepare(fbx_layer, b'Colors', b'ColorIndex', 4, 4, np.single, 'CORNER', tot_loops)
+
+    fbx_layer = elem_find_first(fbx_obj, b'LayerElementSmoothing')
+    if fbx_layer is not None:
+        fbx_layer_mapping = elem_find_first_string_as_bytes(fbx_layer, b'MappingInformationType')
+        if fbx_layer_mapping == b'ByEdge':
+            # COMPAT ADD BEGIN
+            if not MESH_ATTRIBUTE_SHARP_EDGE:
+                blen_dtype = bool
+            else:
+            # COMPAT ADD END
+                blen_dtype = MESH_ATTRIBUTE_SHARP_EDGE.dtype
+            prepare(fbx_layer, b'Smoothing', None, 1, 1, blen_dtype, 'EDGE', tot_edges, np.logical_not)
+        elif fbx_layer_mapping == b'ByPolygon':
+            # COMPAT ADD BEGIN
+            if not MESH_ATTRIBUTE_SHARP_FACE:
+                blen_dtype = bool
+                xform = lambda s: (s != 0)
+            else:
+            # COMPAT ADD END
+                blen_dtype = MESH_ATTRIBUTE_SHARP_FACE.dtype
+                xform = lambda s: (s == 0)
+            prepare(fbx_layer, b'Smoothing', None, 1, 1, blen_dtype, 'FACE', tot_polys, xform)
+
+    fbx_layer = elem_find_first(fbx_obj, b'LayerElementEdgeCrease')
+    if fbx_layer is not None:
+        prepare(fbx_layer, b'EdgeCrease', None, 1, 1, np.single, 'EDGE', tot_edges, np.sqrt)
+
+    fbx_layer = elem_find_first(fbx_obj, b'LayerElementNormal') if settings.use_custom_normals else None
+    if fbx_layer is not None:
+        geom_mat_no = blen_read_geom_normal_matrix(settings)
+        xform = None if geom_mat_no is None else lambda v_array: nors_transformed(v_array, geom_mat_no)
+        # Like blen_read_geom_layer_normal, per-polygon and per-vertex normals are expanded to per-loop normals.
+        _fbx_layer_name, fbx_layer_mapping, fbx_layer_ref = blen_read_geom_layerinfo(fbx_layer)
+        if fbx_layer_mapping == b'ByPolygon':
+            layer_data = prepare(fbx_layer, b'Normals', b'NormalsIndex', 3, 3, np.single, 'FACE', tot_polys, xform)
+            if layer_data is not None:
+                poly_loop_totals = np.diff(poly_loop_starts, append=tot_loops)
+                layers_data[id(fbx_layer)] = np.repeat(layer_data.reshape(-1, 3), poly_loop_totals, axis=0).ravel()
+        elif fbx_layer_mapping == b'ByVertice' and fbx_layer_ref == b'IndexToDirect':
+            layer_data = prepare(fbx_layer, b'Normals', b'NormalsIndex', 3, 3, np.single, 'POINT', tot_verts, xform)
+            if layer_data is not None:
+                layers_data[id(fbx_layer)] = layer_data.reshape(-1, 3)[loop_vertex_indices].ravel()
+        else:
+            prepare(fbx_layer, b'Normals', b'NormalsIndex', 3, 3, np.single, 'CORNER', tot_loops, xform)
+
+    return layers_data
 
-    # TODO, use 'fbx_tmpl'
-    elem_name_utf8 = elem_name_ensure_class(fbx_obj, b'Geometry')
+
+def blen_read_geom_prepare(fbx_obj, settings):
+    """Decode the vertices, loops, polygons, edges and layers of a Geometry into the NumPy arrays to set into its
+    Blender mesh.
+
+    Does not touch `bpy`, so can be run on a separate thread, see blen_read_geom_prepare_iter.
+    Returns a (vertex_cos, loop_vertex_indices, poly_loop_starts, poly_loop_totals, edge_vertex_indices, layers_data)
+    tuple, where each array is None when there is nothing to set, and layers_data is the dict of
+    blen_read_geom_prepare_layers."""
+    # Vertices are in object space, but we are post-multiplying all transforms with the inverse of the
+    # global matrix, so we need to apply the global matrix to the vertices to get the correct result.
+    geom_mat_co = settings.global_matrix if settings.bake_space_transform else None
 
     fbx_verts = elem_prop_first(elem_find_first(fbx_obj, b'Vertices'))
     fbx_polys = elem_prop_first(elem_find_first(fbx_obj, b'PolygonVertexIndex'))
@@ -2007,24 +2420,15 @@ def blen_read_geom(fbx_tmpl, fbx_obj, settings):
     tot_loops = len(fbx_polys)
     tot_edges = len(fbx_edges)
 
-    mesh = bpy.data.meshes.new(name=elem_name_utf8)
-    # COMPAT EDIT BEGIN : Don't blindly access the attributes collection.
-    attributes = api_compat.HAS_MESH_ATTRIBUTES and mesh.attributes
-    # COMPAT EDIT END
+    vcos = loop_vertex_indices = poly_loop_starts = poly_loop_totals = edges_conv = None
+    layers_data = {}
 
     if tot_verts:
         if geom_mat_co is not None:
-            fbx_verts = vcos_transformed(fbx_verts, geom_mat_co, bl_vcos_dtype)
+            vcos = vcos_transformed(fbx_verts, geom_mat_co, bl_vcos_dtype)
         else:
-            fbx_verts = fbx_verts.astype(bl_vcos_dtype, copy=False)
-
-        mesh.vertices.add(tot_verts)
-        # COMPAT ADD BEGIN
-        if not MESH_ATTRIBUTE_POSITION:
-            mesh.vertices.foreach_set("co", fbx_verts.ravel())
-        else:
-        # COMPAT ADD END
-            MESH_ATTRIBUTE_POSITION.foreach_set(attributes, fbx_verts.ravel())
+            vcos = fbx_verts.astype(bl_vcos_dtype, copy=False)
+        vcos = vcos.ravel()
 
     if tot_loops:
         bl_loop_start_dtype = np.uintc
@@ -2035,7 +2439,6 @@ def blen_read_geom(fbx_tmpl, fbx_obj, settings):
         # COMPAT ADD END
             bl_loop_vertex_index_dtype = MESH_ATTRIBUTE_CORNER_VERT.dtype
 
-        mesh.loops.add(tot_loops)
         # The end of each polygon is specified by an inverted index.
         fbx_loop_end_idx = np.flatnonzero(fbx_polys < 0)
 
@@ -2043,14 +2446,8 @@ def blen_read_geom(fbx_tmpl, fbx_obj, settings):
 
         # Un-invert the loop ends.
         fbx_polys[fbx_loop_end_idx] ^= -1
-        # Set loop vertex indices, casting to the Blender C type first for performance.
-        val = astype_view_signedness(fbx_polys, bl_loop_vertex_index_dtype)
-        # COMPAT ADD BEGIN
-        if not MESH_ATTRIBUTE_CORNER_VERT:
-            mesh.loops.foreach_set("vertex_index", val)
-        else:
-        # COMPAT ADD END
-            MESH_ATTRIBUTE_CORNER_VERT.foreach_set(attributes, val)
+        # Loop vertex indices, cast to the Blender C type first for performance.
+        loop_vertex_indices = astype_view_signedness(fbx_polys, bl_loop_vertex_index_dtype)
 
         poly_loop_starts = np.empty(tot_polys, dtype=bl_loop_start_dtype)
         # The first loop is always a loop start.
@@ -2058,8 +2455,6 @@ def blen_read_geom(fbx_tmpl, fbx_obj, settings):
         # Ignoring the last loop end, the indices after every loop end are the remaining loop starts.
         poly_loop_starts[1:] = fbx_loop_end_idx[:-1] + 1
 
-        mesh.polygons.add(tot_polys)
-        mesh.polygons.foreach_set("loop_start", poly_loop_starts)
         # COMPAT ADD BEGIN
         if not api_compat.HAS_REFACTORED_POLYS_FOR_CONSISTENT_ORDER_WITH_LOOPS:
             # 3.6 automatically infers 'loop_total' from the next poly's 'loop_start'. This isn't true for < 3.5, so in
@@ -2069,13 +2464,8 @@ def blen_read_geom(fbx_tmpl, fbx_obj, settings):
             poly_loop_totals = np.roll(poly_loop_starts, -1)
             poly_loop_totals[-1] = tot_loops
             poly_loop_totals[1:] -= poly_loop_starts[1:]
-            mesh.polygons.foreach_set("loop_total", poly_loop_totals)
         # COMPAT ADD END
 
-        blen_read_geom_layer_material(fbx_obj, mesh)
-        blen_read_geom_layer_uv(fbx_obj, mesh)
-        blen_read_geom_layer_color(fbx_obj, mesh, settings.colors_type)
-
         if tot_edges:
             # edges in fact index the polygons (NOT the vertices)
             # COMPAT ADD BEGIN
@@ -2115,21 +2505,90 @@ def blen_read_geom(fbx_tmpl, fbx_obj, settings):
             # COMPAT ADD END
                 edges_conv = np.concatenate(arrays_to_concat,
                                             axis=1, dtype=bl_edge_vertex_indices_dtype, casting='unsafe')
+            # ravel() because edges_conv must be flat and C-contiguous when passed to foreach_set.
+            edges_conv = edges_conv.ravel()
+
+        layers_data = blen_read_geom_prepare_layers(fbx_obj, settings, loop_vertex_indices, poly_loop_starts,
+                                                    tot_verts, tot_edges)
+    elif tot_edges:
+        print("ERROR: No polygons, but edges exist. Ignoring the edges!")
+
+    return vcos, loop_vertex_indices, poly_loop_starts, poly_loop_totals, edges_conv, layers_data
 
+
+def blen_read_geom_prepare_iter(fbx_objs, settings):
+    """Yield the result of blen_read_geom_prepare for each Geometry of `fbx_objs`, in order, decoding them on separate
+    threads (most of the NumPy functions used release the GIL) a few Geometry ahead of the one being consumed."""
+    def prepare(fbx_obj):
+        return blen_read_geom_prepare(fbx_obj, settings)
+
+    # The calling thread creates the Blender meshes meanwhile, so is counted as another CPU-bound thread.
+    return map_cpu_bound_ordered(prepare, fbx_objs, other_cpu_bound_threads_in_use=1)
+# UnDrew Add End
+
+
+# UnDrew Edit Start : Parallel mesh decoding, `geom_data` is the result of blen_read_geom_prepare, when already decoded.
+def blen_read_geom(fbx_tmpl, fbx_obj, settings, geom_data=None):
+# UnDrew Edit End
+    # UnDrew Edit Start : Parallel mesh decoding, shared with blen_read_geom_prepare_layers.
+    geom_mat_no = blen_read_geom_normal_matrix(settings)
+    # UnDrew Edit End
+
+    # TODO, use 'fbx_tmpl'
+    elem_name_utf8 = elem_name_ensure_class(fbx_obj, b'Geometry')
+
+    # UnDrew Edit Start : Parallel mesh decoding.
+    if geom_data is None:
+        geom_data = blen_read_geom_prepare(fbx_obj, settings)
+    vcos, loop_vertex_indices, poly_loop_starts, poly_loop_totals, edges_conv, layers_data = geom_data
+
+    mesh = bpy.data.meshes.new(name=elem_name_utf8)
+    # COMPAT EDIT BEGIN : Don't blindly access the attributes collection.
+    attributes = api_compat.HAS_MESH_ATTRIBUTES and mesh.attributes
+    # COMPAT EDIT END
+
+    if vcos is not None:
+        mesh.vertices.add(len(vcos) // 3)
+        # COMPAT ADD BEGIN
+        if not MESH_ATTRIBUTE_POSITION:
+            mesh.vertices.foreach_set("co", vcos)
+        else:
+        # COMPAT ADD END
+            MESH_ATTRIBUTE_POSITION.foreach_set(attributes, vcos)
+
+    if loop_vertex_indices is not None:
+        mesh.loops.add(len(loop_vertex_indices))
+        # COMPAT ADD BEGIN
+        if not MESH_ATTRIBUTE_CORNER_VERT:
+            mesh.loops.foreach_set("vertex_index", loop_vertex_indices)
+        else:
+        # COMPAT ADD END
+            MESH_ATTRIBUTE_CORNER_VERT.foreach_set(attributes, loop_vertex_indices)
+
+        mesh.polygons.add(len(poly_loop_starts))
+        mesh.polygons.foreach_set("loop_start", poly_loop_starts)
+        # COMPAT ADD BEGIN
+        if poly_loop_totals is not None:
+            mesh.polygons.foreach_set("loop_total", poly_loop_totals)
+        # COMPAT ADD END
+
+        blen_read_geom_layer_material(fbx_obj, mesh, layers_data)
+        blen_read_geom_layer_uv(fbx_obj, mesh, layers_data)
+        blen_read_geom_layer_color(fbx_obj, mesh, settings.colors_type, layers_data)
+
+        if edges_conv is not None:
             # Add the edges and set their vertex indices.
-            mesh.edges.add(len(edges_conv))
-            # ravel() because edges_conv must be flat and C-contiguous when passed to foreach_set.
+            mesh.edges.add(len(edges_conv) // 2)
             # COMPAT ADD BEGIN
             if not MESH_ATTRIBUTE_EDGE_VERTS:
-                mesh.edges.foreach_set("vertices", edges_conv.ravel())
+                mesh.edges.foreach_set("vertices", edges_conv)
             else:
             # COMPAT ADD END
-                MESH_ATTRIBUTE_EDGE_VERTS.foreach_set(attributes, edges_conv.ravel())
-    elif tot_edges:
-        print("ERROR: No polygons, but edges exist. Ignoring the edges!")
+                MESH_ATTRIBUTE_EDGE_VERTS.foreach_set(attributes, edges_conv)
+    # UnDrew Edit End
 
     # must be after edge, face loading.
-    face_smoothing_was_set = blen_read_geom_layer_smooth(fbx_obj, mesh)
+    face_smoothing_was_set = blen_read_geom_layer_smooth(fbx_obj, mesh, layers_data)
     # COMPAT ADD BEGIN
     if not face_smoothing_was_set and not MESH_ATTRIBUTE_SHARP_FACE:
         # Before the 'sharp_face' attrib existed, `use_smooth = False` by default, so it has to be set here explicitly.
@@ -2138,7 +2597,7 @@ def blen_read_geom(fbx_tmpl, fbx_obj, settings):
         face_smoothing_was_set = True
     # COMPAT ADD END
 
-    ok_crease = blen_read_geom_layer_edge_crease(fbx_obj, mesh)
+    ok_crease = blen_read_geom_layer_edge_crease(fbx_obj, mesh, layers_data)
 
     ok_normals = False
     if settings.use_custom_normals:
@@ -2151,10 +2610,11 @@ def blen_read_geom(fbx_tmpl, fbx_obj, settings):
         # COMPAT ADD END
             mesh.attributes.new("temp_custom_normals", 'FLOAT_VECTOR', 'CORNER')
         if geom_mat_no is None:
-            ok_normals = blen_read_geom_layer_normal(fbx_obj, mesh)
+            ok_normals = blen_read_geom_layer_normal(fbx_obj, mesh, layers_data=layers_data)
         else:
             ok_normals = blen_read_geom_layer_normal(fbx_obj, mesh,
-                                                     lambda v_array: nors_transformed(v_array, geom_mat_no))
+                                                     lambda v_array: nors_transformed(v_array, geom_mat_no),
+                                                     layers_data)
 
     mesh.validate(clean_customdata=False)  # *Very* important to not remove lnors here!
 
@@ -2235,6 +2695,13 @@ def blen_read_shapes(fbx_tmpl, fbx_data, objects, me, scene):
     # COMPAT ADD END
         me_vcos = MESH_ATTRIBUTE_POSITION.to_ndarray(me.attributes)
     me_vcos_vector_view = me_vcos.reshape(-1, 3)
+    # UnDrew Add Start : Batched shape keys.
+    # Single buffer of shape key coordinates reused by all the shape keys of the mesh. It's kept equal to the base
+    # coordinates between shape keys by only restoring the coordinates of the vertices moved by the previous shape key,
+    # instead of copying all the base coordinates again for every shape key.
+    shape_cos = me_vcos_vector_view.copy()
+    shape_cos_flat = shape_cos.ravel()
+    # UnDrew Add End
 
     objects = list({node.bl_obj for node in objects})
     assert objects
@@ -2310,14 +2777,17 @@ def blen_read_shapes(fbx_tmpl, fbx_data, objects, me, scene):
 
         # Only need to set the shape key co if there are any non-zero dvcos.
         if dvcos.any():
-            shape_cos = me_vcos_vector_view.copy()
+            # UnDrew Edit Start : Batched shape keys.
             shape_cos[indices] += dvcos
             # COMPAT ADD BEGIN
             if not api_compat.HAS_SHAPEKEY_POINTS_PROP:
-                kb.data.foreach_set("co", shape_cos.ravel())
+                kb.data.foreach_set("co", shape_cos_flat)
             else:
             # COMPAT ADD END
-                kb.points.foreach_set("co", shape_cos.ravel())
+                kb.points.foreach_set("co", shape_cos_flat)
+            # Restore the base coordinates of the moved vertices for the next shape key.
+            shape_cos[indices] = me_vcos_vector_view[indices]
+            # UnDrew Edit End
 
         shape_key_values_in_range &= expand_shape_key_range(kb, weight)
 
@@ -2325,12 +2795,9 @@ def blen_read_shapes(fbx_tmpl, fbx_data, objects, me, scene):
 
         # Add vgroup if necessary.
         if vgweights is not None:
-            # VertexGroup.add only allows sequences of int indices, but iterating the indices array directly would
-            # produce numpy scalars of types such as np.int32. The underlying memoryview of the indices array, however,
-            # does produce standard Python ints when iterated, so pass indices.data to add_vgroup_to_objects instead of
-            # indices.
-            # memoryviews tend to be faster to iterate than numpy arrays anyway, so vgweights.data is passed too.
-            add_vgroup_to_objects(indices.data, vgweights.data, kb.name, objects)
+            # UnDrew Edit Start : add_vgroup_to_objects takes the arrays directly since it groups the weights itself.
+            add_vgroup_to_objects(indices, vgweights, kb.name, objects)
+            # UnDrew Edit End
             kb.vertex_group = kb.name
 
         bc_uuid_to_keyblocks.setdefault(bc_uuid, []).append(kb)
@@ -3186,15 +3653,9 @@ class FbxImportHelperNode:
                 child.set_pose_matrix_and_custom_props(arm, settings)
 
     def merge_weights(self, combined_weights, fbx_cluster):
-        indices = elem_prop_first(elem_find_first(fbx_cluster, b'Indexes', default=None), default=())
-        weights = elem_prop_first(elem_find_first(fbx_cluster, b'Weights', default=None), default=())
-
-        for index, weight in zip(indices, weights):
-            w = combined_weights.get(index)
-            if w is None:
-                combined_weights[index] = [weight]
-            else:
-                w.append(weight)
+        # UnDrew Edit Start : Vectorized bone weights, `combined_weights` is a list of (indices, weights) arrays.
+        combined_weights.append(blen_read_cluster_weights(fbx_cluster))
+        # UnDrew Edit End
 
     def set_bone_weights(self):
         ignored_children = tuple(child for child in self.children
@@ -3205,7 +3666,9 @@ class FbxImportHelperNode:
             # This can happen both intentionally and accidentally when skinning a model. Either way, they
             # need to be moved into a parent bone or they cause animation glitches.
             for fbx_cluster, meshes in self.clusters:
-                combined_weights = {}
+                # UnDrew Edit Start : Vectorized bone weights.
+                combined_weights = []
+                # UnDrew Edit End
                 self.merge_weights(combined_weights, fbx_cluster)
 
                 for child in ignored_children:
@@ -3214,16 +3677,14 @@ class FbxImportHelperNode:
                             self.merge_weights(combined_weights, child_cluster)
 
                 # combine child weights
-                indices = []
-                weights = []
-                for i, w in combined_weights.items():
-                    indices.append(i)
-                    if len(w) > 1:
-                        # Add ignored child weights to the current bone's weight.
-                        # XXX - Weights that sum to more than 1.0 get clamped to 1.0 when set in the vertex group.
-                        weights.append(sum(w))
-                    else:
-                        weights.append(w[0])
+                # UnDrew Edit Start : Vectorized bone weights.
+                indices = np.concatenate([indices for indices, _weights in combined_weights])
+                weights = np.concatenate([weights for _indices, weights in combined_weights]).astype(np.float64)
+                # Add ignored child weights to the current bone's weight, summing the weights of each unique index.
+                # XXX - Weights that sum to more than 1.0 get clamped to 1.0 when set in the vertex group.
+                indices, indices_inverse = np.unique(indices, return_inverse=True)
+                weights = np.bincount(indices_inverse, weights=weights, minlength=len(indices))
+                # UnDrew Edit End
 
                 add_vgroup_to_objects(indices, weights, self.bl_bone, [node.bl_obj for node in meshes])
 
@@ -3232,14 +3693,16 @@ class FbxImportHelperNode:
             for child in ignored_children:
                 for child_cluster, child_meshes in child.clusters:
                     if all_meshes.isdisjoint(child_meshes):
-                        indices = elem_prop_first(elem_find_first(child_cluster, b'Indexes', default=None), default=())
-                        weights = elem_prop_first(elem_find_first(child_cluster, b'Weights', default=None), default=())
+                        # UnDrew Edit Start : Vectorized bone weights.
+                        indices, weights = blen_read_cluster_weights(child_cluster)
+                        # UnDrew Edit End
                         add_vgroup_to_objects(indices, weights, self.bl_bone, [node.bl_obj for node in child_meshes])
         else:
             # set the vertex weights on meshes
             for fbx_cluster, meshes in self.clusters:
-                indices = elem_prop_first(elem_find_first(fbx_cluster, b'Indexes', default=None), default=())
-                weights = elem_prop_first(elem_find_first(fbx_cluster, b'Weights', default=None), default=())
+                # UnDrew Edit Start : Vectorized bone weights.
+                indices, weights = blen_read_cluster_weights(fbx_cluster)
+                # UnDrew Edit End
                 add_vgroup_to_objects(indices, weights, self.bl_bone, [node.bl_obj for node in meshes])
 
         for child in self.children:
@@ -3411,6 +3874,7 @@ def load(operator, context, filepath="",
          UE3_custom_fps_fix=True,   # ...neither does this.
          UE3_set_action_id_root=True,   # ...neither does this.
          UE3_connect_children=False,
+         UE3_use_worker_processes=False,   # only used for parsing.
          # UnDrew Add End
          force_connect_children=False,
          automatic_bone_orientation=False,
@@ -3422,6 +3886,10 @@ def load(operator, context, filepath="",
 
     global fbx_elem_nil
     fbx_elem_nil = FBXElem('', (), (), ())
+    # UnDrew Add Start : Indexed element lookups. Drop the indices left behind by an import that did not finish.
+    global _elem_children_indices, _elem_props_indices
+    _elem_children_indices = _elem_props_indices = None
+    # UnDrew Add End
 
     import os
     import time
@@ -3457,8 +3925,13 @@ def load(operator, context, filepath="",
     del is_ascii
     # End ascii detection.
 
+    # Sub-trees that won't be used with the current options aren't parsed at all.
+    skip_elem_func = skip_elem_unused if use_anim else skip_elem_unused_no_anim
     try:
-        elem_root, version = parse_fbx.parse(filepath)
+        # UnDrew Edit Start : Opt-in worker processes for array decompression.
+        elem_root, version = parse_fbx.parse(filepath, lazy_arrays=LAZY_ARRAY_ELEM_IDS, skip_elem_func=skip_elem_func,
+                                             use_processes=UE3_use_worker_processes)
+        # UnDrew Edit End
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -3588,6 +4061,11 @@ def load(operator, context, filepath="",
         operator.report({'ERROR'}, rpt_("No 'Connections' found in file %r") % filepath)
         return {'CANCELLED'}
 
+    # UnDrew Add Start : Indexed element lookups, from now on.
+    _elem_children_indices = {}
+    _elem_props_indices = {}
+    # UnDrew Add End
+
     # ----
     # First load property templates
     # Load 'PropertyTemplate' values.
@@ -3622,12 +4100,25 @@ def load(operator, context, filepath="",
 
     # ----
     # Build FBX node-table
+    # UnDrew Add Start : Per-class object index.
+    # {id: [(uuid, fbx_item)]} and {(id, class): [(uuid, fbx_item)]}, in file order.
+    fbx_table_nodes_by_id = {}
+    fbx_table_nodes_by_class = {}
+    # UnDrew Add End
+
     def _():
         for fbx_obj in fbx_nodes.elems:
             # TODO, investigate what other items after first 3 may be
             assert fbx_obj.props_type[:3] == b'LSS'
             fbx_uuid = elem_uuid(fbx_obj)
             fbx_table_nodes[fbx_uuid] = [fbx_obj, None]
+        # UnDrew Add Start : Per-class object index, so that each stage below only iterates over its own objects.
+        # Built from the final table so that duplicate uuids resolve exactly as they do in `fbx_table_nodes`.
+        for fbx_uuid, fbx_item in fbx_table_nodes.items():
+            fbx_obj = fbx_item[0]
+            fbx_table_nodes_by_id.setdefault(fbx_obj.id, []).append((fbx_uuid, fbx_item))
+            fbx_table_nodes_by_class.setdefault((fbx_obj.id, fbx_obj.props[2]), []).append((fbx_uuid, fbx_item))
+        # UnDrew Add End
     _()
     del _
 
@@ -3640,6 +4131,10 @@ def load(operator, context, filepath="",
 
     fbx_connection_map = {}
     fbx_connection_map_reverse = {}
+    # UnDrew Add Start : Typed connection adjacency.
+    # {(c_src, c_type, id of c_dst): [(c_dst, fbx_link)]}, only for destinations present in `fbx_table_nodes`.
+    fbx_connection_map_typed = {}
+    # UnDrew Add End
 
     def _():
         for fbx_link in fbx_connections.elems:
@@ -3648,6 +4143,11 @@ def load(operator, context, filepath="",
                 c_src, c_dst = fbx_link.props[1:3]
                 fbx_connection_map.setdefault(c_src, []).append((c_dst, fbx_link))
                 fbx_connection_map_reverse.setdefault(c_dst, []).append((c_src, fbx_link))
+                # UnDrew Add Start : Typed connection adjacency.
+                fbx_dst = fbx_table_nodes.get(c_dst, None)
+                if fbx_dst is not None:
+                    fbx_connection_map_typed.setdefault((c_src, c_type, fbx_dst[0].id), []).append((c_dst, fbx_link))
+                # UnDrew Add End
     _()
     del _
 
@@ -3658,13 +4158,17 @@ def load(operator, context, filepath="",
     def _():
         fbx_tmpl = fbx_template_get((b'Geometry', b'KFbxMesh'))
 
-        for fbx_uuid, fbx_item in fbx_table_nodes.items():
+        # UnDrew Edit Start : Per-class object index and parallel mesh decoding.
+        # The NumPy arrays of the meshes are decoded on separate threads, a few meshes ahead of the one being created, so
+        # that only the creation of the Blender meshes is left to the main thread.
+        fbx_mesh_items = [fbx_item for fbx_uuid, fbx_item in fbx_table_nodes_by_id.get(b'Geometry', ())
+                          if fbx_item[0].props[-1] == b'Mesh']
+        geom_data_iter = blen_read_geom_prepare_iter([fbx_item[0] for fbx_item in fbx_mesh_items], settings)
+        for fbx_item, geom_data in zip(fbx_mesh_items, geom_data_iter):
             fbx_obj, blen_data = fbx_item
-            if fbx_obj.id != b'Geometry':
-                continue
-            if fbx_obj.props[-1] == b'Mesh':
-                assert blen_data is None
-                fbx_item[1] = blen_read_geom(fbx_tmpl, fbx_obj, settings)
+            assert blen_data is None
+            fbx_item[1] = blen_read_geom(fbx_tmpl, fbx_obj, settings, geom_data)
+        # UnDrew Edit End
     _()
     del _
 
@@ -3676,10 +4180,10 @@ def load(operator, context, filepath="",
         fbx_tmpl = fbx_template_get((b'Material', b'KFbxSurfacePhong'))
         # b'KFbxSurfaceLambert'
 
-        for fbx_uuid, fbx_item in fbx_table_nodes.items():
+        # UnDrew Edit Start : Per-class object index.
+        for fbx_uuid, fbx_item in fbx_table_nodes_by_id.get(b'Material', ()):
             fbx_obj, blen_data = fbx_item
-            if fbx_obj.id != b'Material':
-                continue
+        # UnDrew Edit End
             assert blen_data is None
             fbx_item[1] = blen_read_material(fbx_tmpl, fbx_obj, settings)
     _()
@@ -3694,15 +4198,15 @@ def load(operator, context, filepath="",
         # Important to run all 'Video' ones first, embedded images are stored in those nodes.
         # XXX Note we simplify things here, assuming both matching Video and Texture will use same file path,
         #     this may be a bit weak, if issue arise we'll fallback to plain connection stuff...
-        for fbx_uuid, fbx_item in fbx_table_nodes.items():
+        # UnDrew Edit Start : Per-class object index.
+        for fbx_uuid, fbx_item in fbx_table_nodes_by_id.get(b'Video', ()):
             fbx_obj, blen_data = fbx_item
-            if fbx_obj.id != b'Video':
-                continue
+        # UnDrew Edit End
             fbx_item[1] = blen_read_texture_image(fbx_tmpl_img, fbx_obj, basedir, settings)
-        for fbx_uuid, fbx_item in fbx_table_nodes.items():
+        # UnDrew Edit Start : Per-class object index.
+        for fbx_uuid, fbx_item in fbx_table_nodes_by_id.get(b'Texture', ()):
             fbx_obj, blen_data = fbx_item
-            if fbx_obj.id != b'Texture':
-                continue
+        # UnDrew Edit End
             fbx_item[1] = blen_read_texture_image(fbx_tmpl_tex, fbx_obj, basedir, settings)
     _()
     del _
@@ -3714,10 +4218,10 @@ def load(operator, context, filepath="",
     def _():
         fbx_tmpl = fbx_template_get((b'NodeAttribute', b'KFbxCamera'))
 
-        for fbx_uuid, fbx_item in fbx_table_nodes.items():
+        # UnDrew Edit Start : Per-class object index.
+        for fbx_uuid, fbx_item in fbx_table_nodes_by_id.get(b'NodeAttribute', ()):
             fbx_obj, blen_data = fbx_item
-            if fbx_obj.id != b'NodeAttribute':
-                continue
+        # UnDrew Edit End
             if fbx_obj.props[-1] == b'Camera':
                 assert blen_data is None
                 fbx_item[1] = blen_read_camera(fbx_tmpl, fbx_obj, settings)
@@ -3729,10 +4233,10 @@ def load(operator, context, filepath="",
     def _():
         fbx_tmpl = fbx_template_get((b'NodeAttribute', b'KFbxLight'))
 
-        for fbx_uuid, fbx_item in fbx_table_nodes.items():
+        # UnDrew Edit Start : Per-class object index.
+        for fbx_uuid, fbx_item in fbx_table_nodes_by_id.get(b'NodeAttribute', ()):
             fbx_obj, blen_data = fbx_item
-            if fbx_obj.id != b'NodeAttribute':
-                continue
+        # UnDrew Edit End
             if fbx_obj.props[-1] == b'Light':
                 assert blen_data is None
                 fbx_item[1] = blen_read_light(fbx_tmpl, fbx_obj, settings)
@@ -3772,10 +4276,10 @@ def load(operator, context, filepath="",
 
         # add fbx nodes
         fbx_tmpl = fbx_template_get((b'Model', b'KFbxNode'))
-        for a_uuid, a_item in fbx_table_nodes.items():
+        # UnDrew Edit Start : Per-class object index.
+        for a_uuid, a_item in fbx_table_nodes_by_id.get(b'Model', ()):
             fbx_obj, bl_data = a_item
-            if fbx_obj is None or fbx_obj.id != b'Model':
-                continue
+        # UnDrew Edit End
 
             fbx_props = (elem_find_first(fbx_obj, b'Properties70'),
                          elem_find_first(fbx_tmpl, b'Properties70', fbx_elem_nil))
@@ -3844,14 +4348,10 @@ def load(operator, context, filepath="",
         # Maybe some conversion can be applied to put them all into the same frame of reference?
 
         # get the bind pose from pose elements
-        for a_uuid, a_item in fbx_table_nodes.items():
+        # UnDrew Edit Start : Per-class object index.
+        for a_uuid, a_item in fbx_table_nodes_by_class.get((b'Pose', b'BindPose'), ()):
             fbx_obj, bl_data = a_item
-            if fbx_obj is None:
-                continue
-            if fbx_obj.id != b'Pose':
-                continue
-            if fbx_obj.props[2] != b'BindPose':
-                continue
+        # UnDrew Edit End
             for fbx_pose_node in fbx_obj.elems:
                 if fbx_pose_node.id != b'PoseNode':
                     continue
@@ -3979,14 +4479,13 @@ def load(operator, context, filepath="",
             # appears to ignore the duplicates, or overwrite the existing duplicates such that the end result is the
             # same as ignoring them, so keep a set of the seen connections and ignore any duplicates.
             seen_connections = set()
-            for c_dst_uuid, ctype in fbx_connection_map.get(c_src_uuid, ()):
-                if ctype.props[0] != b'OO':
-                    # 'Object-Object' connections only.
-                    continue
-                fbx_data, bl_data = fbx_table_nodes.get(c_dst_uuid, (None, None))
-                if fbx_data is None or fbx_data.id != fbx_id or fbx_data.props[2] != fbx_type:
-                    # Either `c_dst_uuid` doesn't exist, or it has a different id or type.
+            # UnDrew Edit Start : Typed connection adjacency, 'Object-Object' connections to `fbx_id` objects only.
+            for c_dst_uuid, ctype in fbx_connection_map_typed.get((c_src_uuid, b'OO', fbx_id), ()):
+                fbx_data, bl_data = fbx_table_nodes[c_dst_uuid]
+                if fbx_data.props[2] != fbx_type:
+                    # `c_dst_uuid` has a different type.
                     continue
+            # UnDrew Edit End
                 connection_key = (c_src_uuid, c_dst_uuid)
                 if connection_key in seen_connections:
                     # The connection is a duplicate, skip it.
@@ -4000,9 +4499,9 @@ def load(operator, context, filepath="",
         #       We don't have any support for in-between shapes currently.
         blend_shape_channel_to_shapes = {}
         mesh_to_shapes = {}
-        for s_uuid, (fbx_sdata, _bl_sdata) in fbx_table_nodes.items():
-            if fbx_sdata is None or fbx_sdata.id != b'Geometry' or fbx_sdata.props[2] != b'Shape':
-                continue
+        # UnDrew Edit Start : Per-class object index.
+        for s_uuid, (fbx_sdata, _bl_sdata) in fbx_table_nodes_by_class.get((b'Geometry', b'Shape'), ()):
+        # UnDrew Edit End
 
             # shape -> blend-shape-channel -> blend-shape -> mesh.
             for bc_uuid, fbx_bcdata, _bl_bcdata in connections_gen(s_uuid, b'Deformer', b'BlendShapeChannel'):
@@ -4113,37 +4612,33 @@ def load(operator, context, filepath="",
             stacks = {}
 
             # AnimationStacks.
-            for as_uuid, fbx_asitem in fbx_table_nodes.items():
-                fbx_asdata, _blen_data = fbx_asitem
-                if fbx_asdata.id != b'AnimationStack' or fbx_asdata.props[2] != b'':
-                    continue
+            # UnDrew Edit Start : Per-class object index.
+            for as_uuid, fbx_asitem in fbx_table_nodes_by_class.get((b'AnimationStack', b''), ()):
+            # UnDrew Edit End
                 stacks[as_uuid] = (fbx_asitem, {})
 
             # AnimationLayers
             # (mixing is completely ignored for now, each layer results in an independent set of actions).
             def get_astacks_from_alayer(al_uuid):
-                for as_uuid, as_ctype in fbx_connection_map.get(al_uuid, ()):
-                    if as_ctype.props[0] != b'OO':
-                        continue
-                    fbx_asdata, _bl_asdata = fbx_table_nodes.get(as_uuid, (None, None))
-                    if (fbx_asdata is None or fbx_asdata.id != b'AnimationStack' or
-                            fbx_asdata.props[2] != b'' or as_uuid not in stacks):
+                # UnDrew Edit Start : Typed connection adjacency.
+                for as_uuid, as_ctype in fbx_connection_map_typed.get((al_uuid, b'OO', b'AnimationStack'), ()):
+                    # Only stacks with an empty class were added to `stacks`.
+                    if as_uuid not in stacks:
                         continue
                     yield as_uuid
-            for al_uuid, fbx_alitem in fbx_table_nodes.items():
-                fbx_aldata, _blen_data = fbx_alitem
-                if fbx_aldata.id != b'AnimationLayer' or fbx_aldata.props[2] != b'':
-                    continue
+                # UnDrew Edit End
+            # UnDrew Edit Start : Per-class object index.
+            for al_uuid, fbx_alitem in fbx_table_nodes_by_class.get((b'AnimationLayer', b''), ()):
+            # UnDrew Edit End
                 for as_uuid in get_astacks_from_alayer(al_uuid):
                     _fbx_asitem, alayers = stacks[as_uuid]
                     alayers[al_uuid] = (fbx_alitem, {})
 
             # AnimationCurveNodes (also the ones linked to actual animated data!).
             curvenodes = {}
-            for acn_uuid, fbx_acnitem in fbx_table_nodes.items():
-                fbx_acndata, _blen_data = fbx_acnitem
-                if fbx_acndata.id != b'AnimationCurveNode' or fbx_acndata.props[2] != b'':
-                    continue
+            # UnDrew Edit Start : Per-class object index.
+            for acn_uuid, fbx_acnitem in fbx_table_nodes_by_class.get((b'AnimationCurveNode', b''), ()):
+            # UnDrew Edit End
                 cnode = curvenodes[acn_uuid] = {}
                 items = []
                 for n_uuid, n_ctype in fbx_connection_map.get(acn_uuid, ()):
@@ -4183,12 +4678,12 @@ def load(operator, context, filepath="",
                         mat = fbx_item[1]
                         items.append((mat, lnk_prop))
                         print("WARNING! Importing material's animation is not supported for Nodal materials...")
-                for al_uuid, al_ctype in fbx_connection_map.get(acn_uuid, ()):
-                    if al_ctype.props[0] != b'OO':
-                        continue
-                    fbx_aldata, _blen_aldata = fbx_alitem = fbx_table_nodes.get(al_uuid, (None, None))
-                    if fbx_aldata is None or fbx_aldata.id != b'AnimationLayer' or fbx_aldata.props[2] != b'':
+                # UnDrew Edit Start : Typed connection adjacency.
+                for al_uuid, al_ctype in fbx_connection_map_typed.get((acn_uuid, b'OO', b'AnimationLayer'), ()):
+                    fbx_aldata, _blen_aldata = fbx_alitem = fbx_table_nodes[al_uuid]
+                    if fbx_aldata.props[2] != b'':
                         continue
+                # UnDrew Edit End
                     for as_uuid in get_astacks_from_alayer(al_uuid):
                         _fbx_alitem, anim_items = stacks[as_uuid][1][al_uuid]
                         assert _fbx_alitem == fbx_alitem
@@ -4197,17 +4692,13 @@ def load(operator, context, filepath="",
                             anim_items.setdefault(item, {})[acn_uuid] = (cnode, item_prop)
 
             # AnimationCurves (real animation data).
-            for ac_uuid, fbx_acitem in fbx_table_nodes.items():
-                fbx_acdata, _blen_data = fbx_acitem
-                if fbx_acdata.id != b'AnimationCurve' or fbx_acdata.props[2] != b'':
-                    continue
-                for acn_uuid, acn_ctype in fbx_connection_map.get(ac_uuid, ()):
-                    if acn_ctype.props[0] != b'OP':
-                        continue
-                    fbx_acndata, _bl_acndata = fbx_table_nodes.get(acn_uuid, (None, None))
-                    if (fbx_acndata is None or fbx_acndata.id != b'AnimationCurveNode' or
-                            fbx_acndata.props[2] != b'' or acn_uuid not in curvenodes):
+            # UnDrew Edit Start : Per-class object index and typed connection adjacency.
+            for ac_uuid, fbx_acitem in fbx_table_nodes_by_class.get((b'AnimationCurve', b''), ()):
+                for acn_uuid, acn_ctype in fbx_connection_map_typed.get((ac_uuid, b'OP', b'AnimationCurveNode'), ()):
+                    # Only curve nodes with an empty class were added to `curvenodes`.
+                    if acn_uuid not in curvenodes:
                         continue
+            # UnDrew Edit End
                     # Note this is an infamous simplification of the compound props stuff,
                     # seems to be standard naming but we'll probably have to be smarter to handle more exotic files?
                     channel = {
@@ -4328,10 +4819,10 @@ def load(operator, context, filepath="",
             if clamp:
                 node_texture.extension = 'EXTEND'
 
-        for fbx_uuid, fbx_item in fbx_table_nodes.items():
+        # UnDrew Edit Start : Per-class object index.
+        for fbx_uuid, fbx_item in fbx_table_nodes_by_id.get(b'Material', ()):
             fbx_obj, blen_data = fbx_item
-            if fbx_obj.id != b'Material':
-                continue
+        # UnDrew Edit End
 
             material = fbx_table_nodes.get(fbx_uuid, (None, None))[1]
             for (fbx_lnk,
@@ -4388,10 +4879,10 @@ def load(operator, context, filepath="",
         # if so, use the alpha channel.
 
         # Note: this could be made optional since images may have alpha but be entirely opaque
-        for fbx_uuid, fbx_item in fbx_table_nodes.items():
+        # UnDrew Edit Start : Per-class object index.
+        for fbx_uuid, fbx_item in fbx_table_nodes_by_id.get(b'Material', ()):
             fbx_obj, blen_data = fbx_item
-            if fbx_obj.id != b'Material':
-                continue
+        # UnDrew Edit End
             material = fbx_table_nodes.get(fbx_uuid, (None, None))[1]
             image = material_images.get(material, {}).get(b'DiffuseColor', None)
             # do we have alpha?
@@ -4417,10 +4908,10 @@ def load(operator, context, filepath="",
     def _():
         # Annoying workaround for cycles having no z-offset
         if material_decals and use_alpha_decals:
-            for fbx_uuid, fbx_item in fbx_table_nodes.items():
+            # UnDrew Edit Start : Per-class object index.
+            for fbx_uuid, fbx_item in fbx_table_nodes_by_id.get(b'Geometry', ()):
                 fbx_obj, blen_data = fbx_item
-                if fbx_obj.id != b'Geometry':
-                    continue
+            # UnDrew Edit End
                 if fbx_obj.props[-1] == b'Mesh':
                     mesh = fbx_item[1]
 
@@ -4467,5 +4958,9 @@ def load(operator, context, filepath="",
 
     perfmon.level_down()
 
+    # UnDrew Add Start : Indexed element lookups, free the indices (and the elements they keep alive).
+    _elem_children_indices = _elem_props_indices = None
+    # UnDrew Add End
+
     perfmon.level_down("Import finished.")
     return {'FINISHED'}
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The add-on modules that do not import `bpy` (e.g. `fbx_utils_math`, `parse_fbx`) are imported directly, like the
+# fbx2json.py and json2fbx.py scripts do.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "io_scene_fbx_patch_ahit"))
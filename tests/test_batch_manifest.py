@@ -0,0 +1,109 @@
+"""Check the load/keep/set_written/save round-trips of `fbx_utils_batch.UE3BatchManifest`."""
+import json
+
+from fbx_utils_batch import UE3BatchManifest
+
+EXTRA = ("ONLY_OWNER", "FAST")
+
+
+def _anim(astack):
+    # (astack_key, astack, alayer_key, name, fstart, fend), as made by `fbx_animations_do`.
+    return (1, astack, 2, b"Armature|Walk", 0.0, 1.0)
+
+
+WALK_ASTACK = {
+    "Model_Armature": (2, {"Lcl Translation": None, "Lcl Rotation": None}),
+    "Model_Bone": (2, {"Lcl Rotation": None}),
+}
+WALK_ANIMATED = {
+    ("Model_Armature", "Lcl Translation"), ("Model_Armature", "Lcl Rotation"), ("Model_Bone", "Lcl Rotation"),
+}
+
+
+def _write_files(tmp_path, filenames):
+    tmp_path.mkdir(parents=True, exist_ok=True)
+    for filename in filenames:
+        (tmp_path / filename).write_bytes(b"")
+
+
+def _export(tmp_path, scene_hash, anims):
+    """Export `anims`, a dict {filename: (anim_hash, astack)}, like a batch export, and return the kept files."""
+    manifest = UE3BatchManifest(str(tmp_path), EXTRA)
+    manifest.load(scene_hash)
+    kept = {}
+    for filename, (anim_hash, astack) in anims.items():
+        kept_animated = manifest.keep(filename, anim_hash)
+        if kept_animated is not None:
+            kept[filename] = kept_animated
+            continue
+        _write_files(tmp_path, (filename,))
+        manifest.set_written(filename, _anim(astack))
+    manifest.save()
+    return kept
+
+
+def test_round_trip(tmp_path):
+    anims = {"Walk.fbx": ("walk", WALK_ASTACK), "Run.fbx": ("run", {"Model_Bone": (2, {"Lcl Scaling": None})})}
+    assert _export(tmp_path, "scene", anims) == {}
+    kept = _export(tmp_path, "scene", anims)
+    assert kept == {"Walk.fbx": WALK_ANIMATED, "Run.fbx": {("Model_Bone", "Lcl Scaling")}}
+    # Kept files stay in the manifest.
+    assert _export(tmp_path, "scene", anims) == kept
+    assert not (tmp_path / (UE3BatchManifest.FILENAME + ".tmp")).exists()
+
+
+def test_changed_anim(tmp_path):
+    _export(tmp_path, "scene", {"Walk.fbx": ("walk", WALK_ASTACK), "Run.fbx": ("run", WALK_ASTACK)})
+    kept = _export(tmp_path, "scene", {"Walk.fbx": ("walk2", WALK_ASTACK), "Run.fbx": ("run", WALK_ASTACK)})
+    assert set(kept) == {"Run.fbx"}
+    # The new hash was recorded.
+    kept = _export(tmp_path, "scene", {"Walk.fbx": ("walk2", WALK_ASTACK), "Run.fbx": ("run", WALK_ASTACK)})
+    assert set(kept) == {"Walk.fbx", "Run.fbx"}
+
+
+def test_changed_scene(tmp_path):
+    anims = {"Walk.fbx": ("walk", WALK_ASTACK)}
+    _export(tmp_path, "scene", anims)
+    assert _export(tmp_path, "scene2", anims) == {}
+    assert set(_export(tmp_path, "scene2", anims)) == {"Walk.fbx"}
+
+
+def test_changed_version(tmp_path):
+    anims = {"Walk.fbx": ("walk", WALK_ASTACK)}
+    _export(tmp_path, "scene", anims)
+    manifest_path = tmp_path / UE3BatchManifest.FILENAME
+    manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+    assert manifest["version"] == UE3BatchManifest.VERSION
+    manifest["version"] -= 1
+    manifest_path.write_text(json.dumps(manifest), encoding='utf-8')
+    assert _export(tmp_path, "scene", anims) == {}
+
+
+def test_missing_or_invalid(tmp_path):
+    anims = {"Walk.fbx": ("walk", WALK_ASTACK)}
+    # No manifest yet, in a sub-folder that does not exist yet either.
+    assert _export(tmp_path / "anims", "scene", anims) == {}
+    # Deleted file.
+    _export(tmp_path, "scene", anims)
+    (tmp_path / "Walk.fbx").unlink()
+    assert _export(tmp_path, "scene", anims) == {}
+    # Unreadable manifest.
+    (tmp_path / UE3BatchManifest.FILENAME).write_text("{", encoding='utf-8')
+    assert _export(tmp_path, "scene", anims) == {}
+    assert set(_export(tmp_path, "scene", anims)) == {"Walk.fbx"}
+
+
+def test_unhashed_anim(tmp_path):
+    _export(tmp_path, "scene", {"Walk.fbx": ("walk", WALK_ASTACK)})
+    # Written again without its hash given to `keep` (e.g. by an NLA strip): dropped from the manifest.
+    manifest = UE3BatchManifest(str(tmp_path), EXTRA)
+    manifest.load("scene")
+    manifest.set_written("Walk.fbx", _anim(WALK_ASTACK))
+    manifest.save()
+    assert _export(tmp_path, "scene", {"Walk.fbx": ("walk", WALK_ASTACK)}) == {}
+
+
+def test_not_loaded(tmp_path):
+    manifest = UE3BatchManifest(str(tmp_path), EXTRA)
+    assert manifest.scene_hash is None
+    assert manifest.keep("Walk.fbx", "walk") is None
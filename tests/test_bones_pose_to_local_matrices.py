@@ -0,0 +1,131 @@
+"""Check `fbx_utils_math.bones_pose_to_local_matrices` against bone by bone compositions of the pose-space matrices.
+
+The reference composes each bone's pose-space matrix from its FBX local-space matrix the way Blender's
+`BKE_bone_parent_transform_calc_from_matrices()` and `BKE_bone_parent_transform_apply()` do, for the inherit types used
+by the exporter, so the batched conversion back to local-space has to recover the local matrices exactly.
+"""
+import math
+
+import numpy as np
+import pytest
+
+from fbx_utils_math import _ue3_orthogonalize_pose_matrices, bone_pose_levels, bones_pose_to_local_matrices
+
+TOLERANCE = 1e-9
+# `ObjectWrapper.UE3_inherit_type` values.
+INHERIT_ALIGNED = 0
+INHERIT_FULL = 1
+INHERIT_NONE = 2
+
+
+def _random_rotation(rng):
+    w, x, y, z = rng.normal(size=4)
+    n = math.sqrt(w * w + x * x + y * y + z * z)
+    w, x, y, z = w / n, x / n, y / n, z / n
+    return np.array((
+        (1.0 - 2.0 * (y * y + z * z), 2.0 * (x * y - w * z), 2.0 * (x * z + w * y)),
+        (2.0 * (x * y + w * z), 1.0 - 2.0 * (x * x + z * z), 2.0 * (y * z - w * x)),
+        (2.0 * (x * z - w * y), 2.0 * (y * z + w * x), 1.0 - 2.0 * (x * x + y * y)),
+    ))
+
+
+def _random_matrix(rng, scale_range):
+    mat = np.identity(4)
+    mat[:3, :3] = _random_rotation(rng) * rng.uniform(*scale_range, 3)
+    mat[:3, 3] = rng.uniform(-2.0, 2.0, 3)
+    return mat
+
+
+def _random_armature(rng, num_bones, inherit_types):
+    parent_indices = [int(rng.integers(-1, bo_idx)) if bo_idx else -1 for bo_idx in range(num_bones)]
+    inherit_types = [int(rng.choice(inherit_types)) for _ in range(num_bones)]
+    # Rest matrices relative to the parent bone are rigid, FBX local-space matrices have non-uniform scale.
+    rest_local = np.array([_random_matrix(rng, (1.0, 1.0)) for _ in range(num_bones)])
+    local_mats = np.array([_random_matrix(rng, (0.3, 3.0)) for _ in range(num_bones)])
+    return parent_indices, inherit_types, rest_local, local_mats
+
+
+def _reference_pose_matrices(parent_indices, inherit_types, rest_local, local_mats):
+    pose_mats = []
+    for par_idx, inherit_type, offs_bone, local_mat in zip(parent_indices, inherit_types, rest_local, local_mats):
+        par_pose_mat = pose_mats[par_idx] if par_idx >= 0 else np.identity(4)
+        if inherit_type == INHERIT_FULL:
+            pose_mats.append(par_pose_mat @ local_mat)
+            continue
+        # Parent transform of a bone inheriting rotation, with local location and 'ALIGNED' or 'NONE' inherit scale.
+        tmat, post_scale = _ue3_orthogonalize_pose_matrices(par_pose_mat[None])
+        rotscale_mat = tmat[0] @ offs_bone
+        loc_mat = par_pose_mat @ offs_bone
+        post_scale = post_scale[0] if inherit_type == INHERIT_ALIGNED else np.ones(3)
+        # Apply it to the Blender local-space (rest-relative) matrix.
+        basis = np.linalg.inv(offs_bone) @ local_mat
+        pose_mat = rotscale_mat @ basis
+        pose_mat[:3, 3] = (loc_mat @ basis[:, 3])[:3]
+        pose_mat[:, :3] *= post_scale
+        pose_mats.append(pose_mat)
+    return np.array(pose_mats)
+
+
+def _assert_recovers_local_matrices(parent_indices, inherit_types, rest_local, local_mats):
+    pose_mats = _reference_pose_matrices(parent_indices, inherit_types, rest_local, local_mats)
+    levels = bone_pose_levels(parent_indices, inherit_types)
+    result_local, result_pose = bones_pose_to_local_matrices(pose_mats, rest_local, np.linalg.inv(rest_local), levels)
+    np.testing.assert_allclose(result_local, local_mats, rtol=0, atol=TOLERANCE)
+    np.testing.assert_allclose(result_pose, pose_mats, rtol=0, atol=TOLERANCE)
+
+
+@pytest.mark.parametrize("inherit_types", (
+    (INHERIT_FULL,),
+    (INHERIT_ALIGNED,),
+    (INHERIT_NONE,),
+    (INHERIT_FULL, INHERIT_ALIGNED, INHERIT_NONE),
+))
+def test_random_armature(inherit_types):
+    rng = np.random.default_rng(len(inherit_types) * 10 + inherit_types[0])
+    _assert_recovers_local_matrices(*_random_armature(rng, 60, inherit_types))
+
+
+def test_sheared_parents():
+    # Non-uniformly scaled bones fully inheriting a rotated, non-uniformly scaled parent get sheared pose-space
+    # matrices, whose shear their 'ALIGNED' and 'NONE' children must not inherit.
+    rng = np.random.default_rng(4)
+    parent_indices = [-1, 0, 1, 2, 1, 2]
+    inherit_types = [INHERIT_FULL, INHERIT_FULL, INHERIT_FULL, INHERIT_ALIGNED, INHERIT_NONE, INHERIT_ALIGNED]
+    rest_local = np.array([_random_matrix(rng, (1.0, 1.0)) for _ in parent_indices])
+    local_mats = np.array([_random_matrix(rng, (0.2, 4.0)) for _ in parent_indices])
+    pose_mats = _reference_pose_matrices(parent_indices, inherit_types, rest_local, local_mats)
+    rot_scale = pose_mats[2, :3, :3]
+    assert abs(np.dot(rot_scale[:, 0], rot_scale[:, 1])) > 1e-2
+    _assert_recovers_local_matrices(parent_indices, inherit_types, rest_local, local_mats)
+
+
+def test_orthogonalize_pose_matrices():
+    rng = np.random.default_rng(5)
+    mats = np.array([_random_matrix(rng, (0.3, 3.0)) for _ in range(50)])
+    # Add shear.
+    mats[:, :3, :3] += rng.uniform(-0.5, 0.5, (50, 3, 3))
+    result, scale = _ue3_orthogonalize_pose_matrices(mats)
+    rot = result[:, :3, :3]
+    np.testing.assert_allclose(rot.transpose(0, 2, 1) @ rot, np.broadcast_to(np.identity(3), rot.shape),
+                               rtol=0, atol=TOLERANCE)
+    # The Y axis keeps its direction and length, and the handedness is kept.
+    y_axes = mats[:, :3, 1]
+    np.testing.assert_allclose(rot[:, :, 1], y_axes / np.linalg.norm(y_axes, axis=1)[:, None], rtol=0, atol=TOLERANCE)
+    np.testing.assert_allclose(scale[:, 1], np.linalg.norm(y_axes, axis=1), rtol=0, atol=TOLERANCE)
+    np.testing.assert_array_equal(np.linalg.det(rot) > 0.0, np.linalg.det(mats[:, :3, :3]) > 0.0)
+    np.testing.assert_array_equal(result[:, :, 3], mats[:, :, 3])
+
+
+def test_bone_pose_levels():
+    levels = bone_pose_levels([-1, 0, -1, 1, 0, 2], [INHERIT_FULL, INHERIT_ALIGNED, INHERIT_NONE, INHERIT_FULL,
+                                                      INHERIT_FULL, INHERIT_ALIGNED])
+    no_parent = 6
+    expected = (
+        ([0], [no_parent], [2], [no_parent], [False]),
+        ([4], [0], [1, 5], [0, 2], [True, True]),
+        ([3], [1], [], [], []),
+    )
+    assert len(levels) == len(expected)
+    for level, expected_level in zip(levels, expected):
+        for array, expected_array in zip(level, expected_level):
+            np.testing.assert_array_equal(array, expected_array)
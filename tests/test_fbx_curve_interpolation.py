@@ -0,0 +1,288 @@
+"""Check the reading, evaluation and combination of imported FBX animation curves with constant and cubic keys."""
+import numpy as np
+import pytest
+
+from fbx_utils_math import (
+    BEZIER_INTERPOLATION_VALUE,
+    CONSTANT_INTERPOLATION_VALUE,
+    FBX_KEY_INTERPOLATION_CONSTANT,
+    FBX_KEY_INTERPOLATION_CUBIC,
+    FBX_KEY_INTERPOLATION_LINEAR,
+    FBX_KEY_TANGENT_CLAMP,
+    FBX_KEY_TANGENT_USER,
+    FBX_KEY_WEIGHT_DEFAULT,
+    FBX_KEY_WEIGHTED_NEXT_LEFT,
+    FBX_KEY_WEIGHTED_RIGHT,
+    LINEAR_INTERPOLATION_VALUE,
+    _fbx_curve_evaluate,
+    _fbx_curve_segments_evaluate,
+    fbx_curve_interpolation,
+    fbx_curves_combine,
+)
+
+FBX_KTIME = 46186158000
+FRAME = FBX_KTIME // 30
+HOLD_STEP = FRAME // 64
+TOLERANCE = 1e-9
+
+
+def _key_attrs(flags, data=None, refcount=None):
+    """KeyAttrFlags, KeyAttrDataFloat and KeyAttrRefCount arrays, with one key attribute per key by default."""
+    flags = np.array(flags, dtype=np.int32)
+    if data is None:
+        data = np.zeros((len(flags), 4), dtype=np.float32)
+    if refcount is None:
+        refcount = np.ones(len(flags), dtype=np.int32)
+    return flags, np.asarray(data, dtype=np.float32).ravel(), np.array(refcount, dtype=np.int32)
+
+
+def _packed_weights(right_weight, next_left_weight):
+    """The float whose bits are the tangent weights of a key, as stored in its third KeyAttrDataFloat value."""
+    packed = np.array([round(right_weight * 10000.0) | (round(next_left_weight * 10000.0) << 16)], dtype=np.uint32)
+    return packed.view(np.float32)[0]
+
+
+def _hermite(t0, t1, v0, v1, m0, m1, times):
+    dt = t1 - t0
+    u = (times - t0) / dt
+    h00 = 2.0 * u ** 3 - 3.0 * u ** 2 + 1.0
+    h10 = u ** 3 - 2.0 * u ** 2 + u
+    h01 = -2.0 * u ** 3 + 3.0 * u ** 2
+    h11 = u ** 3 - u ** 2
+    return h00 * v0 + h10 * dt * m0 + h01 * v1 + h11 * dt * m1
+
+
+class TestCurveInterpolation:
+    key_times = np.array((0, 2, 5, 6, 9), dtype=np.int64) * FRAME
+    key_values = np.array((0.0, 1.0, 3.0, -1.0, 2.0), dtype=np.float32)
+
+    def _read(self, *attrs):
+        return fbx_curve_interpolation(self.key_times, self.key_values, *attrs, FBX_KTIME)
+
+    def test_linear_only(self):
+        # The interpolation of the last key is unused.
+        flags = [FBX_KEY_INTERPOLATION_LINEAR] * 4 + [FBX_KEY_INTERPOLATION_CUBIC]
+        assert self._read(*_key_attrs(flags)) is None
+
+    @pytest.mark.parametrize("refcount", ((1, 1, 1, 1), (2, 1, 1, 2), (-1, 3, 1, 1, 1), (1, 1, 1, 1, 2)))
+    def test_invalid_refcount(self, refcount):
+        flags = [FBX_KEY_INTERPOLATION_CUBIC] * len(refcount)
+        assert self._read(*_key_attrs(flags, refcount=refcount)) is None
+
+    def test_shared_attributes(self):
+        # Key attributes are shared by as many consecutive keys as their refcount.
+        flags = [FBX_KEY_INTERPOLATION_CONSTANT, FBX_KEY_INTERPOLATION_CUBIC, FBX_KEY_INTERPOLATION_LINEAR]
+        key_interp = self._read(*_key_attrs(flags, refcount=(2, 1, 2)))
+        np.testing.assert_array_equal(key_interp.interpolation, (
+            CONSTANT_INTERPOLATION_VALUE, CONSTANT_INTERPOLATION_VALUE, BEZIER_INTERPOLATION_VALUE,
+            LINEAR_INTERPOLATION_VALUE, LINEAR_INTERPOLATION_VALUE))
+
+    def test_auto_and_clamped_tangents(self):
+        flags = [FBX_KEY_INTERPOLATION_CUBIC] * 5
+        times = self.key_times.astype(np.float64)
+        values = self.key_values.astype(np.float64)
+        expected = np.empty(5)
+        expected[1:-1] = (values[2:] - values[:-2]) / (times[2:] - times[:-2])
+        expected[0] = (values[1] - values[0]) / (times[1] - times[0])
+        expected[-1] = (values[-1] - values[-2]) / (times[-1] - times[-2])
+        key_interp = self._read(*_key_attrs(flags))
+        np.testing.assert_allclose(key_interp.right_slopes, expected, rtol=TOLERANCE)
+        np.testing.assert_allclose(key_interp.left_slopes, expected, rtol=TOLERANCE)
+
+        # Keys 2 and 3 are a local maximum and minimum, so are flat when clamped, and so are the first and last keys,
+        # like Blender's auto clamped handles. Key 1 is not.
+        key_interp = self._read(*_key_attrs([f | FBX_KEY_TANGENT_CLAMP for f in flags]))
+        expected[[0, 2, 3, 4]] = 0.0
+        np.testing.assert_allclose(key_interp.right_slopes, expected, rtol=TOLERANCE)
+        np.testing.assert_allclose(key_interp.left_slopes, expected, rtol=TOLERANCE)
+
+    def test_user_tangents(self):
+        # The right slope of a key and the left slope of the next key are stored by the key, in value per second.
+        flags = [FBX_KEY_INTERPOLATION_CUBIC | FBX_KEY_TANGENT_USER] * 5
+        data = np.zeros((5, 4), dtype=np.float32)
+        data[:, 0] = (1.0, 2.0, 3.0, 4.0, 5.0)
+        data[:, 1] = (-1.0, -2.0, -3.0, -4.0, -5.0)
+        key_interp = self._read(*_key_attrs(flags, data))
+        np.testing.assert_allclose(key_interp.right_slopes * FBX_KTIME, data[:, 0], rtol=1e-6)
+        np.testing.assert_allclose(key_interp.left_slopes[1:] * FBX_KTIME, data[:-1, 1], rtol=1e-6)
+
+    def test_weights(self):
+        flags = [FBX_KEY_INTERPOLATION_CUBIC | FBX_KEY_WEIGHTED_RIGHT | FBX_KEY_WEIGHTED_NEXT_LEFT] * 5
+        flags[2] = FBX_KEY_INTERPOLATION_CUBIC
+        data = np.zeros((5, 4), dtype=np.float32)
+        # The handles of the segment starting at key 3 overlap, so are scaled down until they meet.
+        data[:, 2] = [_packed_weights(0.5, 0.1), _packed_weights(0.2, 0.25), _packed_weights(0.9, 0.9),
+                      _packed_weights(0.8, 0.7), _packed_weights(0.3, 0.3)]
+        key_interp = self._read(*_key_attrs(flags, data))
+        np.testing.assert_allclose(key_interp.right_weights,
+                                   (0.5, 0.2, FBX_KEY_WEIGHT_DEFAULT, 0.8 / 1.5, 0.3), rtol=1e-6)
+        np.testing.assert_allclose(key_interp.left_weights,
+                                   (FBX_KEY_WEIGHT_DEFAULT, 0.1, 0.25, FBX_KEY_WEIGHT_DEFAULT, 0.7 / 1.5), rtol=1e-6)
+
+
+class TestSegmentsEvaluate:
+    key_times = np.array((0, 4, 10, 12), dtype=np.int64) * FRAME
+    key_values = np.array((1.0, -2.0, 5.0, 5.5), dtype=np.float32)
+
+    def _key_interp(self, flags, data=None):
+        return fbx_curve_interpolation(self.key_times, self.key_values, *_key_attrs(flags, data), FBX_KTIME)
+
+    def _evaluate_dense(self, key_interp, segment):
+        offsets = np.linspace(0.0, self.key_times[segment + 1] - self.key_times[segment], 101)
+        segments = np.full(len(offsets), segment)
+        values, slopes = _fbx_curve_segments_evaluate(self.key_times, self.key_values, key_interp, segments, offsets)
+        return self.key_times[segment] + offsets, values, slopes
+
+    def test_hermite(self):
+        flags = [FBX_KEY_INTERPOLATION_CUBIC] * 4
+        for clamped in (False, True):
+            key_interp = self._key_interp([f | (FBX_KEY_TANGENT_CLAMP if clamped else 0) for f in flags])
+            for segment in range(3):
+                times, values, slopes = self._evaluate_dense(key_interp, segment)
+                args = (self.key_times[segment], self.key_times[segment + 1],
+                        float(self.key_values[segment]), float(self.key_values[segment + 1]),
+                        key_interp.right_slopes[segment], key_interp.left_slopes[segment + 1])
+                np.testing.assert_allclose(values, _hermite(*args, times), rtol=0, atol=TOLERANCE)
+                # The slope is the derivative of the value.
+                dt = 1e-3 * FRAME
+                expected_slopes = (_hermite(*args, times + dt) - _hermite(*args, times - dt)) / (2 * dt)
+                np.testing.assert_allclose(slopes * FRAME, expected_slopes * FRAME, rtol=0, atol=1e-6)
+            # The ends of the segments have the key values and tangents.
+            values, slopes = _fbx_curve_segments_evaluate(self.key_times, self.key_values, key_interp,
+                                                          np.arange(3), np.zeros(3))
+            np.testing.assert_allclose(values, self.key_values[:3], rtol=0, atol=TOLERANCE)
+            np.testing.assert_allclose(slopes, key_interp.right_slopes[:3], rtol=0, atol=TOLERANCE)
+        # Key 1 is a local minimum, so is flat when clamped.
+        assert key_interp.right_slopes[1] == 0.0 and key_interp.left_slopes[1] == 0.0
+
+    def test_user_tangents_at_keys(self):
+        flags = [FBX_KEY_INTERPOLATION_CUBIC | FBX_KEY_TANGENT_USER] * 4
+        data = np.zeros((4, 4), dtype=np.float32)
+        data[:, 0] = (3.0, -1.0, 0.5, 0.0)
+        data[:, 1] = (2.0, 4.0, -6.0, 0.0)
+        key_interp = self._key_interp(flags, data)
+        dt = np.diff(self.key_times).astype(np.float64)
+        values, slopes = _fbx_curve_segments_evaluate(self.key_times, self.key_values, key_interp, np.arange(3), dt)
+        np.testing.assert_allclose(values, self.key_values[1:], rtol=0, atol=TOLERANCE)
+        np.testing.assert_allclose(slopes * FBX_KTIME, data[:3, 1], rtol=0, atol=1e-6)
+        values, slopes = _fbx_curve_segments_evaluate(self.key_times, self.key_values, key_interp, np.arange(3),
+                                                      np.zeros(3))
+        np.testing.assert_allclose(slopes * FBX_KTIME, data[:3, 0], rtol=0, atol=1e-6)
+
+    def test_weighted_bisection(self):
+        flags = [FBX_KEY_INTERPOLATION_CUBIC | FBX_KEY_WEIGHTED_RIGHT | FBX_KEY_WEIGHTED_NEXT_LEFT] * 4
+        data = np.zeros((4, 4), dtype=np.float32)
+        data[:, 2] = [_packed_weights(0.1, 0.6), _packed_weights(0.7, 0.05), _packed_weights(0.4, 0.4),
+                      _packed_weights(0.0, 0.0)]
+        key_interp = self._key_interp(flags, data)
+        for segment in range(3):
+            t0 = float(self.key_times[segment])
+            dt = float(self.key_times[segment + 1]) - t0
+            v0 = float(self.key_values[segment])
+            v1 = float(self.key_values[segment + 1])
+            w0 = key_interp.right_weights[segment]
+            w1 = key_interp.left_weights[segment + 1]
+            # Points of the Bézier curve, evaluated directly from its parameter.
+            u = np.linspace(0.0, 1.0, 51)
+            inv_u = 1.0 - u
+            x = 3.0 * inv_u * u * (inv_u * w0 + u * (1.0 - w1)) + u ** 3
+            y1 = v0 + key_interp.right_slopes[segment] * w0 * dt
+            y2 = v1 - key_interp.left_slopes[segment + 1] * w1 * dt
+            y = inv_u ** 3 * v0 + 3.0 * inv_u * u * (inv_u * y1 + u * y2) + u ** 3 * v1
+            values, slopes = _fbx_curve_segments_evaluate(self.key_times, self.key_values, key_interp,
+                                                          np.full(len(u), segment), x * dt)
+            np.testing.assert_allclose(values, y, rtol=0, atol=1e-9)
+            # The ends of the segment keep the tangents of the keys, whatever their weights.
+            np.testing.assert_allclose(slopes[[0, -1]],
+                                       (key_interp.right_slopes[segment], key_interp.left_slopes[segment + 1]),
+                                       rtol=1e-6)
+
+    def test_constant(self):
+        key_interp = self._key_interp([FBX_KEY_INTERPOLATION_CONSTANT] * 4)
+        times, values, slopes = self._evaluate_dense(key_interp, 1)
+        np.testing.assert_array_equal(values, self.key_values[1])
+        np.testing.assert_array_equal(slopes, 0.0)
+
+
+def _curve(key_frames, key_values, flags):
+    key_times = np.array(key_frames, dtype=np.int64) * FRAME
+    key_values = np.array(key_values, dtype=np.float32)
+    return key_times, key_values, fbx_curve_interpolation(key_times, key_values, *_key_attrs(flags), FBX_KTIME)
+
+
+def _evaluate_combined(times, values, key_interp, eval_times):
+    return _fbx_curve_evaluate(times, values, key_interp, eval_times, values[0])[0]
+
+
+class TestCombine:
+    stepped = _curve((0, 3, 7, 10), (0.0, 1.0, -2.0, 4.0), [FBX_KEY_INTERPOLATION_CONSTANT] * 4)
+    linear = _curve((0, 2, 5, 9), (1.0, 2.0, 0.0, 3.0),
+                    [FBX_KEY_INTERPOLATION_LINEAR] * 3 + [FBX_KEY_INTERPOLATION_CUBIC])
+    cubic = _curve((1, 4, 6, 8), (2.0, -1.0, 1.0, 0.5), [FBX_KEY_INTERPOLATION_CUBIC] * 4)
+
+    def _combine(self, *curves):
+        initial_values = [float(values[0]) for _times, values, _key_interp in curves]
+        times = np.unique(np.concatenate([c[0] for c in curves]))
+        return fbx_curves_combine(times, curves, initial_values, HOLD_STEP)
+
+    def _assert_combined_matches(self, curves, combined):
+        times, values_arrays, key_interps = combined
+        # Evaluating the combined keyframes gives the original curves back, except during the steps of constant curves,
+        # where the values move from one step to the next in HOLD_STEP time.
+        eval_times = np.linspace(0, 10 * FRAME, 2001)
+        if any(curve is self.stepped for curve in curves):
+            step_ends = self.stepped[0][1:]
+        else:
+            step_ends = np.empty(0, dtype=np.int64)
+        during_step = ((eval_times[:, None] > step_ends - HOLD_STEP) & (eval_times[:, None] < step_ends)).any(axis=1)
+        for (key_times, key_values, key_interp), values, combined_interp in zip(curves, values_arrays, key_interps):
+            expected = _fbx_curve_evaluate(key_times, key_values, key_interp, eval_times, float(key_values[0]))[0]
+            result = _evaluate_combined(times, values, combined_interp, eval_times)
+            np.testing.assert_allclose(result[~during_step], expected[~during_step], rtol=0, atol=1e-6)
+
+    @pytest.mark.parametrize("other", ("linear", "cubic"))
+    def test_constant_steps_are_held(self, other):
+        curves = (self.stepped, getattr(self, other))
+        combined = self._combine(*curves)
+        times, values_arrays, key_interps = combined
+        # A key is inserted HOLD_STEP before each step of the constant curve while the other curve is animated. After
+        # the last key of the other curve (and before its first key), all the curves are constant, so the last step
+        # needs no extra key.
+        steps = self.stepped[0][1:]
+        np.testing.assert_array_equal(np.isin(steps - HOLD_STEP, times), (True, True, False))
+        expected_interpolation = BEZIER_INTERPOLATION_VALUE if other == "cubic" else LINEAR_INTERPOLATION_VALUE
+        other_times = getattr(self, other)[0]
+        animated = (times >= other_times[0]) & (times < other_times[-1])
+        assert (key_interps[0].interpolation[animated] == expected_interpolation).all()
+        assert (key_interps[0].interpolation[~animated] == CONSTANT_INTERPOLATION_VALUE).all()
+        self._assert_combined_matches(curves, combined)
+
+    def test_short_step(self):
+        # When the combined keyframe before a step is shorter than HOLD_STEP, the key is inserted halfway through it.
+        other = _curve((0, 3, 10), (0.0, 1.0, 0.0), [FBX_KEY_INTERPOLATION_LINEAR] * 3)
+        step_end = 3 * FRAME
+        step_start = other[0][1] = step_end - HOLD_STEP // 2
+        curves = (self.stepped, other)
+        combined = self._combine(*curves)
+        assert np.isin(step_start + (step_end - step_start) // 2, combined[0])
+        self._assert_combined_matches(curves, combined)
+
+    def test_all_constant(self):
+        other = _curve((0, 5, 10), (0.0, 1.0, 0.0), [FBX_KEY_INTERPOLATION_CONSTANT] * 3)
+        curves = (self.stepped, other)
+        combined = self._combine(*curves)
+        times, values_arrays, key_interps = combined
+        np.testing.assert_array_equal(times, np.array((0, 3, 5, 7, 10)) * FRAME)
+        assert (key_interps[0].interpolation == CONSTANT_INTERPOLATION_VALUE).all()
+        self._assert_combined_matches(curves, combined)
+
+    def test_linear_and_cubic(self):
+        # Cubic keyframes split at the times of the other curves, with their slopes there, still give the same cubic.
+        curves = (self.linear, self.cubic)
+        combined = self._combine(*curves)
+        np.testing.assert_array_equal(combined[0], np.unique(np.concatenate((self.linear[0], self.cubic[0]))))
+        self._assert_combined_matches(curves, combined)
+
+    def test_all(self):
+        curves = (self.stepped, self.linear, self.cubic)
+        self._assert_combined_matches(curves, self._combine(*curves))
@@ -0,0 +1,84 @@
+"""Compare `fbx_utils_math.matrices_to_loc_euler_scale` against `Matrix.decompose()` and `Quaternion.to_euler()`.
+
+Only needs `numpy` and the `mathutils` module from PyPI, since `fbx_utils_math` does not import `bpy`.
+"""
+import math
+
+import numpy as np
+import pytest
+
+mathutils = pytest.importorskip("mathutils")
+from mathutils import Euler, Matrix, Vector
+
+from fbx_utils_math import matrices_to_loc_euler_scale, eulers_to_matrices
+
+EULER_ORDERS = ('XYZ', 'XZY', 'YXZ', 'YZX', 'ZXY', 'ZYX')
+TOLERANCE = 1e-6
+# The eulers need more slack than TOLERANCE because mathutils is the one being imprecise: it decomposes matrices into
+# quaternions and converts those to eulers in single precision, and stores the eulers as single precision floats. The
+# float32 rounding of the quaternion components is amplified by the arctangents (most near the gimbal lock, where the
+# first and last angles are ill-conditioned), which over these tests makes mathutils' eulers differ by up to ~2.9e-5
+# radians from the exact double precision ones. The rotations those eulers describe are still held to TOLERANCE.
+EULER_TOLERANCE = 5e-5
+
+
+def _random_matrices(rng, count, middle_angle=None, order='XYZ'):
+    mats = []
+    for _ in range(count):
+        angles = rng.uniform(-math.pi, math.pi, 3)
+        if middle_angle is not None:
+            # The middle axis of the order at +/-90 degrees is the gimbal lock.
+            angles['XYZ'.index(order[1])] = middle_angle
+        rot = Euler(angles, order).to_matrix().to_4x4()
+        loc = Matrix.Translation(Vector(rng.uniform(-10.0, 10.0, 3)))
+        scale = Matrix.Diagonal(Vector(rng.uniform(0.1, 3.0, 3))).to_4x4()
+        mats.append(loc @ rot @ scale)
+    return mats
+
+
+def _expected(mats, order, euler_compat=None):
+    """Decompose each matrix with mathutils, each euler being compatible with the previous one."""
+    locs, eulers, rots, scales = [], [], [], []
+    prev_eul = euler_compat
+    for mat in mats:
+        loc, quat, scale = mat.decompose()
+        eul = quat.to_euler(order) if prev_eul is None else quat.to_euler(order, prev_eul)
+        locs.append(loc)
+        eulers.append(eul)
+        rots.append(quat.to_matrix())
+        scales.append(scale)
+        prev_eul = eul
+    return np.array(locs), np.array(eulers), np.array(rots), np.array(scales)
+
+
+def _assert_matches(mats, order, euler_compat=None):
+    loc, eul, scale = matrices_to_loc_euler_scale(
+        np.array(mats, dtype=np.float64), order,
+        None if euler_compat is None else np.array(euler_compat, dtype=np.float64))
+    exp_loc, exp_eul, exp_rot, exp_scale = _expected(mats, order, euler_compat)
+    np.testing.assert_allclose(loc, exp_loc, rtol=0, atol=TOLERANCE)
+    np.testing.assert_allclose(eulers_to_matrices(eul, order), exp_rot, rtol=0, atol=TOLERANCE)
+    np.testing.assert_allclose(eul, exp_eul, rtol=0, atol=EULER_TOLERANCE)
+    np.testing.assert_allclose(scale, exp_scale, rtol=0, atol=TOLERANCE)
+
+
+@pytest.mark.parametrize("order", EULER_ORDERS)
+def test_random_matrices(order):
+    rng = np.random.default_rng(EULER_ORDERS.index(order))
+    _assert_matches(_random_matrices(rng, 200, order=order), order)
+
+
+@pytest.mark.parametrize("order", EULER_ORDERS)
+@pytest.mark.parametrize("middle_angle", (math.pi / 2.0, -math.pi / 2.0))
+def test_gimbal_lock(order, middle_angle):
+    rng = np.random.default_rng(1)
+    _assert_matches(_random_matrices(rng, 50, middle_angle, order), order)
+
+
+@pytest.mark.parametrize("order", EULER_ORDERS)
+def test_compat_unwrapping(order):
+    # A continuous rotation past +/-180 degrees on every axis, starting from a compat euler a few turns away, so that
+    # the eulers have to be unwrapped to stay close to the previous frame's ones.
+    angles = np.linspace(0.0, 6.0 * math.pi, 120)[:, None] * np.array((1.0, -0.7, 0.4))
+    mats = [Euler(a, order).to_matrix().to_4x4() for a in angles]
+    _assert_matches(mats, order, Euler((4.0 * math.pi, -2.0 * math.pi, 2.0 * math.pi), order))
@@ -0,0 +1,100 @@
+"""Check the curve fitting keyframe reduction of `fbx_utils_math`, used by `AnimationCurveNodeWrapper.simplify_fit`."""
+import numpy as np
+import pytest
+
+from fbx_utils_math import _ue3_fit_linear_keyframes, simplify_fit_keep_mask
+
+FAC = 1.0
+
+
+def _tolerances(values, fac=FAC):
+    # Same tolerances as `AnimationCurveNodeWrapper.simplify`.
+    return fac * 1.0e-3 * np.maximum(2.0 * np.abs(values), 0.1)
+
+
+def _fitted_values(times, values, keep_mask):
+    return np.array([np.interp(times, times[mask], row[mask]) for row, mask in zip(values, keep_mask)])
+
+
+def _random_curves(rng, num_curves, num_samples):
+    times = np.arange(num_samples, dtype=np.float64)
+    # Smooth curves with some noise, offset so that both the relative and the absolute parts of the tolerance matter.
+    phases = rng.uniform(0.0, 2.0 * np.pi, (num_curves, 1))
+    freqs = rng.uniform(0.01, 0.2, (num_curves, 1))
+    amplitudes = rng.uniform(0.01, 100.0, (num_curves, 1))
+    values = amplitudes * np.sin(times * freqs + phases) + rng.uniform(-50.0, 50.0, (num_curves, 1))
+    values += rng.normal(0.0, 1e-3, values.shape) * amplitudes
+    return times, values
+
+
+@pytest.mark.parametrize("fac", (0.1, 1.0, 10.0))
+def test_error_bound(fac):
+    rng = np.random.default_rng(int(fac * 10))
+    times, values = _random_curves(rng, 40, 300)
+    keep_mask = simplify_fit_keep_mask(times, values, fac)
+    fitted = keep_mask.any(axis=1)
+    assert fitted.any() and keep_mask[fitted].sum() < keep_mask[fitted].size
+    errors = np.abs(_fitted_values(times, values[fitted], keep_mask[fitted]) - values[fitted])
+    assert np.all(errors <= _tolerances(values[fitted], fac))
+
+
+def test_endpoints_kept():
+    rng = np.random.default_rng(1)
+    times, values = _random_curves(rng, 20, 100)
+    tolerances = _tolerances(values)
+    keep_mask = _ue3_fit_linear_keyframes(times, values, tolerances)
+    assert keep_mask[:, 0].all() and keep_mask[:, -1].all()
+    # Non-static curves keep their ends too once static curves are dropped.
+    keep_mask = simplify_fit_keep_mask(times, values, FAC)
+    fitted = keep_mask.any(axis=1)
+    assert keep_mask[fitted, 0].all() and keep_mask[fitted, -1].all()
+
+
+def test_linear_segments():
+    # The corners of curves made of linear segments are kept. Splitting at the worst sample is greedy, so some samples
+    # within the segments may be kept too, but much fewer than all of them: on a ramp from zero, like the first segment
+    # of the first curve, the error and the relative tolerance grow together, so that all its samples are equally bad,
+    # and only one of them may be used to split it.
+    times = np.arange(50, dtype=np.float64)
+    corners = (0, 10, 25, 26, 49)
+    corner_values = np.array(((0.0, 5.0, -3.0, 8.0, 8.0), (1.0, 2.0, 3.0, 4.0, -10.0)))
+    values = np.array([np.interp(times, corners, row) for row in corner_values])
+    keep_mask = simplify_fit_keep_mask(times, values, FAC)
+    assert keep_mask[0, corners].all()
+    # The second curve has no corner at 10 nor 25: it is a single line from 0 up to 26.
+    assert keep_mask[1, (0, 26, 49)].all()
+    assert keep_mask.sum(axis=1).max() <= 2 * len(corners)
+    errors = np.abs(_fitted_values(times, values, keep_mask) - values)
+    assert np.all(errors <= _tolerances(values))
+
+
+def test_flat_curves():
+    times = np.arange(30, dtype=np.float64)
+    values = np.array((
+        np.zeros(30),
+        np.full(30, 12.5),
+        # Noise within the tolerance of the first sample is still static.
+        -4.0 + np.random.default_rng(2).uniform(-1.0, 1.0, 30) * 0.5 * _tolerances(np.array(-4.0)),
+        # Not static, only the jump needs to be kept.
+        np.where(times < 15, 1.0, 2.0),
+    ))
+    keep_mask = simplify_fit_keep_mask(times, values, FAC)
+    assert not keep_mask[:3].any()
+    np.testing.assert_array_equal(np.flatnonzero(keep_mask[3]), (0, 14, 15, 29))
+
+
+def test_short_curves():
+    for num_samples in (0, 1, 2):
+        times = np.arange(num_samples, dtype=np.float64)
+        values = np.arange(num_samples * 3, dtype=np.float64).reshape(3, num_samples)
+        keep_mask = _ue3_fit_linear_keyframes(times, values, _tolerances(values))
+        np.testing.assert_array_equal(keep_mask, np.ones(values.shape, dtype=bool))
+
+
+def test_curves_fitted_independently():
+    # All the curves are fitted at once, which must give the same result as fitting each of them alone.
+    rng = np.random.default_rng(3)
+    times, values = _random_curves(rng, 10, 200)
+    keep_mask = simplify_fit_keep_mask(times, values, FAC)
+    for row, mask in zip(values, keep_mask):
+        np.testing.assert_array_equal(simplify_fit_keep_mask(times, row[None], FAC)[0], mask)